@@ -0,0 +1,443 @@
+"""
+asyncio-native database backend for Kiitos Krab.
+
+AsyncDatabaseManager mirrors DatabaseManager's request-path methods as
+coroutines on top of an asyncpg pool, so one event loop can keep many
+commands in flight on a handful of connections. Maintenance operations
+(rollup consistency checks, migrations) stay on the threaded manager.
+"""
+
+import os
+import re
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import date
+from functools import lru_cache
+import asyncpg
+from config.settings import (
+    DB_POOL_MAX,
+    DB_POOL_TIMEOUT,
+    DB_POOL_MAX_LIFETIME,
+    CONFIG_CACHE_TTL,
+    CONFIG_CACHE_SIZE,
+    METRICS_ENABLED
+)
+from config_cache import ChannelConfigCache
+from database import (
+    INSERT_KUDOS_SQL,
+    ROLLUP_UPSERT_SQL,
+    ROLLUP_LOCK_SQL,
+    ROLLUP_DELETE_SQL,
+    ROLLUP_INSERT_SQL,
+    BOT_STATS_UPSERT_SQL,
+    INSERT_ANNOUNCEMENT_SQL,
+    QUOTA_LOCK_SQL,
+    MONTHLY_SENT_SQL,
+    MONTHLY_RECEIVED_SQL,
+    LEADERBOARD_SENDERS_SQL,
+    LEADERBOARD_RECEIVERS_SQL,
+    COMPLETE_LEADERBOARD_SENDERS_SQL,
+    COMPLETE_LEADERBOARD_RECEIVERS_SQL,
+    USER_STATS_SQL,
+    CHANNEL_CONFIG_SQL,
+    CHANNEL_CONFIGS_SQL,
+    SAVE_CHANNEL_CONFIG_SQL,
+    DELETE_CHANNEL_CONFIG_SQL,
+    CHANNELS_USING_LEADERBOARD_SQL,
+    STATUS_CHANNELS_SQL,
+    STATUS_LAST_KUDOS_SQL,
+    STATUS_TOTAL_KUDOS_SQL,
+    STATUS_CONFIG_CHANNELS_SQL,
+    STATUS_OUTBOX_SQL,
+    quota_lock_key,
+    rollup_upsert_params
+)
+from db_pool import PoolTimeout
+from migrations import LATEST_VERSION, get_pending_migrations
+from storage import StorageBackend
+from utils.metrics import timed_query, count_query_rows, mark_query_failed
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def numbered(sql: str) -> str:
+    """Rewrite a shared statement's psycopg2 %s placeholders as asyncpg's $1, $2, ..."""
+    position = iter(range(1, sql.count("%s") + 1))
+    return re.sub(r"%s", lambda match: f"${next(position)}", sql)
+
+
+def status_rowcount(status: str) -> int:
+    """Get the row count from a command status such as 'INSERT 0 3' (0 if it has none)"""
+    count = status.rsplit(" ", 1)[-1] if status else ""
+    return int(count) if count.isdigit() else 0
+
+
+class MetricsConnection(asyncpg.Connection):
+    """Connection that adds every statement's row count to the running AsyncDatabaseManager method's metrics"""
+
+    async def execute(self, query, *args, **kwargs):
+        status = await super().execute(query, *args, **kwargs)
+        count_query_rows(status_rowcount(status))
+        return status
+
+    async def fetch(self, query, *args, **kwargs):
+        rows = await super().fetch(query, *args, **kwargs)
+        count_query_rows(len(rows))
+        return rows
+
+    async def fetchrow(self, query, *args, **kwargs):
+        row = await super().fetchrow(query, *args, **kwargs)
+        count_query_rows(0 if row is None else 1)
+        return row
+
+    async def fetchval(self, query, *args, column=0, timeout=None):
+        # Through fetchrow, so a NULL value still counts as the row it came from
+        row = await super().fetchrow(query, *args, timeout=timeout)
+        count_query_rows(0 if row is None else 1)
+        return None if row is None else row[column]
+
+
+class AsyncDatabaseManager:
+    """Async counterpart of DatabaseManager, backed by an asyncpg connection pool.
+
+    Statements come from database.py and everything that doesn't touch the
+    database from StorageBackend; this class only awaits the queries.
+    """
+
+    _CHANNEL_CONFIG_COLUMNS = StorageBackend._CHANNEL_CONFIG_COLUMNS
+
+    # Config cache, timezone and leaderboard helpers don't touch the database - share them with the threaded backends
+    _cache_channel_config = StorageBackend._cache_channel_config
+    _cache_channel_configs = StorageBackend._cache_channel_configs
+    _config_leaderboard_limit = StorageBackend._config_leaderboard_limit
+    _config_leaderboard_channel = StorageBackend._config_leaderboard_channel
+    _config_timezone = StorageBackend._config_timezone
+    _local_month_year = StorageBackend._local_month_year
+    get_timezone_offset = StorageBackend.get_timezone_offset
+    get_config_cache_stats = StorageBackend.get_config_cache_stats
+
+    def __init__(self):
+        self.pool = None
+        self.config_cache = ChannelConfigCache(ttl=CONFIG_CACHE_TTL, max_size=CONFIG_CACHE_SIZE)
+        self.pool_stats = {'checkouts': 0, 'waits': 0, 'timeouts': 0, 'reconnects': 0, 'discarded': 0}
+
+    async def initialize(self):
+        """Create the connection pool (must run inside the event loop that will use it)"""
+        database_url = os.getenv('DATABASE_URL')
+        if not database_url:
+            raise ValueError("DATABASE_URL environment variable not set")
+        if not (database_url.startswith('postgresql://') or database_url.startswith('postgres://')):
+            raise ValueError("Invalid DATABASE_URL format - must start with 'postgresql://' or 'postgres://'")
+
+        # Connections are opened on demand, like the threaded pool
+        self.pool = await asyncpg.create_pool(
+            dsn=database_url,
+            min_size=0,
+            max_size=DB_POOL_MAX,
+            max_inactive_connection_lifetime=DB_POOL_MAX_LIFETIME,
+            connection_class=MetricsConnection if METRICS_ENABLED else asyncpg.Connection
+        )
+        logger.info(f"Async database connection pool initialized successfully (max {DB_POOL_MAX} connections)")
+
+    @asynccontextmanager
+    async def get_connection(self):
+        """Get a database connection from the pool, waiting up to DB_POOL_TIMEOUT for one"""
+        if self.pool.get_idle_size() == 0 and self.pool.get_size() >= self.pool.get_max_size():
+            self.pool_stats['waits'] += 1
+        try:
+            conn = await self.pool.acquire(timeout=DB_POOL_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.pool_stats['timeouts'] += 1
+            raise PoolTimeout(f"no database connection available within {DB_POOL_TIMEOUT}s (pool size {DB_POOL_MAX})")
+        self.pool_stats['checkouts'] += 1
+
+        try:
+            yield conn
+        except Exception as e:
+            mark_query_failed()
+            logger.error(f"Database operation failed: {e}")
+            raise
+        finally:
+            await self.pool.release(conn)
+
+    def get_pool_stats(self):
+        """Get connection pool counters and utilization (same keys as the threaded pool)"""
+        size = self.pool.get_size() if self.pool else 0
+        idle = self.pool.get_idle_size() if self.pool else 0
+        return dict(self.pool_stats, size=size, idle=idle, in_use=size - idle, maxconn=DB_POOL_MAX)
+
+    @timed_query
+    async def verify_schema(self) -> int:
+        """Check that every schema migration has been applied (see DatabaseManager.verify_schema)"""
+        async with self.get_connection() as conn:
+            if await conn.fetchval("SELECT to_regclass('schema_migrations')") is None:
+                applied = set()
+            else:
+                applied = {row['version'] for row in await conn.fetch("SELECT version FROM schema_migrations")}
+
+        pending = get_pending_migrations(applied)
+        if pending:
+            names = ", ".join(f"{m.version} ({m.name})" for m in pending)
+            raise RuntimeError(f"Database schema is out of date, pending migrations: {names}. Run `python migrations.py up`.")
+
+        logger.info(f"Database schema is up to date (version {LATEST_VERSION})")
+        return LATEST_VERSION
+
+    async def _insert_kudos_rows(self, conn, sender: str, receivers: list, channel_id: str, local_month: date):
+        """Insert kudos rows for every receiver and bump the monthly rollup and bot_stats (caller owns the transaction)"""
+        await conn.execute(numbered(INSERT_KUDOS_SQL), sender, channel_id, list(receivers))
+        await conn.execute(numbered(ROLLUP_UPSERT_SQL), *rollup_upsert_params(channel_id, local_month, sender, receivers))
+        await conn.execute(numbered(BOT_STATS_UPSERT_SQL), channel_id, len(receivers), sender, receivers[-1])
+
+    @timed_query
+    async def record_kudos(self, sender: str, receiver: str, channel_id: str) -> bool:
+        """Record a new kudos entry and update the monthly rollup in the same transaction"""
+        local_month = await self.get_current_local_month(channel_id)
+
+        try:
+            async with self.get_connection() as conn:
+                async with conn.transaction():
+                    await self._insert_kudos_rows(conn, sender, [receiver], channel_id, local_month)
+            logger.info(f"Kudos recorded: {sender} -> {receiver} in channel {channel_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to record kudos: {e}")
+            return False
+
+    @timed_query
+    async def record_kudos_batch(self, sender: str, receivers: list, channel_id: str, quota: int, local_month: date = None,
+                                 announcement: str = None):
+        """Record kudos for several receivers atomically, enforcing the sender's monthly quota.
+
+        Same locking, outbox write and return value as DatabaseManager.record_kudos_batch:
+        {'success': bool, 'remaining': int, 'announcement_id': int or None}, or None if the write failed.
+        """
+        if local_month is None:
+            local_month = await self.get_current_local_month(channel_id)
+
+        try:
+            async with self.get_connection() as conn:
+                async with conn.transaction():
+                    await conn.execute(numbered(QUOTA_LOCK_SQL), quota_lock_key(sender, channel_id, local_month))
+                    monthly_count = await conn.fetchval(numbered(MONTHLY_SENT_SQL), channel_id, local_month, sender) or 0
+
+                    if monthly_count + len(receivers) > quota:
+                        # Leaving the block normally commits the (empty) transaction and releases the lock
+                        return {'success': False, 'remaining': quota - monthly_count, 'announcement_id': None}
+
+                    await self._insert_kudos_rows(conn, sender, receivers, channel_id, local_month)
+                    announcement_id = None
+                    if announcement:
+                        announcement_id = await conn.fetchval(numbered(INSERT_ANNOUNCEMENT_SQL), channel_id, announcement)
+            logger.info(f"Kudos recorded: {sender} -> {', '.join(receivers)} in channel {channel_id}")
+            return {
+                'success': True,
+                'remaining': quota - monthly_count - len(receivers),
+                'announcement_id': announcement_id
+            }
+        except Exception as e:
+            logger.error(f"Failed to record kudos batch: {e}")
+            return None
+
+    @timed_query
+    async def enqueue_announcement(self, channel_id: str, text: str):
+        """Queue a channel announcement on its own; returns its outbox ID, or None on failure"""
+        try:
+            async with self.get_connection() as conn:
+                return await conn.fetchval(numbered(INSERT_ANNOUNCEMENT_SQL), channel_id, text)
+        except Exception as e:
+            logger.error(f"Failed to queue announcement for {channel_id}: {e}")
+            return None
+
+    @timed_query
+    async def get_monthly_kudos_count(self, user: str, month: int, year: int, channel_id: str) -> int:
+        """Get the number of kudos sent by a user in a specific month and channel"""
+        async with self.get_connection() as conn:
+            return await conn.fetchval(numbered(MONTHLY_SENT_SQL), channel_id, date(year, month, 1), user) or 0
+
+    @timed_query
+    async def get_monthly_kudos_received_count(self, user: str, month: int, year: int, channel_id: str) -> int:
+        """Get the number of kudos received by a user in a specific month and channel"""
+        async with self.get_connection() as conn:
+            return await conn.fetchval(numbered(MONTHLY_RECEIVED_SQL), channel_id, date(year, month, 1), user) or 0
+
+    @timed_query
+    async def get_monthly_leaderboard(self, month: int, year: int, channel_id: str, limit: int = None):
+        """Get monthly leaderboard for senders and receivers in a specific channel"""
+        # Get channel-specific limit or use global default
+        if limit is None:
+            limit = self._config_leaderboard_limit(await self.get_channel_config(channel_id))
+
+        params = (channel_id, date(year, month, 1), limit)
+        async with self.get_connection() as conn:
+            top_senders = await conn.fetch(numbered(LEADERBOARD_SENDERS_SQL), *params)
+            top_receivers = await conn.fetch(numbered(LEADERBOARD_RECEIVERS_SQL), *params)
+
+        return {
+            'senders': [tuple(row) for row in top_senders],
+            'receivers': [tuple(row) for row in top_receivers]
+        }
+
+    @timed_query
+    async def get_complete_monthly_leaderboard(self, month: int, year: int, channel_id: str):
+        """Get complete monthly leaderboard for all users who sent/received kudos (no limit)"""
+        params = (channel_id, date(year, month, 1))
+        async with self.get_connection() as conn:
+            all_senders = await conn.fetch(numbered(COMPLETE_LEADERBOARD_SENDERS_SQL), *params)
+            all_receivers = await conn.fetch(numbered(COMPLETE_LEADERBOARD_RECEIVERS_SQL), *params)
+
+        return {
+            'senders': [tuple(row) for row in all_senders],
+            'receivers': [tuple(row) for row in all_receivers]
+        }
+
+    @timed_query
+    async def get_user_stats(self, user: str, channel_id: str, local_month: date = None):
+        """Get kudos statistics for a specific user in a specific channel"""
+        if local_month is None:
+            local_month = await self.get_current_local_month(channel_id)
+
+        async with self.get_connection() as conn:
+            row = await conn.fetchrow(numbered(USER_STATS_SQL), local_month, local_month, channel_id, user)
+
+        return dict(row)
+
+    @timed_query
+    async def get_status_summary(self):
+        """Get the database side of /kk status (see DatabaseManager.get_status_summary)"""
+        async with self.get_connection() as conn:
+            channels = [row[0] for row in await conn.fetch(STATUS_CHANNELS_SQL)]
+            last_kudos = await conn.fetchrow(STATUS_LAST_KUDOS_SQL)
+            total_kudos = await conn.fetchval(STATUS_TOTAL_KUDOS_SQL)
+            config_channels = [tuple(row) for row in await conn.fetch(STATUS_CONFIG_CHANNELS_SQL)]
+            outbox_pending, outbox_failed = await conn.fetchrow(STATUS_OUTBOX_SQL)
+
+        return {
+            'channels': channels,
+            'last_kudos': tuple(last_kudos) if last_kudos else None,
+            'total_kudos': total_kudos,
+            'config_channels': config_channels,
+            'outbox': {'pending': outbox_pending, 'failed': outbox_failed}
+        }
+
+    @timed_query
+    async def rebuild_monthly_rollup(self, channel_id: str) -> int:
+        """Rebuild one channel's kudos_monthly_rollup rows from the raw kudos rows"""
+        offset_hours = self.get_timezone_offset(await self.get_channel_timezone(channel_id))
+        async with self.get_connection() as conn:
+            async with conn.transaction():
+                await conn.execute(ROLLUP_LOCK_SQL)
+                await conn.execute(numbered(ROLLUP_DELETE_SQL), channel_id)
+                await conn.execute(numbered(ROLLUP_INSERT_SQL), offset_hours, channel_id, offset_hours, channel_id)
+        logger.info(f"Monthly rollup rebuilt for channel {channel_id}")
+        return 1
+
+    async def get_channel_config(self, channel_id: str):
+        """Get configuration for a specific channel (served from the in-process cache when fresh)"""
+        hit, config, generation = self.config_cache.lookup(channel_id)
+        if hit:
+            return config
+
+        return self._cache_channel_config(channel_id, await self._select_channel_config(channel_id), generation)
+
+    async def warm_channel_config_cache(self) -> int:
+        """Load every channel config into the cache with a single query"""
+        generation = self.config_cache.generation()
+        return self._cache_channel_configs(await self._select_channel_configs(CONFIG_CACHE_SIZE), generation)
+
+    @timed_query
+    async def _select_channel_config(self, channel_id: str):
+        async with self.get_connection() as conn:
+            return await conn.fetchrow(numbered(CHANNEL_CONFIG_SQL), channel_id)
+
+    @timed_query
+    async def _select_channel_configs(self, limit: int):
+        async with self.get_connection() as conn:
+            return await conn.fetch(numbered(CHANNEL_CONFIGS_SQL), limit)
+
+    @timed_query
+    async def save_channel_config(self, channel_id: str, personality_name: str = None,
+                                  monthly_quota: int = None, leaderboard_channel_id: str = None,
+                                  leaderboard_limit: int = None, timezone: str = None):
+        """Save or update channel configuration using UPSERT"""
+        try:
+            previous_timezone = await self.get_channel_timezone(channel_id)
+            async with self.get_connection() as conn:
+                await conn.execute(numbered(SAVE_CHANNEL_CONFIG_SQL), channel_id, personality_name, monthly_quota,
+                                   leaderboard_channel_id, leaderboard_limit, timezone)
+            self.config_cache.invalidate(channel_id)
+            logger.info(f"Channel config saved for {channel_id}: personality={personality_name}, quota={monthly_quota}, leaderboard={leaderboard_channel_id}, limit={leaderboard_limit}, timezone={timezone}")
+        except Exception as e:
+            logger.error(f"Failed to save channel config: {e}")
+            return False
+        
+        await self._rebuild_rollup_if_timezone_changed(channel_id, previous_timezone)
+        return True
+
+    @timed_query
+    async def delete_channel_config(self, channel_id: str):
+        """Delete channel configuration to reset to defaults"""
+        try:
+            previous_timezone = await self.get_channel_timezone(channel_id)
+            async with self.get_connection() as conn:
+                await conn.execute(numbered(DELETE_CHANNEL_CONFIG_SQL), channel_id)
+            self.config_cache.invalidate(channel_id)
+            logger.info(f"Channel config deleted for {channel_id}")
+        except Exception as e:
+            logger.error(f"Failed to delete channel config: {e}")
+            return False
+        
+        await self._rebuild_rollup_if_timezone_changed(channel_id, previous_timezone)
+        return True
+
+    async def _rebuild_rollup_if_timezone_changed(self, channel_id: str, previous_timezone: str):
+        """Re-bucket a channel's rollup into local months when its timezone changes (never raises, see StorageBackend)"""
+        try:
+            if await self.get_channel_timezone(channel_id) == previous_timezone:
+                return
+            await self.rebuild_monthly_rollup(channel_id)
+        except Exception as e:
+            logger.error(f"Failed to rebuild monthly rollup for {channel_id} after timezone change: {e}")
+
+    async def get_effective_leaderboard_channel(self, channel_id: str):
+        """Get the effective leaderboard channel for a given channel (handles overrides)"""
+        return self._config_leaderboard_channel(channel_id, await self.get_channel_config(channel_id))
+
+    @timed_query
+    async def get_channels_using_leaderboard(self, channel_id: str):
+        """Get channels whose leaderboard override points at the given channel"""
+        async with self.get_connection() as conn:
+            rows = await conn.fetch(numbered(CHANNELS_USING_LEADERBOARD_SQL), channel_id)
+        return [row[0] for row in rows]
+
+    async def get_channel_timezone(self, channel_id: str):
+        """Get the timezone for a channel, falling back to global default"""
+        return self._config_timezone(await self.get_channel_config(channel_id))
+
+    async def get_current_month_year_in_timezone(self, channel_id: str):
+        """Get current month and year in the channel's timezone"""
+        return self._local_month_year(await self.get_channel_timezone(channel_id))
+
+    async def get_current_local_month(self, channel_id: str):
+        """Get the first day of the current month in the channel's timezone (the rollup key)"""
+        month, year = await self.get_current_month_year_in_timezone(channel_id)
+        return date(year, month, 1)
+
+    async def close(self):
+        """Close the connection pool, waiting for checked-out connections to be released"""
+        if self.pool:
+            await self.pool.close()
+            logger.info("Async database connection pool closed")
+
+
+# Global async database manager instance
+async_db_manager = None
+
+def get_async_db_manager():
+    """Get the global async database manager (call initialize() inside the event loop before use)"""
+    global async_db_manager
+    if async_db_manager is None:
+        async_db_manager = AsyncDatabaseManager()
+    return async_db_manager
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+asyncio entry point for Kiitos Krab.
+
+Runs the same /kk commands on Bolt's AsyncApp with asyncpg and Slack's
+AsyncWebClient, so a single process keeps many commands in flight while
+they wait on Slack or the database instead of tying up one thread each.
+Needs the extra packages in requirements-async.txt:
+  pip install -r requirements-async.txt
+  python async_kudos_bot.py
+"""
+import asyncio
+import os
+import logging
+from dotenv import load_dotenv
+
+# Load environment variables BEFORE reading any settings
+load_dotenv()
+
+from aiohttp import web
+from slack_bolt.async_app import AsyncApp
+from async_database import get_async_db_manager
+from config.personalities import get_personality_registry
+from config.settings import DEFAULT_PORT, METRICS_ENABLED
+from handlers.help_handler import get_app_mention_message, get_subcommand
+from handlers import async_handlers
+from models.channel_context import ChannelContext
+from utils.announcement_dispatcher import get_announcement_dispatcher
+from utils.async_slack_client import AsyncRateLimitedClient
+from utils.channel_index import get_channel_index
+from utils import metrics
+from utils.slack_client import RateLimitedClient
+from version import VERSION
+
+# Configure logging
+log_level = os.environ.get("LOG_LEVEL", "INFO").upper()
+numeric_level = getattr(logging, log_level, logging.INFO)
+logging.basicConfig(
+    level=numeric_level,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Initialize Slack app
+app = AsyncApp(
+    client=AsyncRateLimitedClient(token=os.environ.get("SLACK_BOT_TOKEN")),
+    signing_secret=os.environ.get("SLACK_SIGNING_SECRET")
+)
+
+# Load and validate every personality once, so formatters never touch the disk
+get_personality_registry()
+
+# The pool is created on startup, inside the server's event loop
+db_manager = get_async_db_manager()
+
+
+async def on_startup(web_app):
+    """Open the pool, verify the schema and warm the config cache before taking requests"""
+    await db_manager.initialize()
+    await db_manager.verify_schema()
+    try:
+        await db_manager.warm_channel_config_cache()
+    except Exception as e:
+        logger.warning(f"Failed to warm channel config cache: {e}")
+
+    # Queued announcements are posted by the threaded dispatcher, with its own (psycopg2) connections,
+    # and the channel name index is built on a thread too, so lookups never page on the event loop
+    sync_client = RateLimitedClient(token=os.environ.get("SLACK_BOT_TOKEN"))
+    dispatcher = get_announcement_dispatcher(sync_client)
+    dispatcher.start()
+    get_channel_index(sync_client).start()
+
+    # Partition DDL is rare enough to leave on the threaded manager too
+    try:
+        await asyncio.to_thread(dispatcher.db_manager.ensure_kudos_partitions)
+    except Exception as e:
+        logger.warning(f"Failed to create upcoming kudos partitions: {e}")
+
+
+async def on_cleanup(web_app):
+    """Stop the dispatcher and drain the pools once in-flight requests have finished"""
+    get_channel_index().stop()
+    dispatcher = get_announcement_dispatcher()
+    await asyncio.to_thread(dispatcher.stop)
+    dispatcher.db_manager.close()
+    await db_manager.close()
+
+
+@app.middleware
+async def use_rate_limited_client(context, next):
+    """Hand listeners the shared rate-limited client instead of Bolt's plain per-request AsyncWebClient"""
+    context["client"] = app.client
+    return await next()
+
+
+@app.middleware
+async def log_request(logger, body, next):
+    """Log incoming requests for debugging"""
+    request_type = body.get('type', 'unknown')
+
+    # Log health checks at DEBUG level to reduce noise
+    if request_type == 'url_verification':
+        logger.debug(f"🌊 Slack URL verification challenge received: {body.get('challenge', 'no challenge')}")
+    else:
+        logger.info(f"🦀 Incoming request: {request_type}")
+
+    return await next()
+
+
+@app.command("/kk")
+async def handle_kudos_command_wrapper(ack, command, respond, client, context):
+    """Handle the /kk slash command, timing the ack and the work per subcommand"""
+    subcommand = get_subcommand(command["text"].strip())
+    with metrics.time_command(subcommand, "ack"):
+        await ack()  # Always acknowledge the command first
+    with metrics.time_command(subcommand, "process"):
+        await dispatch_kudos_command(command, respond, client, context)
+
+
+async def dispatch_kudos_command(command, respond, client, context):
+    """Run the subcommand (or kudos) a /kk command asks for"""
+    user_id = command["user_id"]
+    text = command["text"].strip()
+    channel_id = command.get("channel_id")
+
+    # Check if it's a dedicated command (first word is a command)
+    words = text.split()
+    first_word = words[0].lower() if words else ""
+
+    if first_word == "version":
+        await respond(f"📦 *Kiitos Krab Version:* {VERSION}")
+        return
+    if first_word == "config" and len(words) > 1 and words[1].lower() == "edit":
+        await async_handlers.handle_config_command(command, client, db_manager)
+        return
+    if first_word == "config" and len(words) > 1 and words[1].lower() == "default":
+        await async_handlers.reset_config_to_defaults(respond, channel_id, db_manager)
+        return
+
+    # Everything else needs the channel's config - resolve it once for the whole request
+    channel_context = await ChannelContext.resolve_async(channel_id, db_manager)
+
+    if first_word == "leaderboard":
+        await async_handlers.handle_leaderboard_command(respond, db_manager, client, text[len("leaderboard"):].strip(), channel_id, channel_context)
+    elif first_word == "stats":
+        await async_handlers.handle_stats_command(user_id, respond, db_manager, channel_id, channel_context)
+    elif first_word == "config":
+        await async_handlers.show_current_config(respond, channel_id, db_manager, channel_context)
+    elif first_word == "status":
+        await async_handlers.handle_status_command(respond, channel_id, db_manager, client, channel_context)
+    elif first_word == "help" or len(words) == 1:
+        # A single word that's not a recognized command also shows help
+        await async_handlers.show_help_message(respond, channel_id, db_manager, channel_context)
+    else:
+        # Bolt's authorization already looked up (and cached) the bot user ID
+        await async_handlers.handle_kudos_command(command, respond, client, db_manager, context.bot_user_id, channel_context)
+
+
+@app.event("app_mention")
+async def handle_app_mention(event, say):
+    """Handle when the bot is mentioned"""
+    channel_context = await ChannelContext.resolve_async(event.get('channel'), db_manager)
+    await say(get_app_mention_message(context=channel_context))
+
+
+@app.event("channel_created")
+async def handle_channel_created(event):
+    """Add a new public channel to the channel name index"""
+    get_channel_index().set_channel(event["channel"]["id"], event["channel"]["name"])
+
+
+@app.event("channel_rename")
+async def handle_channel_rename(event):
+    """Re-index a renamed channel under its new name"""
+    get_channel_index().set_channel(event["channel"]["id"], event["channel"]["name"])
+
+
+@app.event("channel_deleted")
+async def handle_channel_deleted(event):
+    """Drop a deleted channel from the channel name index"""
+    get_channel_index().remove_channel(event["channel"])
+
+
+@app.action("personality_select")
+async def handle_personality_select_wrapper(ack, body, client):
+    """Handle personality dropdown selection"""
+    await ack()
+    await async_handlers.handle_personality_select(body, client)
+
+
+@app.view("config_modal")
+async def handle_config_modal_submission_wrapper(ack, body, client):
+    """Handle configuration modal submission"""
+    await ack()
+    await async_handlers.handle_config_modal_submission(body, client, db_manager)
+
+
+async def serve_metrics(request):
+    """Serve this process's metrics in the Prometheus text format"""
+    body = metrics.render(metrics.collect_all()).encode("utf-8")
+    return web.Response(body=body, headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+def create_web_app():
+    """Build the aiohttp application serving Slack requests at /slack/events (and metrics at /metrics)"""
+    web_app = app.web_app(path="/slack/events")
+    if METRICS_ENABLED:
+        web_app.router.add_get("/metrics", serve_metrics)
+    web_app.on_startup.append(on_startup)
+    web_app.on_cleanup.append(on_cleanup)
+    return web_app
+
+
+if __name__ == "__main__":
+    port = DEFAULT_PORT
+    print(f"🦀 Starting Kiitos Krab (asyncio) on port {port}...")
+    web.run_app(create_web_app(), port=port)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark: threaded handlers vs the asyncio stack.
+
+Runs the same mix of /kk commands (kudos and stats) through the threaded
+handlers on a thread pool and through the async handlers on one event loop,
+against a real database and the same number of DB connections. Slack API
+calls (response_url, and announcements posted by the outbox dispatcher) are
+simulated with a fixed latency, since waiting on Slack is what ties up
+threads in production.
+
+Needs a migrated, disposable database (kudos are written to a dedicated
+channel and deleted afterwards) and the packages in requirements-async.txt.
+
+Usage:
+  BENCH_DATABASE_URL=postgresql://... python benchmarks/async_vs_threaded.py
+  python benchmarks/async_vs_threaded.py --commands 1000 --threads 8 --concurrency 200 --slack-latency-ms 150
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+BENCH_CHANNEL = "CBENCHASYNC"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(name, latencies, elapsed):
+    return {
+        "mode": name,
+        "commands": len(latencies),
+        "elapsed_s": elapsed,
+        "throughput_per_s": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "max_ms": max(latencies) * 1000
+    }
+
+
+def build_commands(count, prefix):
+    """Alternate kudos and stats commands from distinct senders so no quota is hit"""
+    commands = []
+    for i in range(count):
+        sender = f"U{prefix}{i:06d}"
+        text = f"<@URECV{i % 25:03d}> thanks for the help!" if i % 2 == 0 else "stats"
+        commands.append({"user_id": sender, "text": text, "channel_id": BENCH_CHANNEL})
+    return commands
+
+
+class FakeClient:
+    """Stands in for slack_sdk's WebClient, taking slack_latency per call"""
+
+    def __init__(self, slack_latency):
+        self.slack_latency = slack_latency
+
+    def auth_test(self):
+        return {"user_id": "UBENCHBOT"}
+
+    def chat_postMessage(self, **kwargs):
+        time.sleep(self.slack_latency)
+
+
+def start_dispatcher(client, db_manager):
+    """Run a fresh announcement dispatcher thread, as the servers do"""
+    from utils import announcement_dispatcher
+    announcement_dispatcher.announcement_dispatcher = None
+    dispatcher = announcement_dispatcher.get_announcement_dispatcher(client, db_manager)
+    dispatcher.start()
+    return dispatcher
+
+
+def run_threaded(commands, threads, slack_latency):
+    from concurrent.futures import ThreadPoolExecutor
+    from database import get_db_manager
+    from handlers.kudos_handler import handle_kudos_command
+    from handlers.stats_handler import handle_stats_command
+
+    db_manager = get_db_manager()
+
+    class FakeApp:
+        client = FakeClient(slack_latency)
+
+    dispatcher = start_dispatcher(FakeApp.client, db_manager)
+
+    def respond(message, **kwargs):
+        time.sleep(slack_latency)
+
+    def run_one(command):
+        start = time.perf_counter()
+        if command["text"] == "stats":
+            handle_stats_command(command["user_id"], respond, db_manager, command["channel_id"])
+        else:
+            handle_kudos_command(command, None, respond, FakeApp(), db_manager)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = list(executor.map(run_one, commands))
+    elapsed = time.perf_counter() - start
+
+    dispatcher.stop()
+    db_manager.close()
+    return summarize(f"threaded ({threads} threads)", latencies, elapsed)
+
+
+def run_async(commands, concurrency, slack_latency):
+    import asyncio
+    from async_database import AsyncDatabaseManager
+    from database import DatabaseManager
+    from handlers import async_handlers
+
+    class FakeAsyncClient:
+        async def chat_postMessage(self, **kwargs):
+            await asyncio.sleep(slack_latency)
+
+    async def respond(message, **kwargs):
+        await asyncio.sleep(slack_latency)
+
+    async def main():
+        db_manager = AsyncDatabaseManager()
+        await db_manager.initialize()
+        # async_kudos_bot.py posts announcements from the threaded dispatcher too
+        dispatcher_db_manager = DatabaseManager()
+        dispatcher = start_dispatcher(FakeClient(slack_latency), dispatcher_db_manager)
+        client = FakeAsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(command):
+            async with semaphore:
+                start = time.perf_counter()
+                if command["text"] == "stats":
+                    await async_handlers.handle_stats_command(command["user_id"], respond, db_manager, command["channel_id"])
+                else:
+                    await async_handlers.handle_kudos_command(command, respond, client, db_manager, "UBENCHBOT")
+                return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*[run_one(command) for command in commands])
+        elapsed = time.perf_counter() - start
+
+        await asyncio.to_thread(dispatcher.stop)
+        dispatcher_db_manager.close()
+        await db_manager.close()
+        return summarize(f"asyncio ({concurrency} in flight)", latencies, elapsed)
+
+    return asyncio.run(main())
+
+
+def cleanup():
+    from database import DatabaseManager
+    db_manager = DatabaseManager()
+    with db_manager.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM kudos WHERE channel_id = %s", (BENCH_CHANNEL,))
+            cursor.execute("DELETE FROM kudos_monthly_rollup WHERE channel_id = %s", (BENCH_CHANNEL,))
+            cursor.execute("DELETE FROM announcement_outbox WHERE channel_id = %s", (BENCH_CHANNEL,))
+            cursor.execute("DELETE FROM bot_stats WHERE channel_id = %s", (BENCH_CHANNEL,))
+            conn.commit()
+    db_manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare threaded and asyncio command throughput")
+    parser.add_argument("--commands", type=int, default=500, help="commands per mode (default: 500)")
+    parser.add_argument("--threads", type=int, default=8, help="threads for the threaded path (default: 8)")
+    parser.add_argument("--concurrency", type=int, default=200, help="in-flight commands for the asyncio path (default: 200)")
+    parser.add_argument("--pool-size", type=int, default=4, help="DB connections for both paths (default: 4)")
+    parser.add_argument("--slack-latency-ms", type=float, default=100, help="simulated Slack API latency (default: 100)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    database_url = os.environ.get("BENCH_DATABASE_URL") or os.environ.get("DATABASE_URL")
+    if not database_url:
+        print("❌ Set BENCH_DATABASE_URL (or DATABASE_URL) to a migrated, disposable database")
+        sys.exit(1)
+
+    # Settings are read at import time, so configure both pools before importing the app
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["DB_POOL_MAX"] = str(args.pool_size)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+
+    slack_latency = args.slack_latency_ms / 1000
+    try:
+        results = [
+            run_threaded(build_commands(args.commands, "T"), args.threads, slack_latency),
+            run_async(build_commands(args.commands, "A"), args.concurrency, slack_latency)
+        ]
+    finally:
+        cleanup()
+
+    speedup = results[1]["throughput_per_s"] / results[0]["throughput_per_s"]
+    if args.json:
+        print(json.dumps({"results": results, "speedup": speedup, "pool_size": args.pool_size,
+                          "slack_latency_ms": args.slack_latency_ms}, indent=2))
+        return
+
+    print(f"🦀 {args.commands} commands per mode, {args.pool_size} DB connections, {args.slack_latency_ms:.0f} ms simulated Slack latency")
+    for result in results:
+        print(
+            f"   {result['mode']:<28} {result['throughput_per_s']:8.1f} cmd/s   "
+            f"p50 {result['p50_ms']:7.1f} ms   p95 {result['p95_ms']:7.1f} ms   max {result['max_ms']:7.1f} ms"
+        )
+    print(f"   asyncio throughput: {speedup:.1f}x threaded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+JSON baselines for the benchmark suites, and tolerance-based diffing against them.
+
+A baseline file holds one entry per benchmark with its metrics, e.g.
+  {"created_at": ..., "python": ..., "machine": ..., "results": {"parse_month_year[full]": {"median_us": 1.9}}}
+
+A metric regresses when it grows by more than its tolerance (a fraction of
+the baseline value) and by more than its absolute floor, so microsecond
+jitter on tiny numbers doesn't fail a run.
+"""
+
+import json
+import platform
+from datetime import datetime
+from pathlib import Path
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+
+def load_baseline(path):
+    """Load a baseline file, or None if there isn't one yet"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, results, **metadata):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    baseline = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}",
+        **metadata,
+        "results": results
+    }
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def diff_results(results, baseline, tolerances, floors=None):
+    """
+    Compare results against a baseline.
+
+    Args:
+        results (dict): name -> {metric: value}
+        baseline (dict): A loaded baseline file (or None)
+        tolerances (dict): metric -> allowed relative growth (0.25 = 25% slower is still ok)
+        floors (dict): metric -> absolute growth that is always ok
+
+    Returns:
+        list: One dict per (name, metric) with baseline, current, change and
+            status ('ok', 'regressed', 'improved', 'new')
+    """
+    floors = floors or {}
+    previous = (baseline or {}).get("results", {})
+    rows = []
+    for name, metrics in results.items():
+        for metric, tolerance in tolerances.items():
+            if metric not in metrics:
+                continue
+            current = metrics[metric]
+            before = previous.get(name, {}).get(metric)
+            if before is None:
+                rows.append({"name": name, "metric": metric, "baseline": None, "current": current, "change": None, "status": "new"})
+                continue
+
+            growth = current - before
+            change = growth / before if before else 0.0
+            if growth > before * tolerance and growth > floors.get(metric, 0):
+                status = "regressed"
+            elif -growth > before * tolerance and -growth > floors.get(metric, 0):
+                status = "improved"
+            else:
+                status = "ok"
+            rows.append({"name": name, "metric": metric, "baseline": before, "current": current, "change": change, "status": status})
+    return rows
+
+
+STATUS_ICONS = {"ok": "  ", "regressed": "❌", "improved": "🚀", "new": "🆕"}
+
+
+def print_diff(rows, unit_by_metric=None):
+    """Print a diff table, one line per (name, metric)"""
+    unit_by_metric = unit_by_metric or {}
+    width = max((len(row["name"]) for row in rows), default=0)
+    for row in rows:
+        unit = unit_by_metric.get(row["metric"], "")
+        current = f"{row['current']:,.2f}{unit}"
+        if row["baseline"] is None:
+            print(f" {STATUS_ICONS[row['status']]} {row['name']:<{width}}  {row['metric']:<10} {current:>14}   (no baseline)")
+        else:
+            baseline = f"{row['baseline']:,.2f}{unit}"
+            print(f" {STATUS_ICONS[row['status']]} {row['name']:<{width}}  {row['metric']:<10} {current:>14}   baseline {baseline:>14}   {row['change']:+7.1%}")
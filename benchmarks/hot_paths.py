@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the per-command hot paths of Kiitos Krab.
+
+Times the pure-Python work every /kk command does - parsing leaderboard
+parameters and month/year text, extracting mentions, every format_*
+function in utils/message_formatter.py and personality loading - in the
+style of pytest-benchmark: each case is calibrated to a minimum round time,
+run for several rounds, and reported as min/median/stddev per call.
+
+Results are compared against benchmarks/baselines/hot_paths.json, and the
+run fails if a case's fastest round is more than --tolerance (and --floor-us)
+slower (the minimum is far less sensitive to a noisy machine than the median).
+The baseline is first scaled up by a calibration workload timed in both runs,
+so a machine that is busier or slower overall doesn't fail every case, and a case
+only fails if it is still too slow when rerun --confirm more times. Timings are
+machine-specific: refresh the baseline on the machine that enforces it.
+
+Usage:
+  python benchmarks/hot_paths.py
+  python benchmarks/hot_paths.py --filter format_ --rounds 30
+  python benchmarks/hot_paths.py --update-baseline
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from baseline_diff import BASELINE_DIR, diff_results, load_baseline, print_diff, save_baseline
+
+BASELINE_PATH = BASELINE_DIR / "hot_paths.json"
+
+
+def build_cases():
+    """Get name -> zero-argument callable for every benchmarked hot path"""
+    from config.personalities import PersonalityRegistry, load_personality
+    from handlers.leaderboard_handler import parse_leaderboard_params
+    from utils import message_formatter
+    from utils.date_parser import parse_month_year
+    from utils.user_utils import extract_user_mentions
+
+    cases = {
+        "parse_leaderboard_params[empty]": lambda: parse_leaderboard_params(""),
+        "parse_leaderboard_params[flags]": lambda: parse_leaderboard_params("public complete"),
+        "parse_leaderboard_params[escaped channel + date]": lambda: parse_leaderboard_params("<#C0123456789|team-crabs> march 2024 public"),
+        "parse_leaderboard_params[raw channel + date]": lambda: parse_leaderboard_params("#team-crabs complete 03 24"),
+
+        "parse_month_year[empty]": lambda: parse_month_year(""),
+        "parse_month_year[month name + year]": lambda: parse_month_year("March 2024"),
+        "parse_month_year[numeric]": lambda: parse_month_year("03 24"),
+
+        "extract_user_mentions[one]": lambda: extract_user_mentions("<@U0123456789> thanks for the review!"),
+        "extract_user_mentions[five, with names]": lambda: extract_user_mentions(
+            " ".join(f"<@U012345678{i}|person{i}>" for i in range(5)) + " thanks for shipping the release together!"
+        ),
+
+        "load_personality[default]": lambda: load_personality(),
+        "load_personality[named]": lambda: load_personality("marvin"),
+        "load_personality[unknown falls back]": lambda: load_personality("does-not-exist"),
+        "PersonalityRegistry.load_all[cold]": lambda: PersonalityRegistry().load_all(),
+    }
+
+    leaderboard = {
+        "senders": [(f"U{i:010d}", 20 - i) for i in range(10)],
+        "receivers": [(f"U{i:010d}", 30 - i) for i in range(10)]
+    }
+    receivers = [f"U{i:010d}" for i in range(3)]
+    formatter_cases = {
+        "format_leaderboard": {
+            "three channels": lambda: message_formatter.format_leaderboard(leaderboard, 3, 2024, "C01", shared_channels=["C01", "C02", "C03"]),
+            "empty": lambda: message_formatter.format_leaderboard({"senders": [], "receivers": []}, 3, 2024, "C01", shared_channels=["C01"])
+        },
+        "format_kudos_announcement": {
+            "single": lambda: message_formatter.format_kudos_announcement("U0000000001", receivers[:1], "thanks for the help!"),
+            "multiple": lambda: message_formatter.format_kudos_announcement("U0000000001", receivers, "thanks for the help!")
+        },
+        "format_kudos_confirmation": {
+            "single": lambda: message_formatter.format_kudos_confirmation(1, 9),
+            "multiple": lambda: message_formatter.format_kudos_confirmation(3, 7)
+        },
+        "format_stats_message": {
+            "": lambda: message_formatter.format_stats_message("U0000000001", 3, 5, 10, 42, 57)
+        },
+        "format_error_message": {
+            "quota_exceeded": lambda: message_formatter.format_error_message("quota_exceeded", kudos_needed=3, remaining=1),
+            "unknown falls back": lambda: message_formatter.format_error_message("not-an-error-type")
+        }
+    }
+
+    # Every formatter must be covered, so a new one can't slip in unbenchmarked
+    formatters = {name for name in dir(message_formatter) if name.startswith("format_") and callable(getattr(message_formatter, name))}
+    missing = formatters - set(formatter_cases)
+    if missing:
+        raise RuntimeError(f"no benchmark cases for {', '.join(sorted(missing))} - add them to formatter_cases")
+
+    for name, variants in formatter_cases.items():
+        for variant, func in variants.items():
+            cases[f"{name}[{variant}]" if variant else name] = func
+    return cases
+
+
+def calibration_workload():
+    """Fixed pure-Python work (string building, sorting, dict lookups) to gauge the machine's current speed"""
+    words = {str(i): i for i in range(200)}
+    return sorted(words, key=words.get, reverse=True)
+
+
+def time_loops(func, loops):
+    start = time.perf_counter()
+    for _ in range(loops):
+        func()
+    return time.perf_counter() - start
+
+
+def run_case(func, rounds, min_round_time):
+    """Calibrate loops per round to min_round_time, then time rounds of them (GC off, like timeit)"""
+    func()  # warm up caches and lazy imports
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        loops = 1
+        while True:
+            elapsed = time_loops(func, loops)
+            if elapsed >= min_round_time:
+                break
+            loops = max(loops * 2, int(loops * min_round_time / elapsed) + 1) if elapsed > 0 else loops * 10
+        per_call = [time_loops(func, loops) / loops * 1e6 for _ in range(rounds)]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    return {
+        "loops": loops,
+        "rounds": rounds,
+        "min_us": round(min(per_call), 4),
+        "median_us": round(statistics.median(per_call), 4),
+        "stddev_us": round(statistics.stdev(per_call), 4) if rounds > 1 else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark the command hot paths against a JSON baseline")
+    parser.add_argument("--rounds", type=int, default=15, help="timed rounds per case (default: 15)")
+    parser.add_argument("--min-round-ms", type=float, default=20, help="minimum duration of one round (default: 20)")
+    parser.add_argument("--filter", help="only run cases whose name contains this")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown vs the baseline (default: 0.5 = 50%%)")
+    parser.add_argument("--floor-us", type=float, default=2.0, help="slowdown in µs that is always allowed (default: 2.0)")
+    parser.add_argument("--confirm", type=int, default=2, help="reruns a regressed case needs to fail every time (default: 2)")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="baseline file (default: benchmarks/baselines/hot_paths.json)")
+    parser.add_argument("--update-baseline", action="store_true", help="write this run's results as the new baseline")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    # Time the code, not the log handler: several hot paths log every call at INFO
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import logging
+    logging.basicConfig(level=getattr(logging, os.environ["LOG_LEVEL"].upper(), logging.WARNING))
+
+    cases = build_cases()
+    if args.filter:
+        cases = {name: func for name, func in cases.items() if args.filter in name}
+
+    min_round_time = args.min_round_ms / 1000
+    calibration_us = run_case(calibration_workload, args.rounds, min_round_time)["min_us"]
+    results = {name: run_case(func, args.rounds, min_round_time) for name, func in cases.items()}
+
+    if args.update_baseline:
+        baseline = load_baseline(args.baseline) or {}
+        save_baseline(args.baseline, {**baseline.get("results", {}), **results}, calibration_us=calibration_us)
+        print(f"✅ Baseline written to {args.baseline} ({len(results)} cases)")
+        return
+
+    baseline = load_baseline(args.baseline)
+    speed = calibration_us / baseline["calibration_us"] if baseline and baseline.get("calibration_us") else 1.0
+    # Only ever relax the baseline: a calibration round that happened to run fast must not tighten every case
+    speed = max(speed, 1.0)
+    if baseline:
+        # Expect every case to be as much slower than its baseline as the calibration workload is
+        baseline = {**baseline, "results": {
+            name: {metric: value * speed for metric, value in metrics.items()}
+            for name, metrics in baseline["results"].items()
+        }}
+
+    def compare():
+        return diff_results(results, baseline, {"min_us": args.tolerance}, floors={"min_us": args.floor_us})
+
+    rows = compare()
+    for _ in range(args.confirm):
+        suspects = [row["name"] for row in rows if row["status"] == "regressed"]
+        if not suspects:
+            break
+        # A one-off stall shouldn't fail the run: keep each suspect's fastest result over every run
+        for name in suspects:
+            rerun = run_case(cases[name], args.rounds, min_round_time)
+            if rerun["min_us"] < results[name]["min_us"]:
+                results[name] = rerun
+        rows = compare()
+
+    if args.json:
+        print(json.dumps({"results": results, "calibration_us": calibration_us, "speed": speed, "diff": rows}, indent=2))
+    else:
+        print(
+            f"🦀 {len(results)} hot path cases, {args.rounds} rounds each (fastest round per call vs baseline, "
+            f"tolerance {args.tolerance:.0%} and {args.floor_us:g} µs, machine at {speed:.2f}x the baseline's calibration time)"
+        )
+        print_diff(rows, {"min_us": " µs"})
+
+    regressed = [row for row in rows if row["status"] == "regressed"]
+    if regressed:
+        print(f"❌ {len(regressed)} case(s) slower than the baseline allows: {', '.join(row['name'] for row in regressed)}")
+        sys.exit(1)
+    print("✅ No hot path regressions")
+
+
+if __name__ == "__main__":
+    main()
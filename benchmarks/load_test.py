@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test for Kiitos Krab.
+
+Sends a mix of signed /kk slash commands and interaction payloads through
+kudos_bot.app's dispatch (the entry point wsgi.py and Lambda use) from a
+pool of client threads, with lazy listeners, the announcement dispatcher and
+the channel index all running as they do in a server. Everything runs
+offline:
+  - Slack is a local fake Web API server (SLACK_API_BASE_URL) that records
+    every API call and response_url post, taking --slack-latency-ms each
+  - Postgres is a throwaway cluster started with initdb/pg_ctl (found on
+    PATH, PG_BIN or pg_config --bindir), or a throwaway database created on
+    BENCH_DATABASE_URL's server, migrated first and dropped afterwards -
+    or, with --sqlite, an embedded SQLite file in a temporary directory
+
+Reports throughput and p50/p95/p99 latency per command type, both for the
+ack (what Slack waits on) and for completion (until the command's reply -
+its response_url post, modal open or modal update - reaches the fake Slack),
+and exits non-zero over --max-p95-ms or under --min-throughput so CI can
+catch regressions before deploy.
+
+Usage:
+  python benchmarks/load_test.py
+  python benchmarks/load_test.py --requests 2000 --concurrency 16 --mix kudos=50,leaderboard=20,stats=15,config=10,status=5
+  BENCH_DATABASE_URL=postgresql://postgres@localhost/postgres python benchmarks/load_test.py --max-p95-ms 500 --json
+  python benchmarks/load_test.py --sqlite
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SIGNING_SECRET = "load-test-signing-secret"
+BOT_USER_ID = "UBENCHBOT"
+DEFAULT_MIX = "kudos=60,leaderboard=15,stats=15,config=5,status=5"
+COMMAND_TYPES = ("kudos", "leaderboard", "stats", "config", "status")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def parse_mix(value):
+    """Parse 'kudos=60,stats=40' into {command type: weight}"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in COMMAND_TYPES:
+            raise argparse.ArgumentTypeError(f"unknown command type '{name}' (choose from {', '.join(COMMAND_TYPES)})")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid weight for {name}: '{weight}'")
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError("the mix needs at least one positive weight")
+    return mix
+
+
+class FakeSlack:
+    """Local stand-in for the Slack Web API and response_url endpoints.
+
+    Every call is recorded. Replies addressed to a request - a post to
+    /respond/<n>, or views.open/views.update with trigger T<n>/view V<n> -
+    mark request n complete.
+    """
+
+    def __init__(self, latency=0.0, channels=()):
+        self.latency = latency
+        self.channels = list(channels)
+        self.calls = {}  # method -> count
+        self.completed_at = {}  # request number -> perf_counter of its first reply
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-slack", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def record(self, method, request_number=None):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            if request_number is not None and request_number not in self.completed_at:
+                self.completed_at[request_number] = time.perf_counter()
+
+    def api_response(self, method, args):
+        """A minimal successful response for each method the bot calls"""
+        if method == "auth.test":
+            return {"ok": True, "user_id": BOT_USER_ID, "bot_id": "BBENCH", "team_id": "TBENCH", "user": "kiitos-krab"}
+        if method == "conversations.list":
+            return {"ok": True, "channels": [{"id": c, "name": c.lower()} for c in self.channels],
+                    "response_metadata": {"next_cursor": ""}}
+        if method == "conversations.info":
+            channel = args.get("channel", "")
+            return {"ok": True, "channel": {"id": channel, "name": channel.lower(), "is_private": False}}
+        if method == "users.info":
+            return {"ok": True, "user": {"id": args.get("user", ""), "name": args.get("user", "").lower()}}
+        if method == "chat.postMessage":
+            return {"ok": True, "channel": args.get("channel"), "ts": f"{time.time():.6f}"}
+        return {"ok": True}
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length).decode("utf-8") if length else ""
+                if fake.latency:
+                    time.sleep(fake.latency)
+
+                if self.path.startswith("/respond/"):
+                    fake.record("response_url", int(self.path.rsplit("/", 1)[1]))
+                    self._reply(200, "text/plain", b"ok")
+                    return
+
+                method = self.path.rsplit("/", 1)[-1]
+                if "json" in (self.headers.get("Content-Type") or ""):
+                    args = json.loads(raw or "{}")
+                else:
+                    args = {key: values[0] for key, values in parse_qs(raw).items()}
+                tag = args.get("view_id") or args.get("trigger_id") or ""
+                fake.record(method, int(tag[1:]) if tag[:1] in ("V", "T") and tag[1:].isdigit() else None)
+                self._reply(200, "application/json", json.dumps(fake.api_response(method, args)).encode())
+
+            def _reply(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class DisposablePostgres:
+    """A throwaway database: a fresh initdb cluster, or a new database on an existing server"""
+
+    def __init__(self, server_url=None):
+        self.server_url = server_url
+        self.url = None
+        self._data_dir = None
+        self._bin_dir = None
+        self._database = f"kudos_load_{os.getpid()}"
+
+    @staticmethod
+    def find_bin_dir():
+        if os.environ.get("PG_BIN"):
+            return os.environ["PG_BIN"]
+        initdb = shutil.which("initdb")
+        if initdb:
+            return os.path.dirname(initdb)
+        pg_config = shutil.which("pg_config")
+        if pg_config:
+            return subprocess.run([pg_config, "--bindir"], capture_output=True, text=True, check=True).stdout.strip()
+        return None
+
+    def start(self):
+        import psycopg2
+
+        if self.server_url is None:
+            self._bin_dir = self.find_bin_dir()
+            if not self._bin_dir:
+                raise RuntimeError("initdb not found - put Postgres' bin directory on PATH (or set PG_BIN), or set BENCH_DATABASE_URL")
+            self._data_dir = tempfile.mkdtemp(prefix="kudos-load-pg-")
+            data = os.path.join(self._data_dir, "data")
+            subprocess.run([os.path.join(self._bin_dir, "initdb"), "-D", data, "-U", "postgres", "-A", "trust", "--no-sync"],
+                           capture_output=True, text=True, check=True)
+            # Unix socket only, and no fsync: nothing here needs to survive a crash
+            subprocess.run([os.path.join(self._bin_dir, "pg_ctl"), "-D", data, "-l", os.path.join(self._data_dir, "postgres.log"), "-w",
+                            "-o", f"-k {self._data_dir} -c listen_addresses='' -c fsync=off -c max_connections=200", "start"],
+                           capture_output=True, text=True, check=True)
+            self.server_url = f"postgresql://postgres@/postgres?host={self._data_dir}"
+
+        conn = psycopg2.connect(self.server_url)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE DATABASE {self._database}")
+        conn.close()
+
+        parts = urlsplit(self.server_url)
+        self.url = urlunsplit(parts._replace(path=f"/{self._database}"))
+        return self.url
+
+    def stop(self):
+        import psycopg2
+
+        if self._data_dir:
+            subprocess.run([os.path.join(self._bin_dir, "pg_ctl"), "-D", os.path.join(self._data_dir, "data"), "-m", "immediate", "stop"],
+                           capture_output=True, text=True)
+            shutil.rmtree(self._data_dir, ignore_errors=True)
+            return
+
+        conn = psycopg2.connect(self.server_url)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS {self._database} WITH (FORCE)")
+        conn.close()
+
+
+class DisposableSQLite:
+    """A throwaway embedded SQLite database in a temporary directory"""
+
+    def __init__(self):
+        self.url = None
+        self._dir = None
+
+    def start(self):
+        self._dir = tempfile.mkdtemp(prefix="kudos-load-sqlite-")
+        self.url = f"sqlite:///{os.path.join(self._dir, 'kudos.db')}"
+        return self.url
+
+    def stop(self):
+        if self._dir:
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+
+class WorkloadGenerator:
+    """Builds signed Slack request bodies for a weighted mix of /kk commands and interactions"""
+
+    def __init__(self, mix, channels, slack_url, seed=0):
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.channels = channels
+        self.slack_url = slack_url
+        self.random = random.Random(seed)
+
+    @staticmethod
+    def sign(body, timestamp):
+        base = f"v0:{timestamp}:{body}".encode()
+        return "v0=" + hmac.new(SIGNING_SECRET.encode(), base, hashlib.sha256).hexdigest()
+
+    def headers(self, body):
+        timestamp = str(int(time.time()))
+        return {
+            "content-type": ["application/x-www-form-urlencoded"],
+            "x-slack-request-timestamp": [timestamp],
+            "x-slack-signature": [self.sign(body, timestamp)]
+        }
+
+    def slash_command(self, n, channel_id, text):
+        return urlencode({
+            "token": "bench", "team_id": "TBENCH", "team_domain": "bench",
+            "channel_id": channel_id, "channel_name": channel_id.lower(),
+            # A fresh sender per request keeps kudos under the monthly quota
+            "user_id": f"USEND{n:07d}", "user_name": f"sender{n}",
+            "command": "/kk", "text": text, "api_app_id": "ABENCH",
+            "response_url": f"{self.slack_url}/respond/{n}",
+            "trigger_id": f"T{n}"
+        })
+
+    def personality_select(self, n, channel_id):
+        """The block_actions payload Slack sends when a personality is picked in the config modal"""
+        personality = self.random.choice(["crab", "buddy", "business", "marvin", "spooky", "steve"])
+        payload = {
+            "type": "block_actions",
+            "team": {"id": "TBENCH", "domain": "bench"},
+            "user": {"id": f"USEND{n:07d}", "team_id": "TBENCH"},
+            "api_app_id": "ABENCH",
+            "token": "bench",
+            "trigger_id": f"T{n}",
+            "view": {
+                "id": f"V{n}", "type": "modal", "callback_id": "config_modal",
+                "title": {"type": "plain_text", "text": "Kiitos Krab Config"},
+                "submit": {"type": "plain_text", "text": "Save"},
+                "close": {"type": "plain_text", "text": "Cancel"},
+                "private_metadata": channel_id,
+                "blocks": [{"type": "context", "block_id": "personality_description",
+                            "elements": [{"type": "mrkdwn", "text": "_..._"}]}],
+                "state": {"values": {}}
+            },
+            "actions": [{
+                "type": "static_select", "action_id": "personality_select", "block_id": "personality_block",
+                "selected_option": {"text": {"type": "plain_text", "text": personality.title()}, "value": personality},
+                "action_ts": f"{time.time():.6f}"
+            }]
+        }
+        return urlencode({"payload": json.dumps(payload)})
+
+    def build(self, n):
+        """Build request n: returns (command type, body)"""
+        kind = self.random.choices(self.kinds, self.weights)[0]
+        channel_id = self.random.choice(self.channels)
+        if kind == "kudos":
+            receivers = self.random.sample(range(50), self.random.choice([1, 1, 1, 2, 3]))
+            mentions = " ".join(f"<@URECV{r:03d}|recv{r}>" for r in receivers)
+            return kind, self.slash_command(n, channel_id, f"{mentions} thanks for the help with the release!")
+        if kind == "config":
+            # Viewing the config, opening the modal, and picking a personality inside it
+            variant = n % 3
+            if variant == 2:
+                return kind, self.personality_select(n, channel_id)
+            return kind, self.slash_command(n, channel_id, "config" if variant == 0 else "config edit")
+        return kind, self.slash_command(n, channel_id, kind)
+
+
+def summarize(latencies):
+    if not latencies:
+        return {"count": 0}
+    return {
+        "count": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000
+    }
+
+
+def run_load(args, slack, database_url):
+    """Configure the app for the local stand-ins, import it and send the workload through it"""
+    # Settings are read at import time, so everything is configured before kudos_bot is imported
+    os.environ.update({
+        "DATABASE_URL": database_url,
+        "SLACK_API_BASE_URL": f"{slack.url}/api/",
+        "SLACK_BOT_TOKEN": "xoxb-load-test",
+        "SLACK_SIGNING_SECRET": SIGNING_SECRET,
+        "DB_POOL_MAX": str(args.pool_size),
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING")
+    })
+    if not args.slack_rate_limits:
+        # Measure the bot, not Slack's quotas: the client-side token buckets never run dry
+        from utils import slack_client
+        slack_client.TIER_LIMITS.update({tier: (10 ** 9, 10 ** 9) for tier in slack_client.TIER_LIMITS})
+    os.environ.pop("AWS_LAMBDA_FUNCTION_NAME", None)
+
+    from database import get_db_manager, is_sqlite_url
+    from migrations import migrate
+
+    # SQLite creates its schema in prepare_server's verify_schema
+    if not is_sqlite_url(database_url):
+        migrate(get_db_manager())
+
+    from slack_bolt.request import BoltRequest
+    from utils.announcement_dispatcher import get_announcement_dispatcher
+    from utils.channel_index import get_channel_index
+    import kudos_bot
+
+    kudos_bot.prepare_server()
+
+    generator = WorkloadGenerator(args.mix, slack.channels, slack.url, args.seed)
+    requests = [generator.build(n) for n in range(args.requests)]
+    started_at = {}
+    ack_latencies = {}
+    errors = []
+
+    def send(n):
+        kind, body = requests[n]
+        start = time.perf_counter()
+        started_at[n] = start
+        response = kudos_bot.app.dispatch(BoltRequest(body=body, headers=generator.headers(body)))
+        ack_latencies[n] = time.perf_counter() - start
+        if response.status != 200:
+            errors.append(f"request {n} ({kind}): HTTP {response.status} {response.body[:200]}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(send, range(args.requests)))
+
+    # Lazy listeners finish after the acks; wait for every reply to reach the fake Slack
+    deadline = time.perf_counter() + args.timeout
+    while len(slack.completed_at) < args.requests and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    finished = max(slack.completed_at.values(), default=time.perf_counter())
+    elapsed = finished - start
+
+    get_announcement_dispatcher().stop()
+    get_channel_index().stop()
+    get_db_manager().close()
+
+    per_kind = {}
+    for kind in COMMAND_TYPES:
+        numbers = [n for n, (request_kind, _) in enumerate(requests) if request_kind == kind]
+        if not numbers:
+            continue
+        per_kind[kind] = {
+            "ack": summarize([ack_latencies[n] for n in numbers if n in ack_latencies]),
+            "complete": summarize([slack.completed_at[n] - started_at[n] for n in numbers if n in slack.completed_at])
+        }
+
+    completed = [slack.completed_at[n] - started_at[n] for n in range(args.requests) if n in slack.completed_at]
+    incomplete = args.requests - len(completed)
+    if incomplete:
+        errors.append(f"{incomplete} request(s) got no reply within {args.timeout:.0f}s")
+
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "pool_size": args.pool_size,
+        "slack_latency_ms": args.slack_latency_ms,
+        "elapsed_s": elapsed,
+        "throughput_per_s": len(completed) / elapsed if elapsed > 0 else 0,
+        "ack": summarize(list(ack_latencies.values())),
+        "complete": summarize(completed),
+        "per_command": per_kind,
+        "slack_calls": dict(sorted(slack.calls.items())),
+        "errors": errors
+    }
+
+
+def print_report(results):
+    print(f"🦀 {results['requests']} requests, {results['concurrency']} client threads, {results['pool_size']} DB connections, "
+          f"{results['slack_latency_ms']:.0f} ms fake Slack latency")
+    print(f"   Throughput: {results['throughput_per_s']:.1f} commands/s ({results['elapsed_s']:.1f}s)")
+
+    def line(label, summary):
+        if not summary.get("count"):
+            return f"   {label:<22} -"
+        return (f"   {label:<22} p50 {summary['p50_ms']:7.1f} ms   p95 {summary['p95_ms']:7.1f} ms   "
+                f"p99 {summary['p99_ms']:7.1f} ms   max {summary['max_ms']:7.1f} ms")
+
+    print(line("ack (all)", results["ack"]))
+    print(line("complete (all)", results["complete"]))
+    for kind, summary in results["per_command"].items():
+        print(line(f"{kind} ({summary['complete'].get('count', 0)})", summary["complete"]))
+
+    calls = ", ".join(f"{method} {count}" for method, count in results["slack_calls"].items())
+    print(f"   Slack calls: {calls or 'none'}")
+    for error in results["errors"][:10]:
+        print(f"   ⚠️  {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test of kudos_bot.app against a fake Slack and a throwaway Postgres")
+    parser.add_argument("--requests", type=int, default=1000, help="requests to send (default: 1000)")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads sending requests (default: 8)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"weighted command mix (default: {DEFAULT_MIX})")
+    parser.add_argument("--channels", type=int, default=5, help="channels to spread the commands over (default: 5)")
+    parser.add_argument("--sqlite", action="store_true", help="use a temporary embedded SQLite database instead of Postgres")
+    parser.add_argument("--pool-size", type=int, default=4, help="DB connections (default: 4)")
+    parser.add_argument("--slack-latency-ms", type=float, default=50, help="fake Slack latency per call (default: 50)")
+    parser.add_argument("--slack-rate-limits", action="store_true", help="let the client-side Slack rate limits throttle calls")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for lazy listeners to finish (default: 60)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the workload (default: 0)")
+    parser.add_argument("--max-p95-ms", type=float, help="fail if the p95 completion latency is above this")
+    parser.add_argument("--min-throughput", type=float, help="fail if fewer commands per second complete")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    import logging
+    logging.basicConfig(level=getattr(logging, os.environ.get("LOG_LEVEL", "WARNING").upper(), logging.WARNING))
+
+    slack = FakeSlack(args.slack_latency_ms / 1000, channels=[f"CLOAD{i:03d}" for i in range(args.channels)])
+    database = DisposableSQLite() if args.sqlite else DisposablePostgres(os.environ.get("BENCH_DATABASE_URL"))
+    slack.start()
+    try:
+        database_url = database.start()
+        results = run_load(args, slack, database_url)
+    finally:
+        slack.stop()
+        database.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+    failures = list(results["errors"])
+    if args.max_p95_ms is not None and results["complete"].get("p95_ms", float("inf")) > args.max_p95_ms:
+        failures.append(f"p95 completion latency {results['complete'].get('p95_ms', float('inf')):.1f} ms is over {args.max_p95_ms:.0f} ms")
+    if args.min_throughput is not None and results["throughput_per_s"] < args.min_throughput:
+        failures.append(f"throughput {results['throughput_per_s']:.1f}/s is under {args.min_throughput:.1f}/s")
+    if failures:
+        print(f"❌ Load test failed: {'; '.join(failures)}")
+        sys.exit(1)
+    print("✅ Load test passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression checks for DatabaseManager against a realistic kudos volume.
+
+Seeds a throwaway database (see load_test.DisposablePostgres) with --rows
+kudos across --channels channels over --months months - skewed so a few
+channels are busy and most are quiet - plus the monthly rollup, bot_stats,
+channel configs and an announcement backlog. Then it runs each
+DatabaseManager query the bot issues, recording the SQL it sends, and
+EXPLAIN (ANALYZE)s every statement inside a rolled-back transaction.
+
+A case fails if:
+  - it costs more than its cost budget or takes longer than its time budget
+  - an index it is expected to use isn't in the plan
+  - it sequentially scans a large table (the kudos partitions or the rollup)
+  - its planner cost or execution time regressed past --cost-tolerance /
+    --time-tolerance vs benchmarks/baselines/query_plans.json
+
+Usage:
+  python benchmarks/query_plans.py
+  python benchmarks/query_plans.py --rows 5000000 --channels 500
+  BENCH_DATABASE_URL=postgresql://postgres@localhost/postgres python benchmarks/query_plans.py --update-baseline
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from baseline_diff import BASELINE_DIR, diff_results, load_baseline, print_diff, save_baseline
+from load_test import DisposablePostgres
+
+BASELINE_PATH = BASELINE_DIR / "query_plans.json"
+
+# Tables big enough that a sequential scan of them is a regression...
+LARGE_TABLES = re.compile(r"^(kudos_y\d{4}m\d{2}|kudos_default|kudos_monthly_rollup)$")
+# ...once it reads this many rows (empty future partitions are fine to scan)
+SEQ_SCAN_MIN_ROWS = 1000
+
+# Users active in each channel (kudos go between a channel's own members)
+USERS_PER_CHANNEL = 200
+
+SEED_KUDOS_SQL = """
+INSERT INTO kudos (sender, receiver, channel_id, timestamp)
+SELECT 'U' || LPAD(((channel * 37 + FLOOR(RANDOM() * %(users)s)::INT) %% %(total_users)s)::TEXT, 8, '0'),
+       'U' || LPAD(((channel * 37 + FLOOR(RANDOM() * %(users)s)::INT) %% %(total_users)s)::TEXT, 8, '0'),
+       'C' || LPAD(channel::TEXT, 8, '0'),
+       %(start)s::TIMESTAMP + RANDOM() * (%(end)s::TIMESTAMP - %(start)s::TIMESTAMP)
+FROM (
+    -- Squaring skews channel sizes: channel 0 is the busiest, most are quiet
+    SELECT FLOOR(%(channels)s * POWER(RANDOM(), 2))::INT AS channel
+    FROM generate_series(1, %(rows)s)
+) seeded
+"""
+
+
+def channel_id(n):
+    return f"C{n:08d}"
+
+
+def user_id(n):
+    return f"U{n:08d}"
+
+
+def make_recording_cursor(statements):
+    import psycopg2.extensions
+
+    class RecordingCursor(psycopg2.extensions.cursor):
+        """Cursor that appends the SQL of every statement it runs to statements"""
+
+        def execute(self, query, vars=None):
+            statements.append(self.mogrify(query, vars).decode())
+            return super().execute(query, vars)
+
+    return RecordingCursor
+
+
+@contextmanager
+def recording(db_manager):
+    """Record the SQL of every statement DatabaseManager runs inside the block"""
+    statements = []
+    cursor_class = make_recording_cursor(statements)
+    get_connection = db_manager.get_connection
+
+    @contextmanager
+    def recording_connection(*args, **kwargs):
+        with get_connection(*args, **kwargs) as conn:
+            # Put the pool's own factory (MetricsCursor when metrics are on) back afterwards
+            previous_factory = conn.cursor_factory
+            conn.cursor_factory = cursor_class
+            try:
+                yield conn
+            finally:
+                conn.cursor_factory = previous_factory
+
+    db_manager.get_connection = recording_connection
+    try:
+        yield statements
+    finally:
+        db_manager.get_connection = get_connection
+
+
+def seed(db_manager, args):
+    """Fill the database with a realistic, deterministic kudos history"""
+    from utils.date_parser import add_months
+
+    this_month = date.today().replace(day=1)
+    first_month = add_months(this_month, -(args.months - 1))
+    total_users = args.channels * 37 + USERS_PER_CHANNEL
+
+    print(f"🌱 Seeding {args.rows:,} kudos in {args.channels} channels over {args.months} months...")
+    start = time.monotonic()
+    with db_manager.get_connection() as conn:
+        for i in range(args.months):
+            db_manager._create_kudos_partition(conn, add_months(first_month, i))
+        db_manager.ensure_kudos_partitions()
+
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT setseed(0.42)")
+            batch = 500000
+            for offset in range(0, args.rows, batch):
+                cursor.execute(SEED_KUDOS_SQL, {
+                    "rows": min(batch, args.rows - offset), "channels": args.channels, "users": USERS_PER_CHANNEL,
+                    "total_users": total_users, "start": first_month, "end": date.today()
+                })
+                conn.commit()
+                print(f"   {min(offset + batch, args.rows):,} kudos")
+
+            # A tenth of the channels are configured; every tenth of those shares channel 0's leaderboard
+            for n in range(0, args.channels, 10):
+                cursor.execute("""
+                INSERT INTO channel_configs (channel_id, personality_name, monthly_quota, leaderboard_channel_id, timezone)
+                VALUES (%s, 'crab', 20, %s, %s)
+                """, (channel_id(n), channel_id(0) if n and n % 100 == 0 else None, f"UTC+{n % 12}"))
+
+            # A delivered backlog with a few announcements still due
+            cursor.execute("""
+            INSERT INTO announcement_outbox (channel_id, text, delivered_at)
+            SELECT 'C' || LPAD((i %% %s)::TEXT, 8, '0'), '', CURRENT_TIMESTAMP - i * INTERVAL '1 second'
+            FROM generate_series(1, 50000) i
+            """, (args.channels,))
+            cursor.execute("""
+            INSERT INTO announcement_outbox (channel_id, text)
+            SELECT 'C' || LPAD(i::TEXT, 8, '0'), 'Kudos!' FROM generate_series(1, 20) i
+            """)
+            conn.commit()
+
+    db_manager.rebuild_monthly_rollup()
+    db_manager.rebuild_bot_stats()
+    with db_manager.get_connection() as conn:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            # A bigger sample keeps row estimates, and so planner costs, stable from one seeded database to the next
+            cursor.execute("SET default_statistics_target = 1000")
+            cursor.execute("VACUUM ANALYZE")
+        conn.autocommit = False
+    print(f"🌱 Seeded in {time.monotonic() - start:.1f}s")
+
+
+def build_cases(db_manager):
+    """Get the DatabaseManager calls to check, with their budgets and expected indexes.
+
+    Each case is (name, call, {"max_cost", "max_ms", "indexes"}), where indexes
+    are patterns that must each match an index in one of the case's plans. A
+    budget may also have a "setup" callable, run untimed before every call
+    (e.g. to queue the announcement a call then marks delivered).
+    """
+    from config.settings import OUTBOX_RETENTION_HOURS
+
+    today = date.today()
+    busy, configured, quiet = channel_id(0), channel_id(10), channel_id(299)
+    # Unconfigured and mid-sized, so a timezone change rebuilds a realistic rollup
+    retimed = channel_id(25)
+    busy_user = user_id(5)
+    rollup = {"indexes": [r"^kudos_monthly_rollup_pkey$"]}
+    channel_index = r"channel_id_timestamp_idx$|^idx_kudos_channel_timestamp$"
+    queued = {}
+
+    def queue_announcement():
+        queued["id"] = db_manager.enqueue_announcement(quiet, "Kudos!")
+
+    return [
+        ("get_monthly_kudos_count", lambda: db_manager.get_monthly_kudos_count(busy_user, today.month, today.year, busy),
+         {"max_cost": 20, "max_ms": 5, **rollup}),
+        ("get_monthly_kudos_received_count", lambda: db_manager.get_monthly_kudos_received_count(busy_user, today.month, today.year, busy),
+         {"max_cost": 20, "max_ms": 5, **rollup}),
+        ("get_monthly_leaderboard[busy]", lambda: db_manager.get_monthly_leaderboard(today.month, today.year, busy),
+         {"max_cost": 2000, "max_ms": 20, **rollup}),
+        ("get_monthly_leaderboard[quiet]", lambda: db_manager.get_monthly_leaderboard(today.month, today.year, quiet),
+         {"max_cost": 2000, "max_ms": 20, **rollup}),
+        ("get_complete_monthly_leaderboard", lambda: db_manager.get_complete_monthly_leaderboard(today.month, today.year, busy),
+         {"max_cost": 2000, "max_ms": 20, **rollup}),
+        ("get_user_stats", lambda: db_manager.get_user_stats(busy_user, busy),
+         {"max_cost": 500, "max_ms": 10, **rollup}),
+        # Every other case runs with a warm config cache, as a long-running bot does
+        ("get_channel_config", lambda: db_manager.config_cache.invalidate(configured) or db_manager.get_channel_config(configured),
+         {"max_cost": 20, "max_ms": 5, "indexes": []}),
+        ("get_channels_using_leaderboard", lambda: db_manager.get_channels_using_leaderboard(busy),
+         {"max_cost": 50, "max_ms": 5, "indexes": []}),
+        ("record_kudos_batch", lambda: db_manager.record_kudos_batch(busy_user, [user_id(6), user_id(7)], busy, 1000000, announcement="Kudos!"),
+         {"max_cost": 100, "max_ms": 10, **rollup}),
+        ("enqueue_announcement", lambda: db_manager.enqueue_announcement(quiet, "Kudos!"),
+         {"max_cost": 20, "max_ms": 5, "indexes": []}),
+        ("claim_announcements", lambda: db_manager.claim_announcements(10, 60),
+         {"max_cost": 500, "max_ms": 10, "indexes": [r"^idx_announcement_outbox_pending$"]}),
+        ("mark_announcement_delivered", lambda: db_manager.mark_announcement_delivered(queued["id"]),
+         {"max_cost": 20, "max_ms": 5, "indexes": [r"^announcement_outbox_pkey$"], "setup": queue_announcement}),
+        ("reschedule_announcement", lambda: db_manager.reschedule_announcement(queued["id"], 30, "ratelimited"),
+         {"max_cost": 20, "max_ms": 5, "indexes": [r"^announcement_outbox_pkey$"], "setup": queue_announcement}),
+        ("purge_announcements", lambda: db_manager.purge_announcements(OUTBOX_RETENTION_HOURS),
+         {"max_cost": 3000, "max_ms": 50, "indexes": []}),
+        ("get_status_summary", lambda: db_manager.get_status_summary(),
+         {"max_cost": 3000, "max_ms": 50, "indexes": []}),
+        # Changing a channel's timezone re-buckets its rollup, which is most of these two cases' cost
+        ("save_channel_config[timezone change]", lambda: db_manager.save_channel_config(retimed, timezone="UTC+5"),
+         {"max_cost": 100000, "max_ms": 1000, "indexes": [channel_index],
+          "setup": lambda: db_manager.delete_channel_config(retimed)}),
+        ("delete_channel_config[timezone change]", lambda: db_manager.delete_channel_config(retimed),
+         {"max_cost": 100000, "max_ms": 1000, "indexes": [channel_index],
+          "setup": lambda: db_manager.save_channel_config(retimed, timezone="UTC+5")}),
+        ("get_kudos_partitions", lambda: db_manager.get_kudos_partitions(),
+         {"max_cost": 500, "max_ms": 20, "indexes": []}),
+        ("rebuild_monthly_rollup[busy channel]", lambda: db_manager.rebuild_monthly_rollup(busy),
+         {"max_cost": 500000, "max_ms": 5000, "indexes": [channel_index]}),
+        ("check_monthly_rollup[busy channel]", lambda: db_manager.check_monthly_rollup(busy),
+         {"max_cost": 500000, "max_ms": 5000, "indexes": [channel_index, r"^kudos_monthly_rollup_pkey$"]}),
+        # A recount of every kudos, run after clear_kudos.py
+        ("rebuild_bot_stats", lambda: db_manager.rebuild_bot_stats(),
+         {"max_cost": 2000000, "max_ms": 20000, "indexes": [channel_index]}),
+    ]
+
+
+def walk_plan(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk_plan(child)
+
+
+def explain_statements(conn, statements, repeat):
+    """
+    Replay a case's statements in order, EXPLAIN ANALYZE-ing the DML, in a rolled-back transaction.
+
+    Replaying them together keeps later statements meaningful (a rollup
+    rebuild's INSERT runs after its DELETE). Returns (total cost, median total
+    ms over repeat replays, indexes used, tables sequentially scanned in bulk, statements explained).
+    """
+    timings = []
+    with conn.cursor() as cursor:
+        for _ in range(repeat):
+            cost, elapsed_ms, indexes, seq_scans, explained = 0.0, 0.0, set(), set(), 0
+            for statement in statements:
+                if not re.match(r"\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b", statement, re.IGNORECASE):
+                    cursor.execute(statement)
+                    continue
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}")
+                plan = cursor.fetchone()[0][0]
+                nodes = list(walk_plan(plan["Plan"]))
+                cost += plan["Plan"]["Total Cost"]
+                elapsed_ms += plan["Planning Time"] + plan["Execution Time"]
+                indexes.update(node["Index Name"] for node in nodes if "Index Name" in node)
+                seq_scans.update(
+                    node["Relation Name"] for node in nodes
+                    if node["Node Type"] == "Seq Scan"
+                    and (node["Actual Rows"] + node.get("Rows Removed by Filter", 0)) * node["Actual Loops"] >= SEQ_SCAN_MIN_ROWS
+                )
+                explained += 1
+            conn.rollback()
+            timings.append(elapsed_ms)
+    return round(cost, 2), round(statistics.median(timings), 3), indexes, seq_scans, explained
+
+
+def check_case(db_manager, explain_conn, name, call, budget, repeat):
+    """Run one case, EXPLAIN what it sent, and check it against its budget"""
+    setup = budget.get("setup", lambda: None)
+    setup()
+    call()  # warm the buffers and config cache the way a busy bot would have
+    setup()
+    with recording(db_manager) as statements:
+        call()
+
+    cost, elapsed_ms, indexes, seq_scans, explained = explain_statements(explain_conn, statements, repeat)
+
+    problems = []
+    if cost > budget["max_cost"]:
+        problems.append(f"cost {cost:,.0f} over budget {budget['max_cost']:,}")
+    if elapsed_ms > budget["max_ms"]:
+        problems.append(f"{elapsed_ms:.1f} ms over budget {budget['max_ms']} ms")
+    for pattern in budget["indexes"]:
+        if not any(re.search(pattern, index) for index in indexes):
+            problems.append(f"no index matching {pattern} (used: {', '.join(sorted(indexes)) or 'none'})")
+    large_seq_scans = sorted(table for table in seq_scans if LARGE_TABLES.match(table))
+    if large_seq_scans:
+        problems.append(f"sequential scan of {', '.join(large_seq_scans)}")
+
+    return {
+        "statements": explained,
+        "cost": cost,
+        "time_ms": elapsed_ms,
+        "indexes": sorted(indexes),
+        "seq_scans": sorted(seq_scans),
+        "problems": problems
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check DatabaseManager query plans, costs and timings against budgets and a JSON baseline")
+    parser.add_argument("--rows", type=int, default=2000000, help="kudos to seed (default: 2,000,000)")
+    parser.add_argument("--channels", type=int, default=300, help="channels to spread them over (default: 300)")
+    parser.add_argument("--months", type=int, default=24, help="months of history (default: 24)")
+    parser.add_argument("--repeat", type=int, default=3, help="EXPLAIN ANALYZE runs per statement, median kept (default: 3)")
+    parser.add_argument("--cost-tolerance", type=float, default=0.25, help="allowed planner cost growth vs the baseline (default: 0.25)")
+    parser.add_argument("--time-tolerance", type=float, default=1.0, help="allowed time growth vs the baseline (default: 1.0 = 2x)")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="baseline file (default: benchmarks/baselines/query_plans.json)")
+    parser.add_argument("--update-baseline", action="store_true", help="write this run's results as the new baseline")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import logging
+    logging.basicConfig(level=getattr(logging, os.environ["LOG_LEVEL"].upper(), logging.WARNING))
+
+    postgres = DisposablePostgres(os.environ.get("BENCH_DATABASE_URL"))
+    try:
+        os.environ["DATABASE_URL"] = postgres.start()
+        import psycopg2
+        from database import get_db_manager
+        from migrations import migrate
+
+        db_manager = get_db_manager()
+        migrate(db_manager)
+        seed(db_manager, args)
+
+        explain_conn = psycopg2.connect(os.environ["DATABASE_URL"])
+        results = {}
+        for name, call, budget in build_cases(db_manager):
+            results[name] = check_case(db_manager, explain_conn, name, call, budget, args.repeat)
+        explain_conn.close()
+        db_manager.close()
+    finally:
+        postgres.stop()
+
+    seed_metadata = {"rows": args.rows, "channels": args.channels, "months": args.months}
+    if args.update_baseline:
+        save_baseline(args.baseline, {name: {key: result[key] for key in ("cost", "time_ms", "indexes")} for name, result in results.items()},
+                      seed=seed_metadata)
+        print(f"✅ Baseline written to {args.baseline} ({len(results)} cases)")
+
+    baseline = load_baseline(args.baseline)
+    if baseline and baseline.get("seed") != seed_metadata:
+        print(f"⚠️  Baseline was recorded with seed {baseline.get('seed')}, this run used {seed_metadata}")
+    rows = diff_results(results, baseline, {"cost": args.cost_tolerance, "time_ms": args.time_tolerance},
+                        floors={"cost": 1.0, "time_ms": 1.0})
+    for name, result in results.items():
+        previous = (baseline or {}).get("results", {}).get(name)
+        if previous and previous.get("indexes") != result["indexes"]:
+            print(f"ℹ️  {name}: plan now uses {', '.join(result['indexes']) or 'no indexes'} (baseline: {', '.join(previous['indexes']) or 'no indexes'})")
+
+    if args.json:
+        print(json.dumps({"results": results, "diff": rows, "seed": seed_metadata}, indent=2))
+    else:
+        print(f"🦀 {len(results)} DatabaseManager cases over {args.rows:,} kudos")
+        print_diff(rows, {"cost": "", "time_ms": " ms"})
+
+    failures = [f"{name}: {problem}" for name, result in results.items() for problem in result["problems"]]
+    failures += [f"{row['name']}: {row['metric']} regressed {row['change']:+.0%}" for row in rows if row["status"] == "regressed"]
+    for failure in failures:
+        print(f"   ❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✅ Every query is within budget and uses its expected indexes")
+
+
+if __name__ == "__main__":
+    main()
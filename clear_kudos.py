@@ -2,273 +2,248 @@
 """
 Utility script to clear kudos before a specific date from PostgreSQL.
 Run this from the command line to clean up old kudos data.
+
+The preview streams matching rows through a server-side cursor, so it never
+holds them all in memory. Deletes drop whole monthly partitions where they
+can and otherwise delete in primary-key order, committing every --batch-size
+rows so no single transaction holds locks for long.
 """
 
 import os
 import sys
-import psycopg2
+import time
+import argparse
+from collections import Counter
 from datetime import datetime
-from contextlib import contextmanager
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-def get_db_connection():
-    """Get a database connection"""
-    database_url = os.getenv('DATABASE_URL')
-    if not database_url:
-        print("❌ DATABASE_URL environment variable not set!")
-        sys.exit(1)
-    
-    try:
-        return psycopg2.connect(database_url)
-    except Exception as e:
-        print(f"❌ Failed to connect to database: {e}")
-        sys.exit(1)
+from database import get_db_manager, is_sqlite_url
 
-@contextmanager
-def get_db_cursor():
-    """Get a database cursor with automatic cleanup"""
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        yield cursor
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        cursor.close()
-        conn.close()
-
-def clear_kudos_before_date(cutoff_date):
-    """
-    Clear all kudos given before a specific date.
-    
-    Args:
-        cutoff_date (str): Date in YYYY-MM-DD format
-    """
-    print(f"🦀 Clearing kudos before {cutoff_date}...")
-    
-    # Convert date to timestamp for comparison
-    cutoff_datetime = datetime.strptime(cutoff_date, '%Y-%m-%d')
-    
-    with get_db_cursor() as cursor:
-        # First, get count of items to be deleted
-        cursor.execute("""
-            SELECT COUNT(*) FROM kudos 
-            WHERE timestamp < %s
-        """, (cutoff_datetime,))
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
-            print("✅ No kudos found before that date!")
-            return
-        
-        print(f"📊 Found {count} kudos to delete...")
-        
-        # Get items to be deleted for preview
-        cursor.execute("""
-            SELECT sender, receiver, channel_id, timestamp 
-            FROM kudos 
-            WHERE timestamp < %s
-            ORDER BY timestamp DESC
-        """, (cutoff_datetime,))
-        
-        items = cursor.fetchall()
-        
-        # Show what will be deleted
-        print("\n🗑️  Items to be deleted:")
-        for sender, receiver, channel_id, timestamp in items:
-            print(f"   {timestamp.strftime('%Y-%m-%d %H:%M:%S')} | {sender} → {receiver} (channel: {channel_id})")
-        
-        # Delete the items
-        cursor.execute("""
-            DELETE FROM kudos 
-            WHERE timestamp < %s
-        """, (cutoff_datetime,))
-        
-        deleted_count = cursor.rowcount
-        print(f"\n✅ Done! Deleted {deleted_count} kudos before {cutoff_date} 🦀")
-
-def clear_kudos_before_timestamp(cutoff_timestamp):
+# Rows fetched per round trip by the preview cursor
+PREVIEW_FETCH_SIZE = 5000
+
+# Deletes one chunk of matching rows in id order, starting after the last deleted id
+DELETE_CHUNK_SQL = """
+WITH chunk AS (
+    SELECT id, timestamp FROM kudos
+    WHERE timestamp < %(cutoff)s {channel_filter} AND id > %(after_id)s
+    ORDER BY id
+    LIMIT %(batch_size)s
+), deleted AS (
+    DELETE FROM kudos k USING chunk
+    WHERE k.id = chunk.id AND k.timestamp = chunk.timestamp
+    RETURNING k.id
+)
+SELECT MAX(id), COUNT(*) FROM deleted
+"""
+
+
+def get_channel_filter(channel_id):
+    return "AND channel_id = %(channel_id)s" if channel_id else ""
+
+
+def describe_target(cutoff_label, channel_id):
+    return f"before {cutoff_label}" + (f" in channel {channel_id}" if channel_id else "")
+
+
+def preview_kudos_before(cutoff_datetime, channel_id=None, show_rows=False):
     """
-    Clear all kudos given before a specific timestamp.
-    
+    Stream the kudos that would be deleted and summarize them per channel and month.
+
     Args:
-        cutoff_timestamp (int): Unix timestamp
+        cutoff_datetime (datetime): Kudos before this time are matched
+        channel_id (str): Only match kudos in this channel
+        show_rows (bool): Print every matching kudos as well as the summary
+
+    Returns:
+        int: Number of matching kudos
     """
-    print(f"🦀 Clearing kudos before timestamp {cutoff_timestamp}...")
-    
-    # Convert timestamp to datetime
-    cutoff_datetime = datetime.fromtimestamp(cutoff_timestamp)
-    
-    with get_db_cursor() as cursor:
-        # First, get count of items to be deleted
-        cursor.execute("""
-            SELECT COUNT(*) FROM kudos 
-            WHERE timestamp < %s
-        """, (cutoff_datetime,))
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
-            print("✅ No kudos found before that timestamp!")
-            return
-        
-        print(f"📊 Found {count} kudos to delete...")
-        
-        # Get items to be deleted for preview
-        cursor.execute("""
-            SELECT sender, receiver, channel_id, timestamp 
-            FROM kudos 
-            WHERE timestamp < %s
-            ORDER BY timestamp DESC
-        """, (cutoff_datetime,))
-        
-        items = cursor.fetchall()
-        
-        # Show what will be deleted
-        print("\n🗑️  Items to be deleted:")
-        for sender, receiver, channel_id, timestamp in items:
-            print(f"   {timestamp.strftime('%Y-%m-%d %H:%M:%S')} | {sender} → {receiver} (channel: {channel_id})")
-        
-        # Delete the items
-        cursor.execute("""
-            DELETE FROM kudos 
-            WHERE timestamp < %s
-        """, (cutoff_datetime,))
-        
-        deleted_count = cursor.rowcount
-        print(f"\n✅ Done! Deleted {deleted_count} kudos before timestamp {cutoff_timestamp} 🦀")
-
-def preview_kudos_before_date(cutoff_date):
+    per_channel = Counter()
+    per_month = Counter()
+
+    with get_db_manager().get_connection() as conn:
+        # A named cursor keeps the result set on the server and fetches it in batches
+        with conn.cursor(name="clear_kudos_preview") as cursor:
+            cursor.itersize = PREVIEW_FETCH_SIZE
+            cursor.execute(f"""
+                SELECT sender, receiver, channel_id, timestamp
+                FROM kudos
+                WHERE timestamp < %(cutoff)s {get_channel_filter(channel_id)}
+                ORDER BY timestamp DESC
+            """, {'cutoff': cutoff_datetime, 'channel_id': channel_id})
+
+            for sender, receiver, row_channel_id, timestamp in cursor:
+                per_channel[row_channel_id] += 1
+                per_month[timestamp.strftime('%Y-%m')] += 1
+                if show_rows:
+                    print(f"📝 {timestamp.strftime('%Y-%m-%d %H:%M:%S')} | {sender} → {receiver} (channel: {row_channel_id})")
+        conn.commit()
+
+    total = sum(per_channel.values())
+    if total == 0:
+        return 0
+
+    print(f"\n📊 {total:,} kudos in {len(per_channel)} channel(s):")
+    for row_channel_id, count in per_channel.most_common():
+        print(f"   {row_channel_id}: {count:,}")
+
+    print("\n📅 By month:")
+    for month in sorted(per_month, reverse=True):
+        print(f"   {month}: {per_month[month]:,}")
+
+    return total
+
+
+def delete_kudos_before(cutoff_datetime, channel_id=None, batch_size=5000, max_rate=None, expected=None):
     """
-    Preview kudos that would be deleted without actually deleting them.
-    
-    Args:
-        cutoff_date (str): Date in YYYY-MM-DD format
+    Delete kudos before cutoff_datetime; returns the number of rows deleted.
+
+    Without a channel filter, whole months are removed by dropping their
+    kudos partitions. The remaining rows are deleted batch_size at a time in
+    id order, each batch in its own transaction, sleeping between batches to
+    stay under max_rate rows per second if given.
     """
-    print(f"👀 Previewing kudos before {cutoff_date}...")
-    print("🔍 This is a preview - no data will be deleted\n")
-    
-    # Convert date to timestamp for comparison
-    cutoff_datetime = datetime.strptime(cutoff_date, '%Y-%m-%d')
-    
-    with get_db_cursor() as cursor:
-        cursor.execute("""
-            SELECT sender, receiver, channel_id, timestamp 
-            FROM kudos 
-            WHERE timestamp < %s
-            ORDER BY timestamp DESC
-        """, (cutoff_datetime,))
-        
-        items = cursor.fetchall()
-        
-        if not items:
-            print("✅ No kudos found before that date!")
-            return
-        
-        print(f"📊 Found {len(items)} kudos that would be deleted:\n")
-        for sender, receiver, channel_id, timestamp in items:
-            print(f"📝 {timestamp.strftime('%Y-%m-%d %H:%M:%S')} | {sender} → {receiver} (channel: {channel_id})")
-        
-        print(f"\n👀 Preview complete! {len(items)} kudos would be deleted before {cutoff_date} 🦀")
-
-def preview_kudos_before_timestamp(cutoff_timestamp):
+    db_manager = get_db_manager()
+    deleted_count = 0
+    start = time.monotonic()
+
+    if channel_id is None:
+        dropped_partitions, deleted_count = db_manager.drop_kudos_partitions_before(cutoff_datetime)
+        if dropped_partitions:
+            print(f"🧹 Dropped {dropped_partitions} monthly partition(s) ({deleted_count:,} kudos)")
+
+    sql = DELETE_CHUNK_SQL.format(channel_filter=get_channel_filter(channel_id))
+    params = {'cutoff': cutoff_datetime, 'channel_id': channel_id, 'batch_size': batch_size, 'after_id': 0}
+
+    with db_manager.get_connection() as conn:
+        while True:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                last_id, chunk_count = cursor.fetchone()
+            conn.commit()
+            if not chunk_count:
+                break
+
+            params['after_id'] = last_id
+            deleted_count += chunk_count
+            elapsed = time.monotonic() - start
+
+            # Sleep off any lead over the allowed rate before the next batch
+            if max_rate:
+                lead = deleted_count / max_rate - elapsed
+                if lead > 0:
+                    time.sleep(lead)
+                    elapsed += lead
+
+            rate = deleted_count / elapsed if elapsed > 0 else 0
+            progress = f"{deleted_count:,}/{expected:,} ({deleted_count / expected:.0%})" if expected else f"{deleted_count:,}"
+            print(f"🗑️  Deleted {progress} - {rate:,.0f} rows/s")
+
+    elapsed = time.monotonic() - start
+    if deleted_count and elapsed > 0:
+        print(f"⏱️  {deleted_count:,} kudos in {elapsed:.1f}s ({deleted_count / elapsed:,.0f} rows/s)")
+    return deleted_count
+
+
+def refresh_monthly_rollup(channel_id=None):
+    """Rebuild the monthly rollup and status counters so they match the remaining kudos"""
+    print("🔄 Refreshing monthly rollup...")
+    get_db_manager().rebuild_monthly_rollup(channel_id)
+    get_db_manager().rebuild_bot_stats()
+
+
+def clear_kudos_before(cutoff_datetime, cutoff_label, channel_id=None, batch_size=5000, max_rate=None, assume_yes=False):
     """
-    Preview kudos that would be deleted without actually deleting them.
-    
+    Clear all kudos given before cutoff_datetime, after showing what will go and asking for confirmation.
+
     Args:
-        cutoff_timestamp (int): Unix timestamp
+        cutoff_datetime (datetime): Kudos before this time are deleted
+        cutoff_label (str): How to describe the cutoff to the user
+        channel_id (str): Only delete kudos in this channel
+        batch_size (int): Rows deleted per transaction
+        max_rate (float): Most rows deleted per second
+        assume_yes (bool): Skip the confirmation prompt
     """
-    print(f"👀 Previewing kudos before timestamp {cutoff_timestamp}...")
-    print("🔍 This is a preview - no data will be deleted\n")
-    
-    # Convert timestamp to datetime
-    cutoff_datetime = datetime.fromtimestamp(cutoff_timestamp)
-    
-    with get_db_cursor() as cursor:
-        cursor.execute("""
-            SELECT sender, receiver, channel_id, timestamp 
-            FROM kudos 
-            WHERE timestamp < %s
-            ORDER BY timestamp DESC
-        """, (cutoff_datetime,))
-        
-        items = cursor.fetchall()
-        
-        if not items:
-            print("✅ No kudos found before that timestamp!")
+    target = describe_target(cutoff_label, channel_id)
+    print(f"🦀 Clearing kudos {target}...")
+
+    count = preview_kudos_before(cutoff_datetime, channel_id)
+    if count == 0:
+        print(f"✅ No kudos found {target}!")
+        return
+
+    if not assume_yes:
+        print(f"\n⚠️  WARNING: This will permanently delete {count:,} kudos {target}")
+        response = input("Are you sure? Type 'yes' to continue: ")
+        if response.lower() != 'yes':
+            print("❌ Operation cancelled")
             return
-        
-        print(f"📊 Found {len(items)} kudos that would be deleted:\n")
-        for sender, receiver, channel_id, timestamp in items:
-            print(f"📝 {timestamp.strftime('%Y-%m-%d %H:%M:%S')} | {sender} → {receiver} (channel: {channel_id})")
-        
-        print(f"\n👀 Preview complete! {len(items)} kudos would be deleted before timestamp {cutoff_timestamp} 🦀")
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage:")
-        print("  python clear_kudos.py YYYY-MM-DD")
-        print("  python clear_kudos.py now")
-        print("  python clear_kudos.py --preview YYYY-MM-DD")
-        print("  python clear_kudos.py --preview now")
-        print("\nExamples:")
-        print("  python clear_kudos.py 2024-01-01")
-        print("  python clear_kudos.py now")
-        print("  python clear_kudos.py --preview 2024-01-01")
+    print()
+    deleted_count = delete_kudos_before(cutoff_datetime, channel_id, batch_size, max_rate, expected=count)
+
+    refresh_monthly_rollup(channel_id)
+    print(f"\n✅ Done! Deleted {deleted_count:,} kudos {target} 🦀")
+
+
+def parse_cutoff(value):
+    """Parse a YYYY-MM-DD date or 'now' into (cutoff datetime, label)"""
+    if value.lower() == 'now':
+        cutoff_datetime = datetime.now()
+        print(f"🕐 Using current timestamp: {int(cutoff_datetime.timestamp())}")
+        return cutoff_datetime, "now"
+
+    try:
+        return datetime.strptime(value, '%Y-%m-%d'), value
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid date format, use YYYY-MM-DD or 'now' (e.g. 2024-01-01 or now)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Clear kudos given before a date",
+        epilog="Examples:\n"
+               "  python clear_kudos.py --preview 2024-01-01\n"
+               "  python clear_kudos.py 2024-01-01\n"
+               "  python clear_kudos.py now --channel C1234567890\n"
+               "  python clear_kudos.py 2024-01-01 --max-rate 2000 --yes",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("cutoff", help="delete kudos before this date (YYYY-MM-DD) or 'now'")
+    parser.add_argument("--preview", action="store_true", help="show what would be deleted without deleting it")
+    parser.add_argument("--rows", action="store_true", help="with --preview, list every matching kudos")
+    parser.add_argument("--channel", metavar="CHANNEL_ID", help="only clear kudos in this channel")
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows deleted per transaction (default: 5000)")
+    parser.add_argument("--max-rate", type=float, metavar="ROWS_PER_SECOND", help="throttle deletes to at most this many rows per second")
+    parser.add_argument("--yes", action="store_true", help="don't ask for confirmation")
+    args = parser.parse_args()
+
+    if is_sqlite_url(os.environ.get('DATABASE_URL', '')):
+        print("❌ clear_kudos.py needs PostgreSQL - DATABASE_URL points at an SQLite database")
         sys.exit(1)
-    
-    # Check for preview mode
-    preview_mode = False
-    if sys.argv[1] == '--preview':
-        if len(sys.argv) < 3:
-            print("❌ Missing date argument for --preview")
-            print("Usage: python clear_kudos.py --preview YYYY-MM-DD")
-            print("   or: python clear_kudos.py --preview now")
-            sys.exit(1)
-        preview_mode = True
-        cutoff_date = sys.argv[2]
-    else:
-        cutoff_date = sys.argv[1]
-    
-    # Handle "now" option
-    if cutoff_date.lower() == 'now':
-        cutoff_timestamp = int(datetime.now().timestamp())
-        print(f"🕐 Using current timestamp: {cutoff_timestamp}")
-        
-        if preview_mode:
-            preview_kudos_before_timestamp(cutoff_timestamp)
-        else:
-            # Ask for confirmation before deleting
-            print(f"⚠️  WARNING: This will permanently delete all kudos before NOW (timestamp: {cutoff_timestamp})")
-            response = input("Are you sure? Type 'yes' to continue: ")
-            
-            if response.lower() == 'yes':
-                clear_kudos_before_timestamp(cutoff_timestamp)
-            else:
-                print("❌ Operation cancelled")
-                sys.exit(0)
-    else:
-        # Validate date format
-        try:
-            datetime.strptime(cutoff_date, '%Y-%m-%d')
-        except ValueError:
-            print("❌ Invalid date format! Use YYYY-MM-DD or 'now'")
-            print("Examples: 2024-01-01 or now")
-            sys.exit(1)
-        
-        if preview_mode:
-            preview_kudos_before_date(cutoff_date)
+
+    try:
+        cutoff_datetime, cutoff_label = parse_cutoff(args.cutoff)
+    except argparse.ArgumentTypeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if args.preview:
+        target = describe_target(cutoff_label, args.channel)
+        print(f"👀 Previewing kudos {target}...")
+        print("🔍 This is a preview - no data will be deleted")
+        count = preview_kudos_before(cutoff_datetime, args.channel, show_rows=args.rows)
+        if count == 0:
+            print(f"\n✅ No kudos found {target}!")
         else:
-            # Ask for confirmation before deleting
-            print(f"⚠️  WARNING: This will permanently delete all kudos before {cutoff_date}")
-            response = input("Are you sure? Type 'yes' to continue: ")
-            
-            if response.lower() == 'yes':
-                clear_kudos_before_date(cutoff_date)
-            else:
-                print("❌ Operation cancelled")
-                sys.exit(0) 
\ No newline at end of file
+            print(f"\n👀 Preview complete! {count:,} kudos would be deleted {target} 🦀")
+        return
+
+    clear_kudos_before(cutoff_datetime, cutoff_label, args.channel, args.batch_size, args.max_rate, args.yes)
+
+
+if __name__ == "__main__":
+    main()
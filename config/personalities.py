@@ -1,59 +1,236 @@
 import os
 import json
+import random
+import logging
+import string
+import threading
+import time
 from pathlib import Path
-from config.settings import DEFAULT_PERSONALITY
+from config.settings import DEFAULT_PERSONALITY, PERSONALITY_HOT_RELOAD, PERSONALITY_RELOAD_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+PERSONALITY_DIR = Path(__file__).parent.parent / "personalities"
+
+# Keys every personality must define, by section
+REQUIRED_KEYS = {
+    'help': ['title', 'send_kudos', 'commands', 'footer'],
+    'errors': ['no_mentions', 'self_kudos', 'bot_kudos', 'empty_message', 'quota_exceeded',
+               'failed_kudos', 'database_error', 'stats_error', 'generic_error'],
+    'success': ['kudos_single', 'kudos_multiple', 'announcement_single', 'announcement_multiple'],
+    'leaderboard': ['title', 'senders_title', 'receivers_title', 'no_senders', 'no_receivers',
+                    'top_sender_single', 'top_sender_multiple', 'posted_confirmation', 'footer'],
+    'stats': ['title', 'this_month', 'all_time', 'kudos_sent', 'kudos_received', 'remaining',
+              'total_sent', 'total_received', 'footer']
+}
+
+# Placeholders each .format()-ed template may use
+TEMPLATE_FIELDS = {
+    ('errors', 'user_not_found'): {'username'},
+    ('errors', 'quota_exceeded'): {'kudos_needed', 'remaining'},
+    ('errors', 'failed_kudos'): {'failed_mentions'},
+    ('success', 'kudos_single'): {'remaining'},
+    ('success', 'kudos_multiple'): {'count', 'remaining'},
+    ('success', 'announcement_single'): {'user_id', 'receiver', 'message'},
+    ('success', 'announcement_multiple'): {'user_id', 'receivers', 'message'},
+    ('leaderboard', 'title'): {'month_name'},
+    ('leaderboard', 'top_sender_single'): {'sender', 'count'},
+    ('leaderboard', 'top_sender_multiple'): {'senders', 'count'}
+}
+
+
+def choose_variant(template):
+    """Pick one variant of a template that may have several (a tuple of strings)"""
+    if isinstance(template, (list, tuple)):
+        return random.choice(template)
+    return template
+
+
+def compile_personality(name, data):
+    """Validate a parsed personality file and precompile its templates.
+
+    Variant lists become tuples, and every template's placeholders are checked
+    against the fields the formatters pass in, so a broken personality fails
+    at load time instead of on a user's /kk command.
+    """
+    if not isinstance(data, dict):
+        raise ValueError(f"personality {name} must be a JSON object")
+
+    for key in ('description', 'app_mention'):
+        if not isinstance(data.get(key), str):
+            raise ValueError(f"personality {name} is missing '{key}'")
+
+    compiled = dict(data)
+    for section, keys in REQUIRED_KEYS.items():
+        values = data.get(section)
+        if not isinstance(values, dict):
+            raise ValueError(f"personality {name} is missing section '{section}'")
+
+        compiled_section = dict(values)
+        for key in keys:
+            if key not in values:
+                raise ValueError(f"personality {name} is missing '{section}.{key}'")
+
+        for key, template in values.items():
+            variants = tuple(template) if isinstance(template, list) else (template,)
+            if not variants or not all(isinstance(variant, str) for variant in variants):
+                raise ValueError(f"personality {name} has an invalid template '{section}.{key}'")
+
+            allowed_fields = TEMPLATE_FIELDS.get((section, key))
+            if allowed_fields is not None:
+                for variant in variants:
+                    try:
+                        fields = {field for _, field, _, _ in string.Formatter().parse(variant) if field is not None}
+                    except ValueError as e:
+                        raise ValueError(f"personality {name} has a malformed template '{section}.{key}': {e}")
+                    unknown = fields - allowed_fields
+                    if unknown:
+                        raise ValueError(f"personality {name} template '{section}.{key}' uses unknown placeholders {sorted(unknown)}")
+
+            compiled_section[key] = variants if isinstance(template, list) else template
+        compiled[section] = compiled_section
+
+    return compiled
+
+
+class PersonalityRegistry:
+    """In-memory store of validated personalities, loaded once from the personalities directory.
+
+    Personalities are served from memory; with hot reload enabled, file
+    mtimes are re-checked at most every reload_interval seconds and changed
+    files are reloaded without a restart. Returned dicts are shared and must
+    not be modified.
+    """
+
+    def __init__(self, directory=PERSONALITY_DIR, hot_reload=False, reload_interval=5.0):
+        self.directory = Path(directory)
+        self.hot_reload = hot_reload
+        self.reload_interval = reload_interval
+
+        self._lock = threading.Lock()
+        self._personalities = {}  # name -> compiled personality
+        self._mtimes = {}  # name -> mtime of the loaded file
+        self._last_check = 0.0
+
+    def load_all(self):
+        """Load and validate every personality file"""
+        with self._lock:
+            self._sync()
+            self._last_check = time.monotonic()
+        logger.info(f"Loaded {len(self._personalities)} personalities: {', '.join(self.names())}")
+
+    def get(self, name):
+        """Get a compiled personality by name, or None if it doesn't exist"""
+        self._maybe_reload()
+        return self._personalities.get(name)
+
+    def names(self):
+        """Get the sorted names of all available personalities"""
+        self._maybe_reload()
+        return sorted(self._personalities)
+
+    def _maybe_reload(self):
+        if not self.hot_reload:
+            return
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return
+        with self._lock:
+            if now - self._last_check < self.reload_interval:
+                return
+            self._last_check = now
+            self._sync()
+
+    def _sync(self):
+        """(Re)load new or modified files and drop deleted ones (caller holds the lock)"""
+        seen = set()
+        if self.directory.exists():
+            for file_path in self.directory.glob("*.json"):
+                name = file_path.stem
+                seen.add(name)
+                try:
+                    mtime = file_path.stat().st_mtime
+                except OSError:
+                    continue
+                if self._mtimes.get(name) == mtime:
+                    continue
+
+                try:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        compiled = compile_personality(name, json.load(f))
+                except Exception as e:
+                    # Keep serving the previous version (if any) rather than failing requests
+                    logger.error(f"Error loading personality {name}: {e}")
+                    self._mtimes[name] = mtime
+                    continue
+
+                if name in self._personalities:
+                    logger.info(f"Reloaded personality {name}")
+                self._personalities[name] = compiled
+                self._mtimes[name] = mtime
+
+        for name in set(self._personalities) - seen:
+            logger.info(f"Personality {name} removed")
+            del self._personalities[name]
+        for name in set(self._mtimes) - seen:
+            del self._mtimes[name]
+
+
+# Global personality registry instance
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_personality_registry():
+    """Get the global personality registry, loading it on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = PersonalityRegistry(
+                    hot_reload=PERSONALITY_HOT_RELOAD,
+                    reload_interval=PERSONALITY_RELOAD_INTERVAL
+                )
+                registry.load_all()
+                _registry = registry
+    return _registry
+
 
 def get_available_personalities():
-    """Get list of available personality names from JSON files"""
-    personality_dir = Path(__file__).parent.parent / "personalities"
-    personalities = []
-    
-    if personality_dir.exists():
-        for file_path in personality_dir.glob("*.json"):
-            if file_path.name != "README.md":  # Skip README
-                personality_name = file_path.stem
-                personalities.append(personality_name)
-    
-    return sorted(personalities)
+    """Get list of available personality names"""
+    return get_personality_registry().names()
+
 
 def load_personality(personality_name=None):
-    """Load personality responses from JSON file"""
+    """Get a personality from the registry, falling back to the default personality"""
     if personality_name is None:
         personality_name = os.environ.get("BOT_PERSONALITY", DEFAULT_PERSONALITY)
-    
-    # Path to personality files
-    personality_dir = Path(__file__).parent.parent / "personalities"
-    personality_file = personality_dir / f"{personality_name}.json"
-    
+
+    registry = get_personality_registry()
+    personality = registry.get(personality_name)
+
     # Load default personality if requested one doesn't exist
-    if not personality_file.exists():
-        default_file = personality_dir / f"{DEFAULT_PERSONALITY}.json"
-        if default_file.exists():
-            personality_file = default_file
-        else:
-            raise FileNotFoundError(f"Required personality file not found: {personality_file}")
-    
-    try:
-        with open(personality_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        raise RuntimeError(f"Error loading personality {personality_name}: {e}")
+    if personality is None:
+        personality = registry.get(DEFAULT_PERSONALITY)
+        if personality is None:
+            raise FileNotFoundError(f"Required personality file not found: {PERSONALITY_DIR / f'{DEFAULT_PERSONALITY}.json'}")
+
+    return personality
+
 
 def load_personality_for_channel(channel_id, db_manager):
     """Load personality for a specific channel, falling back to default if not configured"""
     try:
         # Check if this channel has a leaderboard override
         effective_channel = db_manager.get_effective_leaderboard_channel(channel_id)
-        
+
         # Get config from the effective channel (could be the same channel or override target)
         config = db_manager.get_channel_config(effective_channel)
         if config and config['personality_name']:
             return load_personality(config['personality_name'])
     except Exception as e:
         # Log error but don't fail - fall back to default
-        import logging
-        logger = logging.getLogger(__name__)
         logger.warning(f"Failed to load channel-specific personality for {channel_id}: {e}")
-    
+
     # Fall back to default personality
     return load_personality()
@@ -5,5 +5,70 @@ MONTHLY_QUOTA = int(os.environ.get("MONTHLY_QUOTA", "10"))
 DEFAULT_PERSONALITY = os.environ.get("BOT_PERSONALITY", "crab")
 LEADERBOARD_LIMIT = int(os.environ.get("LEADERBOARD_LIMIT", "10"))
 
+# Deployment Configuration
+IS_LAMBDA = bool(os.environ.get("AWS_LAMBDA_FUNCTION_NAME"))
+
+# Database Pool Configuration
+# A Lambda container serves one request at a time, so one connection is enough there.
+# Containers default to 4 to stay under the Aiven free tier's 5 connection limit.
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "1" if IS_LAMBDA else "4"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "5"))
+DB_POOL_MAX_LIFETIME = int(os.environ.get("DB_POOL_MAX_LIFETIME", "1800"))
+DB_POOL_PING_AFTER = float(os.environ.get("DB_POOL_PING_AFTER", "30"))
+
+# Read Replica
+# With DATABASE_READ_URL set, leaderboards, stats and status read from a separate replica pool. Reads go back
+# to the primary while the replica is unreachable or more than DB_REPLICA_MAX_LAG seconds behind, which is
+# re-checked at most every DB_REPLICA_CHECK_INTERVAL seconds.
+DB_READ_POOL_MAX = int(os.environ.get("DB_READ_POOL_MAX", str(DB_POOL_MAX)))
+DB_REPLICA_MAX_LAG = float(os.environ.get("DB_REPLICA_MAX_LAG", "10"))
+DB_REPLICA_CHECK_INTERVAL = float(os.environ.get("DB_REPLICA_CHECK_INTERVAL", "15"))
+
+# Schema Migrations
+# Transactional migrations give up instead of queueing behind long-running queries
+MIGRATION_LOCK_TIMEOUT = os.environ.get("MIGRATION_LOCK_TIMEOUT", "5s")
+
+# Kudos Partitions
+# kudos is range-partitioned by month; partitions are created this many months ahead at startup
+KUDOS_PARTITIONS_AHEAD = int(os.environ.get("KUDOS_PARTITIONS_AHEAD", "3"))
+
+# Announcement Outbox
+# Channel announcements are queued with their kudos and posted by a background dispatcher
+OUTBOX_CONCURRENCY = int(os.environ.get("OUTBOX_CONCURRENCY", "4"))
+OUTBOX_POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", "5"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_LEASE_SECONDS = float(os.environ.get("OUTBOX_LEASE_SECONDS", "60"))
+OUTBOX_RETENTION_HOURS = float(os.environ.get("OUTBOX_RETENTION_HOURS", "24"))
+
+# Slack API Rate Limits
+# Calls wait up to SLACK_RATE_LIMIT_MAX_WAIT seconds for a client-side token; 429s are retried SLACK_MAX_RETRIES times
+SLACK_RATE_LIMIT_MAX_WAIT = float(os.environ.get("SLACK_RATE_LIMIT_MAX_WAIT", "10"))
+SLACK_MAX_RETRIES = int(os.environ.get("SLACK_MAX_RETRIES", "2"))
+# Web API root; point it at a local stand-in (e.g. benchmarks/load_test.py's fake Slack) for offline runs
+SLACK_API_BASE_URL = os.environ.get("SLACK_API_BASE_URL", "https://slack.com/api/").rstrip("/") + "/"
+
+# Channel Name Index
+# Public channel names are re-listed every CHANNEL_INDEX_TTL seconds (events keep them current in between);
+# a lookup that misses before the first listing finishes fetches at most CHANNEL_INDEX_PAGES_PER_LOOKUP pages
+CHANNEL_INDEX_TTL = float(os.environ.get("CHANNEL_INDEX_TTL", "3600"))
+CHANNEL_INDEX_PAGES_PER_LOOKUP = int(os.environ.get("CHANNEL_INDEX_PAGES_PER_LOOKUP", "2"))
+
+# Channel Config Cache
+# Configs are cached per process; other processes pick up changes after the TTL expires
+CONFIG_CACHE_TTL = float(os.environ.get("CONFIG_CACHE_TTL", "60"))
+CONFIG_CACHE_SIZE = int(os.environ.get("CONFIG_CACHE_SIZE", "1024"))
+
+# Personality Registry
+# Hot reload re-checks personality file mtimes at most every PERSONALITY_RELOAD_INTERVAL seconds
+PERSONALITY_HOT_RELOAD = os.environ.get("PERSONALITY_HOT_RELOAD", "false").lower() in ("1", "true", "yes")
+PERSONALITY_RELOAD_INTERVAL = float(os.environ.get("PERSONALITY_RELOAD_INTERVAL", "5"))
+
+# Metrics
+# Prometheus-style metrics on GET /metrics (containers), or one JSON log line per invocation (Lambda).
+# gunicorn workers share theirs through snapshot files in METRICS_DIR, rewritten every METRICS_SNAPSHOT_INTERVAL seconds
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_DIR = os.environ.get("METRICS_DIR", "")
+METRICS_SNAPSHOT_INTERVAL = float(os.environ.get("METRICS_SNAPSHOT_INTERVAL", "5"))
+
 # Server Configuration
 DEFAULT_PORT = int(os.environ.get("PORT", "3000"))
@@ -0,0 +1,62 @@
+"""
+In-process LRU + TTL cache of channel configs for Kiitos Krab.
+
+Shared by the threaded and asyncio database managers. Entries expire after
+ttl seconds so other processes' changes are picked up; local saves and
+deletes invalidate immediately. A generation counter stops a read that
+raced with an invalidation from caching the stale row it fetched.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class ChannelConfigCache:
+    """Thread-safe LRU + TTL cache of channel_id -> config dict (or None for no config)"""
+
+    def __init__(self, ttl=60.0, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+
+        self._entries = OrderedDict()  # channel_id -> (expires_at, config or None)
+        self._lock = threading.Lock()
+        self._generation = 0  # bumped on every invalidation
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def lookup(self, channel_id):
+        """Return (hit, config, generation); pass generation to store() after a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(channel_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(channel_id)
+                self.stats['hits'] += 1
+                return True, dict(entry[1]) if entry[1] else None, self._generation
+            self.stats['misses'] += 1
+            return False, None, self._generation
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def store(self, channel_id, config, generation):
+        with self._lock:
+            # A save or delete happened while the caller was reading - don't cache a possibly stale row
+            if generation != self._generation:
+                return
+            self._entries[channel_id] = (time.monotonic() + self.ttl, config)
+            self._entries.move_to_end(channel_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, channel_id):
+        with self._lock:
+            self._entries.pop(channel_id, None)
+            self._generation += 1
+
+    def get_stats(self):
+        """Get hit/miss/eviction counters and the current size"""
+        with self._lock:
+            return dict(self.stats, size=len(self._entries))
@@ -0,0 +1,176 @@
+"""
+Thread-safe PostgreSQL connection pool for Kiitos Krab.
+
+psycopg2's SimpleConnectionPool is not safe to share between threads and
+fails immediately when exhausted. This pool is shared by every Bolt listener
+thread: checkouts wait (up to a timeout) for a free connection, idle
+connections are health-checked before being handed out, and connections are
+recycled once they get old or are left broken by a failed rollback.
+"""
+
+import logging
+import threading
+import time
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(PoolError):
+    """Raised when no connection became available within the checkout timeout"""
+
+
+class BoundedConnectionPool:
+    """Thread-safe connection pool with bounded checkout waits and connection recycling"""
+
+    def __init__(self, dsn, maxconn=4, timeout=5.0, max_lifetime=1800, ping_after=30.0, cursor_factory=None):
+        self.dsn = dsn
+        self.cursor_factory = cursor_factory
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+
+        self._cond = threading.Condition()
+        self._idle = []  # (conn, returned_at), most recently used last
+        self._created_at = {}  # id(conn) -> creation time
+        self._size = 0  # open connections, idle or checked out
+        self._closed = False
+
+        self.stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'reconnects': 0,
+            'discarded': 0
+        }
+
+    def getconn(self):
+        """Check out a connection, waiting up to the pool timeout for one to free up"""
+        deadline = time.monotonic() + self.timeout
+        conn = None
+        returned_at = None
+
+        with self._cond:
+            waited = False
+            while True:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    # Reserve a slot; the connection is opened outside the lock
+                    self._size += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise PoolTimeout(f"no database connection available within {self.timeout}s (pool size {self.maxconn})")
+                if not waited:
+                    self.stats['waits'] += 1
+                    waited = True
+                self._cond.wait(remaining)
+
+        if conn is not None and not self._is_usable(conn, returned_at):
+            self._discard(conn, release_slot=False)
+            conn = None
+            with self._cond:
+                self.stats['reconnects'] += 1
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+
+        with self._cond:
+            self.stats['checkouts'] += 1
+        return conn
+
+    def putconn(self, conn, close=False):
+        """Return a connection to the pool, closing it if it is broken or too old"""
+        if not close and not conn.closed:
+            # Never hand out a connection with an open or aborted transaction
+            if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    close = True
+            if self._is_expired(conn):
+                close = True
+
+        if close or conn.closed or self._closed:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        """Close idle connections; checked-out connections are closed when returned"""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle = []
+            self._cond.notify_all()
+
+        for conn in idle:
+            self._discard(conn)
+
+    def get_stats(self):
+        """Get pool counters and current utilization"""
+        with self._cond:
+            return dict(
+                self.stats,
+                size=self._size,
+                idle=len(self._idle),
+                in_use=self._size - len(self._idle),
+                maxconn=self.maxconn
+            )
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, cursor_factory=self.cursor_factory)
+        self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _is_expired(self, conn):
+        created_at = self._created_at.get(id(conn))
+        return created_at is not None and time.monotonic() - created_at > self.max_lifetime
+
+    def _is_usable(self, conn, returned_at):
+        """Check an idle connection before handing it out"""
+        if conn.closed or self._is_expired(conn):
+            return False
+
+        # Connections that sat idle for a while may have been dropped by the server or a proxy
+        if time.monotonic() - returned_at > self.ping_after:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.rollback()
+            except Exception as e:
+                logger.warning(f"Discarding dead pooled connection: {e}")
+                return False
+
+        return True
+
+    def _discard(self, conn, release_slot=True):
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+        with self._cond:
+            self.stats['discarded'] += 1
+            if release_slot:
+                self._size -= 1
+                self._cond.notify()
@@ -39,5 +39,8 @@ echo "   - SLACK_SIGNING_SECRET"
 echo "   - DATABASE_URL"
 echo "   - SLACK_CHANNEL_ID"
 echo "   - MONTHLY_QUOTA (optional, default: 10)"
-echo "4. Set timeout to 30 seconds"
-echo "5. Configure Slack Events API endpoint" 
\ No newline at end of file
+echo "4. Run 'python migrations.py up' against DATABASE_URL to apply schema migrations"
+echo "5. Set timeout to 30 seconds"
+echo "   Grant the function's role lambda:InvokeFunction on itself (lazy listeners run as async invocations)"
+echo "6. Configure Slack Events API endpoint"
+echo "7. Add an EventBridge schedule (e.g. rate(1 minute)) targeting the function to retry failed announcements and create kudos partitions" 
\ No newline at end of file
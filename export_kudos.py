@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Utility script to archive kudos to monthly files before clearing them.
+
+Each month is streamed out of its own partition - with COPY TO STDOUT for
+gzip CSV, or a server-side cursor for Parquet - so memory use doesn't grow
+with the table. A manifest.json next to the files records every file's row
+count and SHA-256, and --verify checks an archive against it (and against
+the database) before `clear_kudos.py` deletes anything.
+
+Parquet needs pyarrow: pip install -r requirements-export.txt
+"""
+
+import os
+import sys
+import csv
+import gzip
+import json
+import hashlib
+import argparse
+from datetime import datetime
+from dotenv import load_dotenv
+
+# Load environment variables before the database module reads them
+load_dotenv()
+
+from database import get_db_manager, is_sqlite_url
+from utils.date_parser import add_months
+
+MANIFEST_NAME = "manifest.json"
+COLUMNS = ("id", "sender", "receiver", "channel_id", "timestamp")
+
+# Rows per Parquet row group (and per server-side cursor fetch)
+PARQUET_BATCH_SIZE = 50000
+
+FILE_EXTENSIONS = {"csv": ".csv.gz", "parquet": ".parquet"}
+
+
+def get_range_filter(channel_id):
+    return "timestamp >= %(start)s AND timestamp < %(end)s" + (" AND channel_id = %(channel_id)s" if channel_id else "")
+
+
+def file_sha256(path):
+    """Hash a file in 1 MiB chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_export_months(conn, before=None):
+    """Get every month with a kudos partition or rows in kudos_default, up to the one containing before"""
+    months = set(get_db_manager().get_kudos_partitions(conn))
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT DISTINCT DATE_TRUNC('month', timestamp)::DATE FROM kudos_default")
+        months.update(row[0] for row in cursor.fetchall())
+    return sorted(month for month in months if before is None or datetime.combine(month, datetime.min.time()) < before)
+
+
+def write_csv(conn, path, params, channel_id):
+    """Stream one month into a gzip CSV with COPY TO STDOUT"""
+    with conn.cursor() as cursor:
+        sql = cursor.mogrify(f"""
+        COPY (
+            SELECT {', '.join(COLUMNS)} FROM kudos
+            WHERE {get_range_filter(channel_id)}
+            ORDER BY id
+        ) TO STDOUT WITH (FORMAT csv, HEADER)
+        """, params).decode()
+        with gzip.open(path, "wb") as f:
+            cursor.copy_expert(sql, f)
+
+
+def write_parquet(conn, path, params, channel_id):
+    """Stream one month into a Parquet file, one row group per server-side cursor batch"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("sender", pa.string()),
+        ("receiver", pa.string()),
+        ("channel_id", pa.string()),
+        ("timestamp", pa.timestamp("us"))
+    ])
+    with conn.cursor(name="export_kudos") as cursor:
+        cursor.itersize = PARQUET_BATCH_SIZE
+        cursor.execute(f"""
+        SELECT {', '.join(COLUMNS)} FROM kudos
+        WHERE {get_range_filter(channel_id)}
+        ORDER BY id
+        """, params)
+        with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            while True:
+                rows = cursor.fetchmany(PARQUET_BATCH_SIZE)
+                if not rows:
+                    break
+                columns = list(zip(*rows))
+                writer.write_table(pa.Table.from_arrays([pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema))
+
+
+def count_file_rows(path, file_format):
+    """Count the data rows in an archive file by reading it back"""
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+
+    with gzip.open(path, "rt", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header != list(COLUMNS):
+            raise ValueError(f"unexpected header {header}")
+        return sum(1 for _ in reader)
+
+
+def export_kudos(output_dir, file_format="csv", before=None, channel_id=None):
+    """
+    Export kudos to one file per month plus a manifest.
+
+    Args:
+        output_dir (str): Directory for the files and manifest.json
+        file_format (str): 'csv' (gzip) or 'parquet'
+        before (datetime): Only export kudos before this time
+        channel_id (str): Only export kudos in this channel
+
+    Returns:
+        dict: The manifest that was written
+    """
+    if file_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("❌ Parquet export needs pyarrow: pip install -r requirements-export.txt")
+            sys.exit(1)
+
+    os.makedirs(output_dir, exist_ok=True)
+    target = (f"before {before.strftime('%Y-%m-%d')}" if before else "all time") + (f" in channel {channel_id}" if channel_id else "")
+    print(f"🦀 Exporting kudos ({target}) to {output_dir} as {file_format}...")
+
+    manifest = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "format": file_format,
+        "before": before.isoformat() if before else None,
+        "channel_id": channel_id,
+        "columns": list(COLUMNS),
+        "files": []
+    }
+    writer = write_parquet if file_format == "parquet" else write_csv
+
+    with get_db_manager().get_connection() as conn:
+        # One snapshot for the whole export, so each file's count matches what was written
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        try:
+            for month in get_export_months(conn, before):
+                start = datetime.combine(month, datetime.min.time())
+                end = datetime.combine(add_months(month, 1), datetime.min.time())
+                if before:
+                    end = min(end, before)
+                params = {"start": start, "end": end, "channel_id": channel_id}
+
+                with conn.cursor() as cursor:
+                    cursor.execute(f"SELECT COUNT(*) FROM kudos WHERE {get_range_filter(channel_id)}", params)
+                    rows = cursor.fetchone()[0]
+                if rows == 0:
+                    continue
+
+                name = f"kudos_{month.strftime('%Y-%m')}{FILE_EXTENSIONS[file_format]}"
+                path = os.path.join(output_dir, name)
+                writer(conn, path + ".tmp", params, channel_id)
+                os.replace(path + ".tmp", path)
+
+                manifest["files"].append({
+                    "month": month.strftime("%Y-%m"),
+                    "path": name,
+                    "start": start.isoformat(),
+                    "end": end.isoformat(),
+                    "rows": rows,
+                    "bytes": os.path.getsize(path),
+                    "sha256": file_sha256(path)
+                })
+                print(f"   📦 {name}: {rows:,} rows ({os.path.getsize(path):,} bytes)")
+            conn.commit()
+        finally:
+            conn.rollback()
+            conn.set_session(isolation_level="DEFAULT", readonly="DEFAULT")
+
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    total = sum(entry["rows"] for entry in manifest["files"])
+    print(f"\n✅ Done! Exported {total:,} kudos in {len(manifest['files'])} file(s) 🦀")
+    print(f"Run `python export_kudos.py --verify {output_dir}` before clearing them.")
+    return manifest
+
+
+def verify_archive(output_dir):
+    """
+    Check every file in an archive against its manifest and the database.
+
+    A file passes if its checksum and row count match the manifest and the
+    database holds no more rows for its month than were archived (fewer is
+    fine - they may already have been cleared).
+
+    Returns:
+        bool: True if the whole archive checks out
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        print(f"❌ No {MANIFEST_NAME} in {output_dir}")
+        return False
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    print(f"🔍 Verifying {len(manifest['files'])} archive file(s) in {output_dir}...")
+    channel_id = manifest.get("channel_id")
+    failures = 0
+
+    with get_db_manager().get_connection() as conn:
+        for entry in manifest["files"]:
+            path = os.path.join(output_dir, entry["path"])
+            problems = []
+            if not os.path.exists(path):
+                problems.append("file is missing")
+            else:
+                if file_sha256(path) != entry["sha256"]:
+                    problems.append("checksum mismatch")
+                try:
+                    file_rows = count_file_rows(path, manifest["format"])
+                    if file_rows != entry["rows"]:
+                        problems.append(f"{file_rows:,} rows in file, {entry['rows']:,} in manifest")
+                except Exception as e:
+                    problems.append(f"unreadable ({e})")
+
+            params = {"start": entry["start"], "end": entry["end"], "channel_id": channel_id}
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) FROM kudos WHERE {get_range_filter(channel_id)}", params)
+                database_rows = cursor.fetchone()[0]
+            conn.commit()
+            if database_rows > entry["rows"]:
+                problems.append(f"database has {database_rows:,} rows, archive only {entry['rows']:,}")
+
+            if problems:
+                failures += 1
+                print(f"   ❌ {entry['path']}: {'; '.join(problems)}")
+            else:
+                print(f"   ✅ {entry['path']}: {entry['rows']:,} rows, checksum ok ({database_rows:,} still in database)")
+
+    if failures:
+        print(f"\n⚠️  {failures} file(s) failed verification - don't clear these months yet")
+        return False
+
+    print("\n✅ Archive verified - safe to clear these months 🦀")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Archive kudos to monthly gzip CSV or Parquet files",
+        epilog="Examples:\n"
+               "  python export_kudos.py archive/\n"
+               "  python export_kudos.py archive/ --before 2024-01-01 --format parquet\n"
+               "  python export_kudos.py --verify archive/",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("output_dir", help="directory for the monthly files and manifest.json")
+    parser.add_argument("--format", choices=sorted(FILE_EXTENSIONS), default="csv", help="file format (default: csv, gzipped)")
+    parser.add_argument("--before", metavar="YYYY-MM-DD", help="only export kudos before this date")
+    parser.add_argument("--channel", metavar="CHANNEL_ID", help="only export kudos in this channel")
+    parser.add_argument("--verify", action="store_true", help="verify an existing archive instead of exporting")
+    args = parser.parse_args()
+
+    if is_sqlite_url(os.environ.get('DATABASE_URL', '')):
+        print("❌ export_kudos.py needs PostgreSQL - DATABASE_URL points at an SQLite database")
+        sys.exit(1)
+
+    if args.verify:
+        sys.exit(0 if verify_archive(args.output_dir) else 1)
+
+    before = None
+    if args.before:
+        try:
+            before = datetime.strptime(args.before, "%Y-%m-%d")
+        except ValueError:
+            print("❌ Invalid date format! Use YYYY-MM-DD")
+            sys.exit(1)
+
+    export_kudos(args.output_dir, args.format, before, args.channel)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Gunicorn settings for serving Kiitos Krab in production:
+  gunicorn -c gunicorn.conf.py wsgi:application
+
+Each worker process has its own Bolt app, config cache and DB pool. Threads
+let a worker keep acking new Slack requests while others wait on Slack or
+the database. The total connection budget (DB_MAX_CONNECTIONS) is split
+between workers, so adding workers never exceeds the database's limit.
+"""
+import glob
+import json
+import os
+import tempfile
+
+# Server socket
+bind = f"0.0.0.0:{os.environ.get('PORT', '3000')}"
+
+# Worker model
+worker_class = "gthread"
+workers = int(os.environ.get("GUNICORN_WORKERS", os.environ.get("WEB_CONCURRENCY", "2")))
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+
+# Slack retries a request after 3 seconds, so nothing legitimate runs anywhere near this long
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+# Time in-flight requests get to finish on SIGTERM before workers are killed
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+# Keep connections from the load balancer / Slack open between requests
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers now and then so slow leaks can't build up
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "INFO").lower()
+
+# Per-worker pool sizing: split the total budget between workers, never more than one
+# connection per thread. Set before any worker imports config.settings.
+DB_MAX_CONNECTIONS = int(os.environ.get("DB_MAX_CONNECTIONS", "4"))
+os.environ.setdefault("DB_POOL_MAX", str(max(1, min(threads, DB_MAX_CONNECTIONS // workers))))
+
+# Workers share /metrics through snapshot files in this directory (created fresh for each master)
+os.environ.setdefault("METRICS_DIR", tempfile.mkdtemp(prefix="kudos-krab-metrics-"))
+
+
+def on_starting(server):
+    # Counters left behind by a previous run would be added to this one's
+    for path in glob.glob(os.path.join(os.environ["METRICS_DIR"], "metrics-*.json")):
+        os.remove(path)
+    server.log.info(
+        f"🦀 Starting Kiitos Krab: {workers} worker(s) x {threads} thread(s), "
+        f"{os.environ['DB_POOL_MAX']} DB connection(s) per worker"
+    )
+
+
+def post_worker_init(worker):
+    """Verify the schema, warm this worker's config cache, start its announcement dispatcher and metrics snapshots"""
+    from kudos_bot import prepare_server
+    from utils import metrics
+    prepare_server()
+    metrics.get_snapshot_writer().start()
+
+
+def worker_exit(server, worker):
+    """Drain this worker's lazy listeners, then its announcement dispatcher and DB pool, and write its final metrics"""
+    import threading
+    import database
+    from kudos_bot import app
+    from utils import announcement_dispatcher, metrics
+    # Requests are acked before their lazy listeners run, so some of the work may still be queued
+    # on Bolt's executor. Let it finish (within graceful_timeout) while the pool and dispatcher are up.
+    drain = threading.Thread(target=app.listener_runner.lazy_listener_runner.executor.shutdown, kwargs={"wait": True})
+    drain.start()
+    drain.join(server.cfg.graceful_timeout)
+    if drain.is_alive():
+        worker.log.warning(f"Lazy listeners still running after {server.cfg.graceful_timeout}s in worker {worker.pid}")
+    if announcement_dispatcher.announcement_dispatcher is not None:
+        announcement_dispatcher.announcement_dispatcher.stop()
+    if database.db_manager is not None:
+        database.db_manager.close()
+        worker.log.info(f"Closed database pool for worker {worker.pid}")
+    # Keep this worker's counters in /metrics after it is gone
+    if metrics.snapshot_writer is not None:
+        metrics.snapshot_writer.stop()
+
+
+def child_exit(server, worker):
+    """Fold an exited worker's metrics snapshot into the retired workers' totals.
+
+    Keeps its counters and histograms (so totals never go down) and drops its
+    gauges, then removes its own file, so recycled workers don't leave a file
+    each for every scrape to merge. Runs in the master, which must not import
+    the bot (workers load .env before config.settings).
+    """
+    metrics_dir = os.environ["METRICS_DIR"]
+    path = os.path.join(metrics_dir, f"metrics-{worker.pid}.json")
+    retired_path = os.path.join(metrics_dir, "metrics-retired.json")
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return
+    try:
+        with open(retired_path) as f:
+            retired = json.load(f)
+    except (OSError, ValueError):
+        retired = {"counters": [], "gauges": [], "histograms": []}
+
+    for kind, add in (("counters", lambda a, b: a + b), ("histograms", lambda a, b: [x + y for x, y in zip(a, b)])):
+        totals = {}
+        for name, labels, value in retired.get(kind, []) + snapshot.get(kind, []):
+            key = (name, tuple(sorted(labels.items())))
+            totals[key] = add(totals[key], value) if key in totals else value
+        retired[kind] = [[name, dict(labels), value] for (name, labels), value in totals.items()]
+
+    # Swap the files back to back, so a scrape in between is off by at most one worker for an instant
+    with open(f"{retired_path}.tmp", "w") as f:
+        json.dump(retired, f)
+    os.replace(f"{retired_path}.tmp", retired_path)
+    os.remove(path)
@@ -0,0 +1,298 @@
+"""
+Async versions of the /kk handlers for the AsyncApp stack (async_kudos_bot.py).
+
+Parsing, validation and message formatting are shared with the threaded
+handlers; only the database (AsyncDatabaseManager) and Slack (AsyncWebClient)
+calls are awaited instead of blocking a thread. Channel announcements go
+through the outbox and the threaded announcement dispatcher, which
+async_kudos_bot.py runs in the background.
+"""
+
+import logging
+import time
+from datetime import datetime
+from config.personalities import load_personality
+from models.channel_context import ChannelContext
+from utils.announcement_dispatcher import get_announcement_dispatcher
+from utils.channel_index import get_channel_index
+from utils.date_parser import parse_month_year, get_target_date
+from utils.slack_client import get_rate_limiter
+from utils.user_utils import (
+    extract_user_mentions,
+    extract_message_text,
+    remove_duplicate_users,
+    validate_kudos_recipients
+)
+from utils.message_formatter import (
+    format_kudos_announcement,
+    format_kudos_confirmation,
+    format_leaderboard,
+    format_stats_message,
+    format_error_message
+)
+from handlers.help_handler import get_help_message
+from handlers.leaderboard_handler import parse_leaderboard_params
+from handlers.config_handler import (
+    build_config_modal,
+    parse_config_submission,
+    format_config_saved_message,
+    format_current_config,
+    build_personality_description_view
+)
+from handlers.status_handler import format_status_message
+
+logger = logging.getLogger(__name__)
+
+
+async def handle_kudos_command(command, respond, client, db_manager, bot_user_id, context=None):
+    """Handle the /kk slash command"""
+    user_id = command["user_id"]
+    text = command["text"].strip()
+    channel_id = command.get("channel_id")
+
+    # Resolve channel config, quota and personality once for the whole request
+    if context is None:
+        context = await ChannelContext.resolve_async(channel_id, db_manager)
+
+    if not text:
+        await respond(format_error_message("no_mentions", context=context))
+        return True
+
+    # Extract all mentioned users (these are already user IDs)
+    mentioned_users = extract_user_mentions(text)
+    if not mentioned_users:
+        await respond(format_error_message("no_mentions", context=context))
+        return True
+
+    # Remove duplicates while preserving order, then validate recipients
+    unique_users = remove_duplicate_users(mentioned_users)
+    validation_errors = validate_kudos_recipients(user_id, unique_users, bot_user_id)
+
+    if "self_kudos" in validation_errors:
+        await respond(format_error_message("self_kudos", context=context))
+        return True
+
+    if "bot_kudos" in validation_errors:
+        await respond(format_error_message("bot_kudos", context=context))
+        return True
+
+    message = extract_message_text(text)
+    if not message:
+        await respond(format_error_message("empty_message", context=context))
+        return True
+
+    kudos_needed = len(unique_users)
+    announcement = format_kudos_announcement(user_id, unique_users, message, context=context)
+
+    # Record all kudos and queue the announcement in one transaction; the quota is re-checked under a per-sender lock
+    result = await db_manager.record_kudos_batch(
+        user_id, unique_users, channel_id, context.monthly_quota,
+        local_month=context.get_current_local_month(),
+        announcement=announcement
+    )
+
+    if result is None:
+        failed_mentions = " ".join([f"<@{user}>" for user in unique_users])
+        await respond(format_error_message("failed_kudos", context=context, failed_mentions=failed_mentions))
+        return True
+
+    if not result['success']:
+        await respond(format_error_message("quota_exceeded", context=context, kudos_needed=kudos_needed, remaining=result['remaining']))
+        return True
+
+    # The dispatcher thread posts the announcement (and retries it if Slack fails)
+    get_announcement_dispatcher().announce(result['announcement_id'])
+
+    await respond(format_kudos_confirmation(kudos_needed, result['remaining'], context=context))
+    return True
+
+
+async def handle_stats_command(user_id, respond, db_manager, channel_id=None, context=None):
+    """Handle stats request"""
+    try:
+        if context is None:
+            context = await ChannelContext.resolve_async(channel_id, db_manager)
+
+        # Monthly and all-time counts in one query, using the channel's current local month
+        user_stats = await db_manager.get_user_stats(user_id, channel_id, local_month=context.get_current_local_month())
+
+        await respond(format_stats_message(
+            user_id=user_id,
+            monthly_sent=user_stats['monthly_sent'],
+            monthly_received=user_stats['monthly_received'],
+            monthly_quota=context.monthly_quota,
+            total_sent=user_stats['total_sent'],
+            total_received=user_stats['total_received'],
+            context=context
+        ))
+    except Exception as e:
+        logger.error(f"Error getting stats: {e}")
+        await respond(format_error_message("stats_error", context=context))
+
+
+def get_channel_id_from_name(channel_name):
+    """Look up a public channel's ID by name from the channel index, without paging on the event loop"""
+    clean_name = channel_name.lstrip('#')
+    if clean_name and clean_name[0].upper() in ['C', 'G', 'D']:
+        return clean_name
+    # The index is built by its background thread (see async_kudos_bot.on_startup)
+    return get_channel_index().lookup(clean_name, max_pages=0)
+
+
+async def handle_leaderboard_command(respond, db_manager, client, params="", channel_id=None, context=None):
+    """Handle leaderboard request with optional month/year parameters, channel name, and public posting"""
+    try:
+        target_channel_id_or_name, is_public, is_complete, date_params = parse_leaderboard_params(params)
+
+        target_channel_id = channel_id
+        if target_channel_id_or_name:
+            if target_channel_id_or_name[0] in ('C', 'G', 'D'):
+                target_channel_id = target_channel_id_or_name
+            else:
+                try:
+                    looked_up_id = get_channel_id_from_name(target_channel_id_or_name)
+                except Exception as e:
+                    await respond(f"❌ Error looking up channel {target_channel_id_or_name}: {e}")
+                    return
+                if not looked_up_id:
+                    await respond(f"❌ Channel {target_channel_id_or_name} not found. Only public channels can be accessed by name. If this is a private channel, use the leaderboard command from within that channel.")
+                    return
+                target_channel_id = looked_up_id
+
+        # Resolve the target channel's config once (reusing the command channel's context when it's the same channel)
+        if context is not None and context.channel_id == target_channel_id:
+            target_context = context
+        else:
+            target_context = await ChannelContext.resolve_async(target_channel_id, db_manager)
+
+        month, year = parse_month_year(date_params)
+        if month is None and year is None:
+            target_month, target_year = target_context.get_current_month_year()
+        else:
+            target_month, target_year = get_target_date(month, year)
+
+        # Complete leaderboard only works for current month
+        if is_complete and (month is not None or year is not None):
+            await respond("❌ Complete leaderboard is only available for the current month.")
+            return
+
+        effective_channel_id = target_context.effective_channel_id
+        if is_complete:
+            leaderboard_data = await db_manager.get_complete_monthly_leaderboard(target_month, target_year, effective_channel_id)
+        else:
+            leaderboard_data = await db_manager.get_monthly_leaderboard(target_month, target_year, effective_channel_id, limit=target_context.leaderboard_limit)
+
+        shared_channels = list({effective_channel_id, *await db_manager.get_channels_using_leaderboard(effective_channel_id)})
+        formatted_leaderboard = format_leaderboard(
+            leaderboard_data, target_month, target_year, target_channel_id,
+            context=target_context, shared_channels=shared_channels
+        )
+
+        # For public posting, always post to the channel where the command was issued
+        if is_public and channel_id:
+            if channel_id.startswith('D'):
+                await respond(f"{formatted_leaderboard}\n\n_Note: Public posting doesn't work in DMs. Use this command in a channel to post publicly._")
+            else:
+                announcement_id = await db_manager.enqueue_announcement(channel_id, formatted_leaderboard)
+                if announcement_id is None:
+                    await respond("❌ Failed to post leaderboard to channel. Please try again.")
+                else:
+                    get_announcement_dispatcher().announce(announcement_id)
+                    await respond(load_personality()['leaderboard']['posted_confirmation'])
+        else:
+            await respond(formatted_leaderboard)
+
+    except Exception as e:
+        logger.error(f"Error getting leaderboard: {e}")
+        await respond(format_error_message("database_error", context=context))
+
+
+async def show_help_message(respond, channel_id, db_manager, context=None):
+    """Show the help message with all available commands"""
+    if context is None:
+        context = await ChannelContext.resolve_async(channel_id, db_manager)
+    await respond(get_help_message(context=context))
+
+
+async def show_current_config(respond, channel_id, db_manager, context=None):
+    """Show current channel configuration"""
+    if context is None:
+        context = await ChannelContext.resolve_async(channel_id, db_manager)
+    await respond(format_current_config(channel_id, context))
+
+
+async def reset_config_to_defaults(respond, channel_id, db_manager):
+    """Reset channel configuration to defaults by deleting the config"""
+    if await db_manager.delete_channel_config(channel_id):
+        await respond("✅ Configuration reset to defaults for this channel. Using global settings.")
+    else:
+        await respond("❌ Failed to reset configuration. Please try again.")
+
+
+async def handle_config_command(command, client, db_manager):
+    """Open the configuration modal for the command's channel"""
+    channel_id = command.get('channel_id')
+    current_config = await db_manager.get_channel_config(channel_id)
+    try:
+        await client.views_open(trigger_id=command.get('trigger_id'), view=build_config_modal(channel_id, current_config))
+    except Exception as e:
+        logger.error(f"Failed to open config modal: {e}")
+
+
+async def handle_config_modal_submission(body, client, db_manager):
+    """Save the configuration modal and confirm privately"""
+    channel_id = body['view']['private_metadata']
+    settings = parse_config_submission(body['view']['state']['values'])
+    success = await db_manager.save_channel_config(channel_id=channel_id, **settings)
+
+    await client.chat_postEphemeral(
+        channel=channel_id,
+        user=body['user']['id'],
+        text=format_config_saved_message(channel_id, settings) if success else "❌ Failed to save configuration. Please try again."
+    )
+
+
+async def handle_personality_select(body, client):
+    """Update the personality description in the config modal"""
+    try:
+        await client.views_update(view_id=body['view']['id'], view=build_personality_description_view(body))
+    except Exception as e:
+        logger.error(f"Error updating personality description: {e}")
+
+
+async def get_bot_status(db_manager, client):
+    """Get bot status information (see status_handler.get_bot_status)"""
+    bot_info = {'bot_id': 'Unknown', 'user_id': 'Unknown', 'team': 'Unknown', 'team_id': 'Unknown', 'url': 'Unknown'}
+    try:
+        auth_response = await client.auth_test()
+        bot_info = {key: auth_response.get(key, 'Unknown') for key in bot_info}
+    except Exception as e:
+        logger.warning(f"Failed to get bot auth info: {e}")
+
+    query_start = time.perf_counter()
+    summary = await db_manager.get_status_summary()
+    query_ms = (time.perf_counter() - query_start) * 1000
+
+    return {
+        'bot_info': bot_info,
+        **summary,
+        'pool_stats': db_manager.get_pool_stats(),
+        'config_cache_stats': db_manager.get_config_cache_stats(),
+        'slack_stats': get_rate_limiter().get_stats(),
+        'query_ms': query_ms,
+        'timestamp': datetime.now()
+    }
+
+
+async def handle_status_command(respond, channel_id, db_manager, client, context=None):
+    """Handle the /kk status command to show bot operational status"""
+    try:
+        if context is None:
+            context = await ChannelContext.resolve_async(channel_id, db_manager)
+        start = time.perf_counter()
+        status_info = await get_bot_status(db_manager, client)
+        status_info['elapsed_ms'] = (time.perf_counter() - start) * 1000
+        await respond(format_status_message(status_info, context.personality), response_type="ephemeral")
+    except Exception as e:
+        logger.error(f"Failed to get bot status: {e}")
+        await respond("❌ Failed to get bot status. Check logs for details.", response_type="ephemeral")
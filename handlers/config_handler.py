@@ -2,6 +2,7 @@ import logging
 import os
 from config.personalities import get_available_personalities, load_personality_for_channel, load_personality
 from config.settings import MONTHLY_QUOTA, DEFAULT_PERSONALITY, LEADERBOARD_LIMIT
+from models.channel_context import ChannelContext
 
 logger = logging.getLogger(__name__)
 
@@ -10,12 +11,22 @@ def handle_config_command(ack, command, client, db_manager):
     ack()
     
     channel_id = command.get('channel_id')
-    user_id = command.get('user_id')
     trigger_id = command.get('trigger_id')
     
     # Get current channel configuration
     current_config = db_manager.get_channel_config(channel_id)
+    modal = build_config_modal(channel_id, current_config)
     
+    try:
+        client.views_open(
+            trigger_id=trigger_id,
+            view=modal
+        )
+    except Exception as e:
+        logger.error(f"Failed to open config modal: {e}")
+
+def build_config_modal(channel_id, current_config):
+    """Build the configuration modal for a channel from its current config"""
     # Get available personalities
     available_personalities = get_available_personalities()
     
@@ -292,21 +303,25 @@ def handle_config_command(ack, command, client, db_manager):
     # Add channel_id to private metadata for the modal submission
     modal["private_metadata"] = channel_id
     
-    try:
-        client.views_open(
-            trigger_id=trigger_id,
-            view=modal
-        )
-    except Exception as e:
-        logger.error(f"Failed to open config modal: {e}")
+    return modal
 
-def handle_config_modal_submission(ack, body, client, db_manager):
-    """Handle configuration modal submission"""
-    ack()
-    
+def handle_config_modal_submission(body, client, db_manager):
+    """Handle configuration modal submission (acknowledged by the caller)"""
     channel_id = body['view']['private_metadata']
-    values = body['view']['state']['values']
+    user_id = body['user']['id']
+    settings = parse_config_submission(body['view']['state']['values'])
     
+    # Save configuration
+    success = db_manager.save_channel_config(channel_id=channel_id, **settings)
+    
+    client.chat_postEphemeral(
+        channel=channel_id,
+        user=user_id,
+        text=format_config_saved_message(channel_id, settings) if success else "❌ Failed to save configuration. Please try again."
+    )
+
+def parse_config_submission(values):
+    """Extract save_channel_config keyword arguments from the modal's state values"""
     # Extract values from the modal
     personality = None
     quota = None
@@ -346,26 +361,23 @@ def handle_config_modal_submission(ack, body, client, db_manager):
         leaderboard_limit = None
         timezone = None
     
-    # Save configuration
-    success = db_manager.save_channel_config(
-        channel_id=channel_id,
-        personality_name=personality,
-        monthly_quota=quota,
-        leaderboard_channel_id=leaderboard_channel,
-        leaderboard_limit=leaderboard_limit,
-        timezone=timezone
-    )
+    return {
+        'personality_name': personality,
+        'monthly_quota': quota,
+        'leaderboard_channel_id': leaderboard_channel,
+        'leaderboard_limit': leaderboard_limit,
+        'timezone': timezone
+    }
+
+def format_config_saved_message(channel_id, settings):
+    """Format the private confirmation sent after the config modal is saved"""
+    personality_name = settings['personality_name'] or DEFAULT_PERSONALITY
+    quota_text = f"{settings['monthly_quota']}" if settings['monthly_quota'] else str(MONTHLY_QUOTA)
+    limit_text = f"{settings['leaderboard_limit']}" if settings['leaderboard_limit'] else str(LEADERBOARD_LIMIT)
+    timezone_text = settings['timezone'] or os.getenv('TIMEZONE', 'UTC')
+    leaderboard_text = f"<#{settings['leaderboard_channel_id']}>" if settings['leaderboard_channel_id'] else "this channel"
     
-    if success:
-        # Send private confirmation message to user
-        user_id = body['user']['id']
-        personality_name = personality or DEFAULT_PERSONALITY
-        quota_text = f"{quota}" if quota else str(MONTHLY_QUOTA)
-        limit_text = f"{leaderboard_limit}" if leaderboard_limit else str(LEADERBOARD_LIMIT)
-        timezone_text = timezone or os.getenv('TIMEZONE', 'UTC')
-        leaderboard_text = f"<#{leaderboard_channel}>" if leaderboard_channel else "this channel"
-        
-        message = f"""✅ *Configuration saved for <#{channel_id}>*
+    return f"""✅ *Configuration saved for <#{channel_id}>*
 
 • *Personality:* {personality_name.title()}
 • *Monthly Quota:* {quota_text}
@@ -374,28 +386,19 @@ def handle_config_modal_submission(ack, body, client, db_manager):
 • *Leaderboard:* {leaderboard_text}
 
 Settings will take effect immediately! 🦀"""
-        
-        client.chat_postEphemeral(
-            channel=channel_id,
-            user=user_id,
-            text=message
-        )
-    else:
-        # Send private error message to user
-        user_id = body['user']['id']
-        client.chat_postEphemeral(
-            channel=channel_id,
-            user=user_id,
-            text="❌ Failed to save configuration. Please try again."
-        )
 
-def show_current_config(respond, channel_id, db_manager):
+def show_current_config(respond, channel_id, db_manager, context=None):
     """Show current channel configuration"""
-    config = db_manager.get_channel_config(channel_id)
+    if context is None:
+        context = ChannelContext.resolve(channel_id, db_manager)
+    respond(format_current_config(channel_id, context))
+
+def format_current_config(channel_id, context):
+    """Format a channel's current configuration from its resolved ChannelContext"""
+    config = context.config
     
     if not config:
-        respond("No custom configuration set for this channel. Using default settings.")
-        return
+        return "No custom configuration set for this channel. Using default settings."
     
     personality_name = config['personality_name'] or DEFAULT_PERSONALITY
     quota = config['monthly_quota'] or MONTHLY_QUOTA
@@ -405,7 +408,7 @@ def show_current_config(respond, channel_id, db_manager):
     
     if leaderboard_channel != "this channel":
         # Channel override is set - show inherited settings
-        source_config = db_manager.get_channel_config(leaderboard_channel)
+        source_config = context.effective_config
         if source_config:
             inherited_personality = source_config['personality_name'] or DEFAULT_PERSONALITY
             inherited_quota = source_config['monthly_quota'] or MONTHLY_QUOTA
@@ -439,7 +442,7 @@ Use `/kk config edit` to modify these settings."""
 
 Use `/kk config edit` to modify these settings."""
     
-    respond(message)
+    return message
 
 def reset_config_to_defaults(respond, channel_id, db_manager):
     """Reset channel configuration to defaults by deleting the config"""
@@ -455,53 +458,50 @@ def reset_config_to_defaults(respond, channel_id, db_manager):
         logger.error(f"Error resetting config for {channel_id}: {e}")
         respond("❌ Failed to reset configuration. Please try again.")
 
-def handle_personality_select(ack, body, client, db_manager):
-    """Handle personality dropdown selection and update description dynamically"""
-    ack()
-    
+def handle_personality_select(body, client, db_manager):
+    """Handle personality dropdown selection and update description dynamically (acknowledged by the caller)"""
     try:
-        # Get the selected personality
-        selected_personality = body['actions'][0]['selected_option']['value']
-        
-        # Load the personality data to get description
-        personality_data = load_personality(selected_personality)
-        description_text = personality_data.get('description', 'No description available') if personality_data else 'No description available'
-        
-        # Get the current view
-        view = body['view']
-        
-        # Update the description block
-        updated_blocks = []
-        for block in view['blocks']:
-            if block.get('block_id') == 'personality_description':
-                # Update the description block
-                updated_blocks.append({
-                    "type": "context",
-                    "block_id": "personality_description",
-                    "elements": [
-                        {
-                            "type": "mrkdwn",
-                            "text": f"_{description_text}_"
-                        }
-                    ]
-                })
-            else:
-                # Keep other blocks unchanged
-                updated_blocks.append(block)
-        
-        # Update the view
-        client.views_update(
-            view_id=body['view']['id'],
-            view={
-                "type": "modal",
-                "callback_id": "config_modal",
-                "title": view['title'],
-                "blocks": updated_blocks,
-                "submit": view.get('submit'),
-                "close": view.get('close'),
-                "private_metadata": view.get('private_metadata', '')
-            }
-        )
-        
+        client.views_update(view_id=body['view']['id'], view=build_personality_description_view(body))
     except Exception as e:
         logger.error(f"Error updating personality description: {e}")
+
+def build_personality_description_view(body):
+    """Rebuild the config modal with the description of the newly selected personality"""
+    # Get the selected personality
+    selected_personality = body['actions'][0]['selected_option']['value']
+    
+    # Load the personality data to get description
+    personality_data = load_personality(selected_personality)
+    description_text = personality_data.get('description', 'No description available') if personality_data else 'No description available'
+    
+    # Get the current view
+    view = body['view']
+    
+    # Update the description block
+    updated_blocks = []
+    for block in view['blocks']:
+        if block.get('block_id') == 'personality_description':
+            # Update the description block
+            updated_blocks.append({
+                "type": "context",
+                "block_id": "personality_description",
+                "elements": [
+                    {
+                        "type": "mrkdwn",
+                        "text": f"_{description_text}_"
+                    }
+                ]
+            })
+        else:
+            # Keep other blocks unchanged
+            updated_blocks.append(block)
+    
+    return {
+        "type": "modal",
+        "callback_id": "config_modal",
+        "title": view['title'],
+        "blocks": updated_blocks,
+        "submit": view.get('submit'),
+        "close": view.get('close'),
+        "private_metadata": view.get('private_metadata', '')
+    }
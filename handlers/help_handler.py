@@ -1,13 +1,29 @@
-def show_help_message(respond, channel_id=None, db_manager=None):
+# The words /kk treats as a subcommand rather than the start of a kudos
+SUBCOMMANDS = ("leaderboard", "stats", "help", "config", "status", "version")
+
+
+def get_subcommand(text):
+    """Name a /kk invocation for metrics: its subcommand, 'help' for an unknown word, else 'kudos'"""
+    words = text.split()
+    if words and words[0].lower() in SUBCOMMANDS:
+        return words[0].lower()
+    if len(words) == 1:
+        return "help"
+    return "kudos"
+
+
+def show_help_message(respond, channel_id=None, db_manager=None, context=None):
     """Show the help message with all available commands"""
-    from config.personalities import load_personality, load_personality_for_channel
+    respond(get_help_message(channel_id, db_manager, context))
+
+
+def get_help_message(channel_id=None, db_manager=None, context=None):
+    """Get the help message with all available commands"""
+    from utils.message_formatter import get_personality
     
-    if channel_id and db_manager:
-        personality = load_personality_for_channel(channel_id, db_manager)
-    else:
-        personality = load_personality()
+    personality = get_personality(channel_id, db_manager, context)
     
-    help_text = f"""{personality['help']['title']}
+    return f"""{personality['help']['title']}
 
 *{personality['help']['send_kudos']}*
 • `/kk @user message` - Send love to one person
@@ -23,15 +39,11 @@ def show_help_message(respond, channel_id=None, db_manager=None):
 • `/kk help` - Show this help message
 
 {personality['help']['footer']}"""
-    respond(help_text)
 
 
-def get_app_mention_message(channel_id=None, db_manager=None):
+def get_app_mention_message(channel_id=None, db_manager=None, context=None):
     """Get the app mention message"""
-    from config.personalities import load_personality, load_personality_for_channel
+    from utils.message_formatter import get_personality
     
-    if channel_id and db_manager:
-        personality = load_personality_for_channel(channel_id, db_manager)
-    else:
-        personality = load_personality()
+    personality = get_personality(channel_id, db_manager, context)
     return personality['app_mention']
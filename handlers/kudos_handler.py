@@ -1,6 +1,5 @@
 import logging
-from datetime import datetime
-from config.settings import MONTHLY_QUOTA
+from models.channel_context import ChannelContext
 from utils.user_utils import (
     extract_user_mentions, 
     extract_message_text, 
@@ -8,6 +7,7 @@ from utils.user_utils import (
     validate_kudos_recipients,
     get_bot_user_id
 )
+from utils.announcement_dispatcher import get_announcement_dispatcher
 from utils.message_formatter import (
     format_kudos_announcement,
     format_kudos_confirmation,
@@ -17,18 +17,31 @@ from utils.message_formatter import (
 logger = logging.getLogger(__name__)
 
 
-def handle_kudos_command(command, say, respond, app, db_manager):
+def format_pending_kudos(text):
+    """Immediate reply to a kudos command, built from the command text alone (no database or Slack calls)"""
+    recipients = remove_duplicate_users(extract_user_mentions(text))
+    if not recipients:
+        return None
+    mentions = ", ".join(f"<@{user}>" for user in recipients)
+    return f"⏳ Sending kudos to {mentions}…"
+
+
+def handle_kudos_command(command, say, respond, app, db_manager, context=None):
     """Handle the /kk slash command"""
     user_id = command["user_id"]
     text = command["text"].strip()
     channel_id = command.get("channel_id")
     
+    # Resolve channel config, quota and personality once for the whole request
+    if context is None:
+        context = ChannelContext.resolve(channel_id, db_manager)
+    
     # Debug: Log the full command object to see what Slack sends
     logger.info(f"Full command object: {command}")
     
     # Parse kudos command: anything else is treated as a kudos message
     if not text:
-        respond(format_error_message("no_mentions", channel_id, db_manager))
+        respond(format_error_message("no_mentions", channel_id, db_manager, context=context))
         return True
     
     # Extract all mentioned users (these are already user IDs)
@@ -39,7 +52,7 @@ def handle_kudos_command(command, say, respond, app, db_manager):
     logger.info(f"Extracted user IDs: {mentioned_users}")
     
     if not mentioned_users:
-        respond(format_error_message("no_mentions", channel_id, db_manager))
+        respond(format_error_message("no_mentions", channel_id, db_manager, context=context))
         return True
     
     # Remove duplicates while preserving order
@@ -52,72 +65,45 @@ def handle_kudos_command(command, say, respond, app, db_manager):
     logger.info(f"Validation errors: {validation_errors}")
     
     if "self_kudos" in validation_errors:
-        respond(format_error_message("self_kudos", channel_id, db_manager))
+        respond(format_error_message("self_kudos", channel_id, db_manager, context=context))
         return True
     
     if "bot_kudos" in validation_errors:
-        respond(format_error_message("bot_kudos", channel_id, db_manager))
+        respond(format_error_message("bot_kudos", channel_id, db_manager, context=context))
         return True
     
     # Extract message
     message = extract_message_text(text)
     if not message:
-        respond(format_error_message("empty_message", channel_id, db_manager))
+        respond(format_error_message("empty_message", channel_id, db_manager, context=context))
         return True
     
-    # Check monthly quota for multiple kudos
-    current_month, current_year = db_manager.get_current_month_year_in_timezone(channel_id)
-    monthly_count = db_manager.get_monthly_kudos_count(user_id, current_month, current_year, channel_id)
     kudos_needed = len(unique_users)
+    announcement = format_kudos_announcement(user_id, unique_users, message, channel_id, db_manager, context=context)
+    
+    # Record all kudos in one transaction; the quota is re-checked under a per-sender lock
+    # (the quota is inherited from the override channel, if any).
+    # The announcement is queued in the same transaction, so it survives a failed post.
+    result = db_manager.record_kudos_batch(
+        user_id, unique_users, channel_id, context.monthly_quota,
+        local_month=context.get_current_local_month(),
+        announcement=announcement
+    )
+    
+    if result is None:
+        failed_mentions = " ".join([f"<@{user}>" for user in unique_users])
+        respond(format_error_message("failed_kudos", channel_id, db_manager, context=context, failed_mentions=failed_mentions))
+        return True
     
-    # Get channel-specific quota (with inheritance from override channel)
-    config = db_manager.get_channel_config(channel_id)
-    if config and config['leaderboard_channel_id']:
-        # Channel override active - get quota from source channel
-        source_config = db_manager.get_channel_config(config['leaderboard_channel_id'])
-        monthly_quota = source_config['monthly_quota'] if source_config and source_config['monthly_quota'] else MONTHLY_QUOTA
-    else:
-        # Normal channel - use own quota
-        monthly_quota = config['monthly_quota'] if config and config['monthly_quota'] else MONTHLY_QUOTA
-    
-    if monthly_count + kudos_needed > monthly_quota:
-        remaining = monthly_quota - monthly_count
-        respond(format_error_message("quota_exceeded", channel_id, db_manager, kudos_needed=kudos_needed, remaining=remaining))
+    if not result['success']:
+        respond(format_error_message("quota_exceeded", channel_id, db_manager, context=context, kudos_needed=kudos_needed, remaining=result['remaining']))
         return True
     
-    # Record kudos for each user
-    successful_kudos = []
-    failed_kudos = []
-    
-    for receiver in unique_users:
-        if db_manager.record_kudos(user_id, receiver, channel_id):
-            successful_kudos.append(receiver)
-        else:
-            failed_kudos.append(receiver)
-    
-    # Send announcements and confirm
-    if successful_kudos:
-        # Send announcement to the same channel where the command was issued
-        announcement = format_kudos_announcement(user_id, successful_kudos, message, channel_id, db_manager)
-        logger.info(f"Formatted announcement: {announcement}")
-        
-        logger.info(f"Posting to channel: {channel_id}")
-        try:
-            result = app.client.chat_postMessage(
-                channel=channel_id,
-                text=announcement,
-                unfurl_links=False
-            )
-            logger.info(f"Channel post result: {result}")
-        except Exception as e:
-            logger.error(f"Failed to post to channel: {e}")
-        
-        # Confirm to user
-        confirmation = format_kudos_confirmation(monthly_count, kudos_needed, len(successful_kudos), monthly_quota, channel_id, db_manager)
-        respond(confirmation)
-    
-    if failed_kudos:
-        failed_mentions = " ".join([f"<@{user}>" for user in failed_kudos])
-        respond(format_error_message("failed_kudos", channel_id, db_manager, failed_mentions=failed_mentions))
+    # Post the announcement to the same channel where the command was issued (retried from the outbox if it fails)
+    get_announcement_dispatcher(app.client).announce(result['announcement_id'])
+    
+    # Confirm to user
+    confirmation = format_kudos_confirmation(kudos_needed, result['remaining'], channel_id, db_manager, context=context)
+    respond(confirmation)
     
     return True
@@ -4,7 +4,9 @@ from datetime import datetime
 from utils.date_parser import parse_month_year, get_target_date
 from utils.message_formatter import format_leaderboard, format_error_message
 from utils.user_utils import get_channel_id_from_name
+from utils.announcement_dispatcher import get_announcement_dispatcher
 from config.personalities import load_personality
+from models.channel_context import ChannelContext
 
 logger = logging.getLogger(__name__)
 
@@ -59,7 +61,7 @@ def parse_leaderboard_params(params):
     return channel_id_or_name, is_public, is_complete, date_params
 
 
-def handle_leaderboard_command(respond, db_manager, app, params="", channel_id=None, say=None):
+def handle_leaderboard_command(respond, db_manager, app, params="", channel_id=None, say=None, context=None):
     """Handle leaderboard request with optional month/year parameters, channel name, and public posting"""
     try:
         # Debug: Log what we received from Slack
@@ -97,12 +99,18 @@ def handle_leaderboard_command(respond, db_manager, app, params="", channel_id=N
                         respond(f"❌ Error looking up channel {target_channel_id_or_name}: {error_msg}")
                     return
         
+        # Resolve the target channel's config once (reusing the command channel's context when it's the same channel)
+        if context is not None and context.channel_id == target_channel_id:
+            target_context = context
+        else:
+            target_context = ChannelContext.resolve(target_channel_id, db_manager)
+        
         # Parse month and year from date parameters
         month, year = parse_month_year(date_params)
         
         # If no specific month/year provided, use current month/year in channel's timezone
         if month is None and year is None:
-            target_month, target_year = db_manager.get_current_month_year_in_timezone(target_channel_id)
+            target_month, target_year = target_context.get_current_month_year()
         else:
             target_month, target_year = get_target_date(month, year)
         
@@ -115,7 +123,7 @@ def handle_leaderboard_command(respond, db_manager, app, params="", channel_id=N
         logger.info(f"Leaderboard request - params: '{params}', parsed: month={month}, year={year}, target: {target_month}/{target_year}, channel: {target_channel_id}, public: {is_public}, complete: {is_complete}")
         
         # Get effective leaderboard channel (handles channel overrides)
-        effective_channel_id = db_manager.get_effective_leaderboard_channel(target_channel_id)
+        effective_channel_id = target_context.effective_channel_id
         
         # Get leaderboard data for the effective channel
         if is_complete:
@@ -123,10 +131,10 @@ def handle_leaderboard_command(respond, db_manager, app, params="", channel_id=N
             leaderboard_data = db_manager.get_complete_monthly_leaderboard(target_month, target_year, effective_channel_id)
         else:
             # Get regular leaderboard with channel-specific limit
-            leaderboard_data = db_manager.get_monthly_leaderboard(target_month, target_year, effective_channel_id)
+            leaderboard_data = db_manager.get_monthly_leaderboard(target_month, target_year, effective_channel_id, limit=target_context.leaderboard_limit)
         
         # Use the data directly - trust the user IDs in the database
-        formatted_leaderboard = format_leaderboard(leaderboard_data, target_month, target_year, target_channel_id, db_manager)
+        formatted_leaderboard = format_leaderboard(leaderboard_data, target_month, target_year, target_channel_id, db_manager, context=target_context)
         
         # For public posting, always post to the channel where the command was issued
         # target_channel_id is only for determining which leaderboard data to show
@@ -136,25 +144,22 @@ def handle_leaderboard_command(respond, db_manager, app, params="", channel_id=N
                 # Can't post publicly to a DM - just respond privately with a note
                 respond(f"{formatted_leaderboard}\n\n_Note: Public posting doesn't work in DMs. Use this command in a channel to post publicly._")
             else:
-                # Post to the channel where the command was issued
-                try:
-                    app.client.chat_postMessage(
-                        channel=channel_id,
-                        text=formatted_leaderboard
-                    )
+                # Queue the post for the channel where the command was issued; the dispatcher retries failures
+                announcement_id = db_manager.enqueue_announcement(channel_id, formatted_leaderboard)
+                if announcement_id is None:
+                    respond("❌ Failed to post leaderboard to channel. Please try again.")
+                else:
+                    get_announcement_dispatcher(app.client).announce(announcement_id)
                     # Also respond to user to confirm
                     personality = load_personality()
                     respond(personality['leaderboard']['posted_confirmation'])
-                except Exception as e:
-                    logger.error(f"Error posting leaderboard to channel: {e}")
-                    respond(f"❌ Failed to post leaderboard to channel. {str(e)}")
         else:
             # Respond privately to user
             respond(formatted_leaderboard)
             
     except Exception as e:
         logger.error(f"Error getting leaderboard: {e}")
-        respond(format_error_message("database_error", channel_id, db_manager))
+        respond(format_error_message("database_error", channel_id, db_manager, context=context))
 
 
 
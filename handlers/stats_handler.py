@@ -1,43 +1,33 @@
 import logging
-from datetime import datetime
-from config.settings import MONTHLY_QUOTA
+from models.channel_context import ChannelContext
 from utils.message_formatter import format_stats_message, format_error_message
 
 logger = logging.getLogger(__name__)
 
 
-def handle_stats_command(user_id, respond, db_manager, channel_id=None):
+def handle_stats_command(user_id, respond, db_manager, channel_id=None, context=None):
     """Handle stats request"""
     try:
-        # Use timezone-aware current month/year
-        current_month, current_year = db_manager.get_current_month_year_in_timezone(channel_id)
-        monthly_sent = db_manager.get_monthly_kudos_count(user_id, current_month, current_year, channel_id)
-        monthly_received = db_manager.get_monthly_kudos_received_count(user_id, current_month, current_year, channel_id)
+        # Resolve channel config (quota inherited from override channel) once
+        if context is None:
+            context = ChannelContext.resolve(channel_id, db_manager)
         
-        user_stats = db_manager.get_user_stats(user_id, channel_id)
-        
-        # Get channel-specific quota (with inheritance from override channel)
-        config = db_manager.get_channel_config(channel_id)
-        if config and config['leaderboard_channel_id']:
-            # Channel override active - get quota from source channel
-            source_config = db_manager.get_channel_config(config['leaderboard_channel_id'])
-            monthly_quota = source_config['monthly_quota'] if source_config and source_config['monthly_quota'] else MONTHLY_QUOTA
-        else:
-            # Normal channel - use own quota
-            monthly_quota = config['monthly_quota'] if config and config['monthly_quota'] else MONTHLY_QUOTA
+        # Monthly and all-time counts in one query, using the channel's current local month
+        user_stats = db_manager.get_user_stats(user_id, channel_id, local_month=context.get_current_local_month())
         
         stats_message = format_stats_message(
             user_id=user_id,
-            monthly_sent=monthly_sent,
-            monthly_received=monthly_received,
-            monthly_quota=monthly_quota,
+            monthly_sent=user_stats['monthly_sent'],
+            monthly_received=user_stats['monthly_received'],
+            monthly_quota=context.monthly_quota,
             total_sent=user_stats['total_sent'],
             total_received=user_stats['total_received'],
             channel_id=channel_id,
-            db_manager=db_manager
+            db_manager=db_manager,
+            context=context
         )
         
         respond(stats_message)
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
-        respond(format_error_message("stats_error", channel_id, db_manager))
+        respond(format_error_message("stats_error", channel_id, db_manager, context=context))
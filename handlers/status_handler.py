@@ -7,7 +7,8 @@ import logging
 import time
 import os
 from datetime import datetime
-from config.personalities import load_personality_for_channel
+from models.channel_context import ChannelContext
+from utils.slack_client import get_rate_limiter
 from version import VERSION
 
 # Track bot startup time for uptime calculation
@@ -15,16 +16,18 @@ BOT_START_TIME = time.time()
 
 logger = logging.getLogger(__name__)
 
-def handle_status_command(ack, respond, channel_id, db_manager, client):
-    """Handle the /kk status command to show bot operational status."""
-    ack()
-    
+def handle_status_command(respond, channel_id, db_manager, client, context=None):
+    """Handle the /kk status command to show bot operational status (acknowledged by the caller)."""
     try:
         # Load personality for this channel
-        personality = load_personality_for_channel(channel_id, db_manager)
+        if context is None:
+            context = ChannelContext.resolve(channel_id, db_manager)
+        personality = context.personality
         
         # Get bot status information
+        start = time.perf_counter()
         status_info = get_bot_status(db_manager, client)
+        status_info['elapsed_ms'] = (time.perf_counter() - start) * 1000
         
         # Format the status message
         message = format_status_message(status_info, personality, db_manager)
@@ -53,51 +56,18 @@ def get_bot_status(db_manager, client):
         except Exception as e:
             logger.warning(f"Failed to get bot auth info: {e}")
         
-        # Use single database connection for all queries
-        with db_manager.get_connection() as conn:
-            with conn.cursor() as cursor:
-                # Get all channels with kudos activity OR custom configs
-                channels_query = """
-                SELECT DISTINCT channel_id 
-                FROM kudos 
-                UNION
-                SELECT DISTINCT channel_id 
-                FROM channel_configs
-                ORDER BY channel_id
-                """
-                cursor.execute(channels_query)
-                channels = [row[0] for row in cursor.fetchall()]
-                
-                # Get last kudos timestamp
-                last_kudos_query = """
-                SELECT timestamp, channel_id, sender, receiver
-                FROM kudos 
-                ORDER BY timestamp DESC 
-                LIMIT 1
-                """
-                cursor.execute(last_kudos_query)
-                last_kudos_row = cursor.fetchone()
-                
-                # Get total kudos count
-                total_kudos_query = "SELECT COUNT(*) FROM kudos"
-                cursor.execute(total_kudos_query)
-                total_kudos = cursor.fetchone()[0]
-                
-                # Get channels with custom configs
-                config_channels_query = """
-                SELECT channel_id, personality_name, monthly_quota, leaderboard_channel_id, timezone
-                FROM channel_configs
-                ORDER BY channel_id
-                """
-                cursor.execute(config_channels_query)
-                config_channels = cursor.fetchall()
+        # Channels, last kudos, totals, configs and the outbox, over a single connection
+        query_start = time.perf_counter()
+        summary = db_manager.get_status_summary()
+        query_ms = (time.perf_counter() - query_start) * 1000
         
         return {
             'bot_info': bot_info,
-            'channels': channels,
-            'last_kudos': last_kudos_row,
-            'total_kudos': total_kudos,
-            'config_channels': config_channels,
+            **summary,
+            'pool_stats': db_manager.get_pool_stats(),
+            'config_cache_stats': db_manager.get_config_cache_stats(),
+            'slack_stats': get_rate_limiter().get_stats(),
+            'query_ms': query_ms,
             'timestamp': datetime.now()
         }
         
@@ -105,7 +75,7 @@ def get_bot_status(db_manager, client):
         logger.error(f"Failed to get bot status from database: {e}")
         raise
 
-def format_status_message(status_info, personality, db_manager):
+def format_status_message(status_info, personality, db_manager=None):
     """Format the status information into a readable message."""
     bot_info = status_info['bot_info']
     channels = status_info['channels']
@@ -161,15 +131,65 @@ def format_status_message(status_info, personality, db_manager):
         message += f"🎉 *Last Kudos:* Never\n"
     
     # Total kudos
-    message += f"📊 *Total Kudos:* {total_kudos:,}\n\n"
+    message += f"📊 *Total Kudos:* {total_kudos:,}\n"
+    
+    # Announcements waiting in (or given up on by) the outbox
+    outbox = status_info['outbox']
+    message += f"📬 *Announcements:* {outbox['pending']:,} pending, {outbox['failed']:,} failed\n"
+    
+    # Connection pool health for this process
+    pool_stats = status_info['pool_stats']
+    message += (
+        f"🗄️ *DB Pool:* {pool_stats['in_use']}/{pool_stats['maxconn']} in use, "
+        f"{pool_stats['checkouts']:,} checkouts, {pool_stats['waits']} waits, "
+        f"{pool_stats['timeouts']} timeouts, {pool_stats['reconnects']} reconnects\n"
+    )
+    
+    # Read replica routing, if DATABASE_READ_URL is set
+    replica = pool_stats.get('replica')
+    if replica:
+        if replica['healthy']:
+            replica_state = f"{replica['lag_seconds']:.1f}s behind"
+        elif replica['lag_seconds'] is not None:
+            replica_state = f"{replica['lag_seconds']:.1f}s behind, reading from primary"
+        else:
+            replica_state = "unavailable, reading from primary"
+        message += (
+            f"🪞 *Read Replica:* {replica_state}, {replica['in_use']}/{replica['maxconn']} in use, "
+            f"{replica['reads']:,} reads, {replica['fallbacks']:,} fallbacks\n"
+        )
+    
+    # Channel config cache effectiveness for this process
+    cache_stats = status_info['config_cache_stats']
+    lookups = cache_stats['hits'] + cache_stats['misses']
+    hit_rate = f"{cache_stats['hits'] / lookups:.0%}" if lookups else "n/a"
+    message += f"🧠 *Config Cache:* {hit_rate} hit rate ({cache_stats['hits']:,} hits, {cache_stats['misses']:,} misses)\n"
+    
+    # Slack API throttling for this process
+    slack_stats = status_info['slack_stats']
+    message += (
+        f"🚦 *Slack API:* {slack_stats['calls']:,} calls, {slack_stats['waits']:,} throttled "
+        f"({slack_stats['wait_seconds']:.1f}s waited), {slack_stats['rejected']:,} turned away, {slack_stats['rate_limited']} rate limited, "
+        f"{slack_stats['coalesced']:,} coalesced\n"
+    )
+    
+    # How long this status took to gather (set by the caller, which times the Slack call too)
+    if 'elapsed_ms' in status_info:
+        message += f"⚡ *Status Computed In:* {status_info['elapsed_ms']:.0f} ms ({status_info['query_ms']:.0f} ms database)\n"
+    message += "\n"
     
     # Custom configurations
     if config_channels:
         message += f"⚙️ *Custom Configurations:*\n"
+        # Every config is already in config_channels - resolve overrides from it instead of re-querying
+        configs_by_channel = {
+            row[0]: {'personality_name': row[1], 'monthly_quota': row[2], 'leaderboard_channel_id': row[3], 'timezone': row[4]}
+            for row in config_channels
+        }
         for channel_id, personality_name, quota, leaderboard, timezone in config_channels:
             # Get effective values (inherited from override channel if applicable)
-            effective_channel = db_manager.get_effective_leaderboard_channel(channel_id)
-            effective_config = db_manager.get_channel_config(effective_channel)
+            effective_channel = leaderboard or channel_id
+            effective_config = configs_by_channel.get(effective_channel)
             
             # Build config line
             if effective_channel != channel_id:
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Utility script to bulk-load historical kudos from CSV or JSONL.
+
+Rows are streamed into a temporary staging table with COPY FROM STDIN,
+--batch-size rows at a time (CSV is passed to COPY as-is, without parsing
+it in Python), then moved into kudos with a single INSERT ... SELECT that
+skips rows already in the table (same sender, receiver, channel and
+timestamp). Monthly partitions are created for the imported months first,
+and the monthly rollup and /kk status counters are incremented from just
+the inserted rows, in the same transaction as the insert.
+
+Input needs sender, receiver, channel_id and timestamp fields (an `id`
+column, as written by export_kudos.py, is ignored). Timestamps are ISO 8601
+(UTC unless they carry an offset) or Unix seconds. Files ending in .gz are decompressed.
+"""
+
+import io
+import os
+import sys
+import csv
+import gzip
+import json
+import time
+import argparse
+from itertools import islice
+from psycopg2 import sql
+from dotenv import load_dotenv
+
+# Load environment variables before the database module reads them
+load_dotenv()
+
+from database import get_db_manager, is_sqlite_url
+
+FIELDS = ("sender", "receiver", "channel_id", "timestamp")
+
+# Staged rows with every field present; timestamps are Unix seconds or ISO 8601 (UTC unless they say otherwise)
+VALID_ROWS_SQL = """
+SELECT sender, receiver, channel_id,
+       (CASE WHEN timestamp ~ '^[0-9]+(\\.[0-9]+)?$' THEN to_timestamp(timestamp::FLOAT8)
+             ELSE timestamp::TIMESTAMPTZ END) AT TIME ZONE 'UTC' AS timestamp
+FROM kudos_import
+WHERE sender <> '' AND receiver <> '' AND channel_id <> '' AND timestamp <> ''
+"""
+
+# Inserts the staged rows and keeps a copy of what went in, for the rollup and bot_stats
+INSERT_SQL = """
+WITH inserted AS (
+    INSERT INTO kudos (sender, receiver, channel_id, timestamp)
+    SELECT sender, receiver, channel_id, timestamp FROM {source} n
+    {dedupe_filter}
+    RETURNING sender, receiver, channel_id, timestamp
+)
+INSERT INTO kudos_import_new SELECT * FROM inserted
+"""
+
+# With dedupe, duplicates within the input go in once
+DEDUPE_SOURCE = "(SELECT DISTINCT * FROM kudos_import_valid)"
+
+# Bounded to the imported time range so only the partitions it covers are scanned
+DEDUPE_FILTER = """
+WHERE NOT EXISTS (
+    SELECT 1 FROM kudos k
+    WHERE k.timestamp >= %(first)s AND k.timestamp <= %(last)s
+      AND k.receiver = n.receiver AND k.channel_id = n.channel_id
+      AND k.timestamp = n.timestamp AND k.sender = n.sender
+)
+"""
+
+# Adds the inserted rows to the monthly rollup, in each channel's timezone.
+# Needs channel_offsets (channel_id, offset_hours) for every imported channel
+ROLLUP_INCREMENT_SQL = """
+INSERT INTO kudos_monthly_rollup (channel_id, local_month, user_id, sent, received)
+SELECT channel_id, local_month, user_id, SUM(sent), SUM(received)
+FROM (
+    SELECT channel_id, DATE_TRUNC('month', timestamp + offset_hours * INTERVAL '1 hour')::DATE AS local_month,
+           sender AS user_id, 1 AS sent, 0 AS received
+    FROM kudos_import_new JOIN channel_offsets USING (channel_id)
+    UNION ALL
+    SELECT channel_id, DATE_TRUNC('month', timestamp + offset_hours * INTERVAL '1 hour')::DATE AS local_month,
+           receiver AS user_id, 0 AS sent, 1 AS received
+    FROM kudos_import_new JOIN channel_offsets USING (channel_id)
+) events
+GROUP BY channel_id, local_month, user_id
+ON CONFLICT (channel_id, local_month, user_id)
+DO UPDATE SET
+    sent = kudos_monthly_rollup.sent + EXCLUDED.sent,
+    received = kudos_monthly_rollup.received + EXCLUDED.received
+"""
+
+# Adds the inserted rows to bot_stats; the last-kudos pointer only moves if an imported kudos is newer
+BOT_STATS_INCREMENT_SQL = """
+WITH counts AS (
+    SELECT channel_id, COUNT(*) AS kudos_count, MAX(timestamp) AS last_kudos_at
+    FROM kudos_import_new GROUP BY channel_id
+)
+INSERT INTO bot_stats (channel_id, kudos_count, last_kudos_at, last_sender, last_receiver)
+SELECT DISTINCT ON (c.channel_id) c.channel_id, c.kudos_count, c.last_kudos_at, n.sender, n.receiver
+FROM counts c JOIN kudos_import_new n ON n.channel_id = c.channel_id AND n.timestamp = c.last_kudos_at
+ORDER BY c.channel_id
+ON CONFLICT (channel_id)
+DO UPDATE SET
+    kudos_count = bot_stats.kudos_count + EXCLUDED.kudos_count,
+    last_kudos_at = GREATEST(bot_stats.last_kudos_at, EXCLUDED.last_kudos_at),
+    last_sender = CASE WHEN EXCLUDED.last_kudos_at > bot_stats.last_kudos_at THEN EXCLUDED.last_sender ELSE bot_stats.last_sender END,
+    last_receiver = CASE WHEN EXCLUDED.last_kudos_at > bot_stats.last_kudos_at THEN EXCLUDED.last_receiver ELSE bot_stats.last_receiver END
+"""
+
+
+def open_input(path):
+    """Open a (possibly gzipped) input file, or stdin for '-'"""
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", newline="")
+    return open(path, newline="")
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    return "jsonl" if name.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def create_staging_table(conn, columns):
+    """Create the kudos_import temp table with a TEXT column per input column"""
+    with conn.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS kudos_import")
+        cursor.execute(sql.SQL("CREATE TEMP TABLE kudos_import ({})").format(
+            sql.SQL(", ").join(sql.SQL("{} TEXT").format(sql.Identifier(column)) for column in columns)
+        ))
+    conn.commit()
+
+
+def copy_batch(conn, data):
+    with conn.cursor() as cursor:
+        cursor.copy_expert("COPY kudos_import FROM STDIN WITH (FORMAT csv)", io.StringIO(data))
+    conn.commit()
+
+
+def csv_batches(f, batch_size):
+    """Yield the CSV body batch_size lines at a time, untouched - COPY does the parsing"""
+    while True:
+        lines = list(islice(f, batch_size))
+        if not lines:
+            return
+        yield len(lines), "".join(lines)
+
+
+def jsonl_batches(f, batch_size):
+    """Yield JSONL records re-encoded as CSV, batch_size records at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for line in f:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        writer.writerow(["" if record.get(field) is None else record[field] for field in FIELDS])
+        count += 1
+        if count >= batch_size:
+            yield count, buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if count:
+        yield count, buffer.getvalue()
+
+
+def stage_rows(conn, f, input_format, batch_size):
+    """
+    COPY the input into the kudos_import staging table, one COPY and commit per batch.
+
+    Returns:
+        int: Number of rows staged
+    """
+    if input_format == "csv":
+        header = next(csv.reader([f.readline()]), [])
+        missing = [field for field in FIELDS if field not in header]
+        if missing:
+            raise ValueError(f"CSV header is missing {', '.join(missing)} (got {', '.join(header) or 'nothing'})")
+        create_staging_table(conn, header)
+        batches = csv_batches(f, batch_size)
+    else:
+        create_staging_table(conn, FIELDS)
+        batches = jsonl_batches(f, batch_size)
+
+    staged = 0
+    start = time.monotonic()
+    for count, data in batches:
+        copy_batch(conn, data)
+        staged += count
+        elapsed = time.monotonic() - start
+        print(f"📥 Staged {staged:,} rows ({staged / elapsed:,.0f} rows/s)")
+    return staged
+
+
+def create_partitions(conn):
+    """Give every imported month a partition, so the rows don't pile up in kudos_default"""
+    db_manager = get_db_manager()
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT DISTINCT DATE_TRUNC('month', timestamp)::DATE FROM kudos_import_valid")
+        months = {row[0] for row in cursor.fetchall()}
+    conn.commit()
+
+    missing = sorted(months - set(db_manager.get_kudos_partitions(conn)))
+    for month in missing:
+        db_manager._create_kudos_partition(conn, month)
+    if missing:
+        print(f"🧱 Created {len(missing)} monthly partition(s)")
+
+
+def import_kudos(path, input_format=None, batch_size=100000, dedupe=True, defer_indexes=False):
+    """
+    Import kudos from a CSV or JSONL file.
+
+    Args:
+        path (str): Input file, or '-' for stdin
+        input_format (str): 'csv' or 'jsonl' (default: from the file name)
+        batch_size (int): Rows per COPY into the staging table
+        dedupe (bool): Skip rows already in kudos, and duplicates within the input
+        defer_indexes (bool): Drop kudos' secondary indexes for the insert and rebuild them after.
+            Several times faster for large loads, but blocks all access to kudos until it finishes.
+
+    Returns:
+        int: Number of kudos inserted
+    """
+    input_format = input_format or detect_format(path)
+    db_manager = get_db_manager()
+    print(f"🦀 Importing kudos from {path} ({input_format})...")
+    start = time.monotonic()
+
+    with db_manager.get_connection() as conn:
+        with open_input(path) as f:
+            staged = stage_rows(conn, f, input_format, batch_size)
+        print(f"📥 Staged {staged:,} rows in {time.monotonic() - start:.1f}s")
+        if not staged:
+            print("✅ Nothing to import")
+            return 0
+
+        with conn.cursor() as cursor:
+            # Timestamps without an offset are UTC; converted once, into a temp table the rest reuses
+            cursor.execute("SET LOCAL TimeZone = 'UTC'")
+            cursor.execute(f"CREATE TEMP TABLE kudos_import_valid AS {VALID_ROWS_SQL}")
+            valid = cursor.rowcount
+            cursor.execute("DROP TABLE kudos_import")
+            cursor.execute("ANALYZE kudos_import_valid")
+            cursor.execute("SELECT MIN(timestamp), MAX(timestamp) FROM kudos_import_valid")
+            first, last = cursor.fetchone()
+            cursor.execute("SELECT DISTINCT channel_id FROM kudos_import_valid")
+            channels = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+        if valid < staged:
+            print(f"⚠️  Skipping {staged - valid:,} rows with an empty sender, receiver, channel_id or timestamp")
+
+        create_partitions(conn)
+
+        insert_start = time.monotonic()
+        with conn.cursor() as cursor:
+            # Enough memory to hash the staged rows for DISTINCT and the dedupe anti-join instead of sorting them
+            cursor.execute("SET LOCAL work_mem = '256MB'")
+            index_definitions = []
+            if defer_indexes:
+                cursor.execute("""
+                SELECT indexname, indexdef FROM pg_indexes
+                WHERE schemaname = current_schema() AND tablename = 'kudos' AND indexname <> 'kudos_pkey'
+                """)
+                index_definitions = cursor.fetchall()
+                for name, _ in index_definitions:
+                    cursor.execute(f"DROP INDEX {name}")
+                cursor.execute("SET LOCAL maintenance_work_mem = '256MB'")
+                print(f"⏸️  Dropped {len(index_definitions)} index(es) until the load finishes")
+
+            print("🔀 Inserting into kudos" + (", skipping existing rows" if dedupe else "") + "...")
+            cursor.execute("CREATE TEMP TABLE kudos_import_new (LIKE kudos_import_valid)")
+            insert_sql = INSERT_SQL.format(
+                source=DEDUPE_SOURCE if dedupe else "kudos_import_valid",
+                dedupe_filter=DEDUPE_FILTER if dedupe else ""
+            )
+            cursor.execute(insert_sql, {"first": first, "last": last})
+            inserted = cursor.rowcount
+
+            # Rebuilt in the same transaction, so a failed load leaves the indexes as they were.
+            # pg_indexes shows partitioned indexes as ON ONLY, which wouldn't build them on the partitions.
+            for name, definition in index_definitions:
+                print(f"🔨 Rebuilding {name}...")
+                cursor.execute(definition.replace(" ON ONLY ", " ON ", 1))
+
+            # Counted in the same transaction as the insert, so live kudos and the import never double count
+            print(f"🔄 Updating monthly rollup and status counters for {len(channels)} channel(s)...")
+            offsets = [db_manager.get_timezone_offset(db_manager.get_channel_timezone(channel)) for channel in channels]
+            cursor.execute("""
+            CREATE TEMP TABLE channel_offsets AS
+            SELECT * FROM UNNEST(%s::VARCHAR[], %s::INTEGER[]) AS t(channel_id, offset_hours)
+            """, (channels, offsets))
+            cursor.execute(ROLLUP_INCREMENT_SQL)
+            cursor.execute(BOT_STATS_INCREMENT_SQL)
+
+            cursor.execute("DROP TABLE kudos_import_valid, kudos_import_new, channel_offsets")
+        conn.commit()
+
+    insert_elapsed = time.monotonic() - insert_start
+    print(f"✅ Inserted {inserted:,} kudos in {insert_elapsed:.1f}s ({valid - inserted:,} duplicates skipped)")
+
+    elapsed = time.monotonic() - start
+    print(f"\n✅ Done! Imported {inserted:,} of {staged:,} rows in {elapsed:.1f}s ({staged / elapsed:,.0f} rows/s) 🦀")
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Bulk-load historical kudos from CSV or JSONL",
+        epilog="Examples:\n"
+               "  python import_kudos.py old_tool_export.csv\n"
+               "  python import_kudos.py archive/kudos_2024-01.csv.gz\n"
+               "  python import_kudos.py history.jsonl --defer-indexes --batch-size 250000",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("path", help="CSV or JSONL file (optionally .gz), or - for stdin")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="input format (default: from the file extension)")
+    parser.add_argument("--batch-size", type=int, default=100000, help="rows per COPY batch (default: 100000)")
+    parser.add_argument("--no-dedupe", action="store_true", help="import every row as is: don't skip rows already in kudos or repeated in the input")
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="drop kudos' secondary indexes during the insert and rebuild them after (blocks the bot meanwhile)")
+    args = parser.parse_args()
+
+    if is_sqlite_url(os.environ.get('DATABASE_URL', '')):
+        print("❌ import_kudos.py needs PostgreSQL - DATABASE_URL points at an SQLite database")
+        sys.exit(1)
+
+    import_kudos(args.path, args.format, args.batch_size, not args.no_dedupe, args.defer_indexes)
+
+
+if __name__ == "__main__":
+    main()
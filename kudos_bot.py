@@ -1,16 +1,22 @@
 import os
 import logging
 from slack_bolt import App
-from slack_bolt.adapter.aws_lambda import SlackRequestHandler
 from database import get_db_manager
-from config.settings import DEFAULT_PORT
-from handlers.help_handler import show_help_message, get_app_mention_message
+from config.personalities import get_personality_registry
+from config.settings import DEFAULT_PORT, IS_LAMBDA
+from handlers.help_handler import SUBCOMMANDS, get_subcommand, show_help_message, get_app_mention_message
 from handlers.leaderboard_handler import handle_leaderboard_command
 from handlers.stats_handler import handle_stats_command
-from handlers.kudos_handler import handle_kudos_command
+from handlers.kudos_handler import handle_kudos_command, format_pending_kudos
 from handlers.config_handler import handle_config_command, handle_config_modal_submission, show_current_config, reset_config_to_defaults, handle_personality_select
 from handlers.status_handler import handle_status_command
+from utils.announcement_dispatcher import get_announcement_dispatcher
+from utils.channel_index import get_channel_index
+from utils import metrics
+from utils.slack_client import RateLimitedClient
+from version import VERSION
 
+# First words of /kk that are commands rather than kudos
 # Configure logging
 log_level = os.environ.get("LOG_LEVEL", "INFO").upper()
 numeric_level = getattr(logging, log_level, logging.INFO)
@@ -21,15 +27,62 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Initialize Slack app
+# On Lambda, skip the auth.test round trip Bolt makes at startup to verify the token -
+# it would run on every cold start. The bot user ID is fetched (and cached) on first use instead.
+# Every Slack API call goes through the rate-limited client (token buckets per method tier, 429 retries).
 app = App(
-    token=os.environ.get("SLACK_BOT_TOKEN"),
-    signing_secret=os.environ.get("SLACK_SIGNING_SECRET")
+    client=RateLimitedClient(token=os.environ.get("SLACK_BOT_TOKEN")),
+    signing_secret=os.environ.get("SLACK_SIGNING_SECRET"),
+    token_verification_enabled=not IS_LAMBDA,
+    # Lambda freezes as soon as the response is returned, so listeners must finish first there;
+    # the slow work lives in lazy listeners, which Bolt runs as separate invocations
+    process_before_response=IS_LAMBDA
 )
 
-# Get database manager
+# Load and validate every personality once, so formatters never touch the disk
+get_personality_registry()
+
+# Get database manager (connections are opened lazily on first use)
 db_manager = get_db_manager()
 
 
+def prepare_server():
+    """One-time startup work for long-running servers.
+    
+    Not run on Lambda cold starts: there the config cache fills on demand, and
+    announcements are retried and kudos partitions created by a scheduled
+    invocation instead.
+    Migrations are never applied here - run `python migrations.py up`
+    as a deploy step; this only refuses to start on an out-of-date schema.
+    """
+    db_manager.verify_schema()
+    
+    # Channel configs are read on nearly every request - load them all up front
+    try:
+        db_manager.warm_channel_config_cache()
+    except Exception as e:
+        logger.warning(f"Failed to warm channel config cache: {e}")
+    
+    # Kudos for months without a partition land in kudos_default, which monthly queries can't prune
+    try:
+        db_manager.ensure_kudos_partitions()
+    except Exception as e:
+        logger.warning(f"Failed to create upcoming kudos partitions: {e}")
+    
+    # Post queued channel announcements (and retry failed ones) in the background
+    get_announcement_dispatcher(app.client, db_manager).start()
+    
+    # Index public channel names for `/kk leaderboard #name`, refreshed in the background
+    get_channel_index(app.client).start()
+
+
+@app.middleware
+def use_rate_limited_client(context, next):
+    """Hand listeners the shared rate-limited client instead of Bolt's plain per-request WebClient"""
+    context["client"] = app.client
+    return next()
+
+
 @app.middleware
 def log_request(logger, body, next):
     """Log incoming requests for debugging"""
@@ -44,11 +97,43 @@ def log_request(logger, body, next):
     return next()
 
 
-@app.command("/kk")
-def handle_kudos_command_wrapper(ack, command, say, respond):
-    """Handle the /kk slash command"""
-    ack()  # Always acknowledge the command first
+def acknowledge(ack):
+    """Ack-only half of a lazy listener: the real work runs afterwards, outside Slack's 3 second window"""
+    ack()
+
+
+def ack_kudos_command(ack, command):
+    """Acknowledge /kk, timing the ack per subcommand"""
+    with metrics.time_command(get_subcommand(command["text"].strip()), "ack"):
+        answer_kudos_command(ack, command)
+
+
+def answer_kudos_command(ack, command):
+    """Acknowledge /kk immediately, answering straight away where no database or Slack call is needed"""
+    text = command["text"].strip()
+    words = text.split()
+    first_word = words[0].lower() if words else ""
     
+    if first_word == "version":
+        ack(f"📦 *Kiitos Krab Version:* {VERSION}")
+    elif first_word == "config" and len(words) > 1 and words[1].lower() == "edit":
+        # The trigger_id expires 3 seconds after the command - too soon to hand the modal to a lazy listener
+        handle_config_command(ack, command, app.client, db_manager)
+    elif first_word not in SUBCOMMANDS and len(words) > 1:
+        # Let the sender know right away; the quota check, insert and announcement happen lazily
+        ack(format_pending_kudos(text))
+    else:
+        ack()
+
+
+def process_kudos_command(command, say, respond):
+    """Handle the /kk slash command after it has been acknowledged, timing it per subcommand"""
+    with metrics.time_command(get_subcommand(command["text"].strip()), "process"):
+        dispatch_kudos_command(command, say, respond)
+
+
+def dispatch_kudos_command(command, say, respond):
+    """Run the subcommand (or kudos) a /kk command asks for"""
     user_id = command["user_id"]
     text = command["text"].strip()
     
@@ -70,13 +155,13 @@ def handle_kudos_command_wrapper(ack, command, say, respond):
             show_help_message(respond, channel_id, db_manager)
             return
         elif first_word == "config":
-            # Handle config command - show current config or open modal
+            # Handle config command - show current config or reset it
             if len(text.split()) == 1:
                 # Just "/kk config" - show current configuration
                 show_current_config(respond, channel_id, db_manager)
             elif text.split()[1].lower() == "edit":
-                # "/kk config edit" - open configuration modal
-                handle_config_command(ack, command, app.client, db_manager)
+                # "/kk config edit" - the modal was already opened while acking
+                pass
             elif text.split()[1].lower() == "default":
                 # "/kk config default" - reset to defaults
                 reset_config_to_defaults(respond, channel_id, db_manager)
@@ -85,11 +170,10 @@ def handle_kudos_command_wrapper(ack, command, say, respond):
                 show_current_config(respond, channel_id, db_manager)
             return
         elif first_word == "status":
-            handle_status_command(ack, respond, channel_id, db_manager, app.client)
+            handle_status_command(respond, channel_id, db_manager, app.client)
             return
         elif first_word == "version":
-            from version import VERSION
-            respond(f"📦 *Kiitos Krab Version:* {VERSION}")
+            # Already answered in the ack
             return
         elif len(text.split()) == 1:
             # Single word that's not a recognized command - show help
@@ -100,32 +184,83 @@ def handle_kudos_command_wrapper(ack, command, say, respond):
     handle_kudos_command(command, say, respond, app, db_manager)
 
 
-@app.event("app_mention")
-def handle_app_mention(event, say):
+def process_app_mention(event, say):
     """Handle when the bot is mentioned"""
     channel_id = event.get('channel')
     say(get_app_mention_message(channel_id, db_manager))
 
 
-@app.action("personality_select")
-def handle_personality_select_wrapper(ack, body, client):
+def handle_channel_created(event):
+    """Add a new public channel to the channel name index"""
+    channel = event["channel"]
+    get_channel_index(app.client).set_channel(channel["id"], channel["name"])
+
+
+def handle_channel_rename(event):
+    """Re-index a renamed channel under its new name"""
+    channel = event["channel"]
+    get_channel_index(app.client).set_channel(channel["id"], channel["name"])
+
+
+def handle_channel_deleted(event):
+    """Drop a deleted channel from the channel name index"""
+    get_channel_index(app.client).remove_channel(event["channel"])
+
+
+def process_personality_select(body, client):
     """Handle personality dropdown selection"""
-    handle_personality_select(ack, body, client, db_manager)
+    handle_personality_select(body, client, db_manager)
 
-@app.view("config_modal")
-def handle_config_modal_submission_wrapper(ack, body, client):
-    """Handle configuration modal submission"""
-    handle_config_modal_submission(ack, body, client, db_manager)
+
+def process_config_modal_submission(body, client):
+    """Handle configuration modal submission (the ack has already closed the modal)"""
+    handle_config_modal_submission(body, client, db_manager)
+
+
+# Every listener that touches the database or Slack acks first and does that work in a lazy listener
+# (the channel events only update an in-memory index, so they run inline).
+# On Lambda that runs in a second, asynchronous invocation of this function; elsewhere on Bolt's thread pool.
+app.command("/kk")(ack=ack_kudos_command, lazy=[process_kudos_command])
+app.event("app_mention")(ack=acknowledge, lazy=[process_app_mention])
+app.event("channel_created")(handle_channel_created)
+app.event("channel_rename")(handle_channel_rename)
+app.event("channel_deleted")(handle_channel_deleted)
+app.action("personality_select")(ack=acknowledge, lazy=[process_personality_select])
+app.view("config_modal")(ack=acknowledge, lazy=[process_config_modal_submission])
+
+
+# AWS Lambda handler, reused across warm invocations
+slack_handler = None
 
 
-# AWS Lambda handler
 def lambda_handler(event, context):
-    """AWS Lambda handler"""
-    slack_handler = SlackRequestHandler(app=app)
+    """AWS Lambda handler; logs the invocation's metrics as it returns (nothing scrapes a frozen container)"""
+    try:
+        return handle_lambda_event(event, context)
+    finally:
+        metrics.flush_to_log()
+
+
+def handle_lambda_event(event, context):
+    """Run a scheduled maintenance invocation or hand a Slack request to Bolt"""
+    global slack_handler
+    
+    # A scheduled (EventBridge) invocation retries announcements that failed to post
+    # and creates upcoming kudos partitions
+    if event.get("source") == "aws.events":
+        delivered = get_announcement_dispatcher(app.client, db_manager).drain_once()
+        partitions = db_manager.ensure_kudos_partitions()
+        return {"delivered": delivered, "partitions_created": partitions}
+    
+    if slack_handler is None:
+        # Imported here so container deployments don't pay for boto3 at startup
+        from slack_bolt.adapter.aws_lambda import SlackRequestHandler
+        slack_handler = SlackRequestHandler(app=app)
     return slack_handler.handle(event, context)
 
 
 # For local development
 if __name__ == "__main__":
     port = DEFAULT_PORT
+    prepare_server()
     app.start(port=port)
@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for Kiitos Krab.
+
+Migrations run in order and each applied version is recorded in
+schema_migrations. Transactional migrations run in a single transaction
+(with a short lock_timeout so they never queue behind long queries).
+Online migrations run outside a transaction, so they can use
+CREATE INDEX CONCURRENTLY and commit batched backfills as they go; they
+must be safe to re-run if interrupted.
+
+The app only verifies the schema version at startup - run migrations as a
+deploy step:
+  python migrations.py status
+  python migrations.py up [VERSION]
+"""
+
+import os
+import sys
+import time
+import logging
+from config.settings import MIGRATION_LOCK_TIMEOUT, KUDOS_PARTITIONS_AHEAD
+from utils.date_parser import add_months
+
+logger = logging.getLogger(__name__)
+
+# Session advisory lock key, so two deploys can't migrate at the same time
+MIGRATION_LOCK_ID = 7254113
+
+# Rows copied per committed batch when kudos is converted to a partitioned table
+PARTITION_COPY_BATCH = 10000
+
+CREATE_MIGRATIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    execution_ms INTEGER
+)
+"""
+
+
+class Migration:
+    """One schema change, applied by calling apply(conn, db_manager)"""
+
+    def __init__(self, version, name, apply, transactional=True):
+        self.version = version
+        self.name = name
+        self.apply = apply
+        self.transactional = transactional
+
+
+MIGRATIONS = []
+
+
+def migration(version, name, transactional=True):
+    """Register a migration function; versions must be added in increasing order"""
+    def register(apply):
+        if MIGRATIONS and version <= MIGRATIONS[-1].version:
+            raise ValueError(f"migration {version} ({name}) is out of order")
+        MIGRATIONS.append(Migration(version, name, apply, transactional))
+        return apply
+    return register
+
+
+def create_index_concurrently(cursor, name, table, columns):
+    """Build an index without blocking writes (the cursor's connection must be in autocommit mode).
+
+    A failed concurrent build leaves an INVALID index behind, which IF NOT
+    EXISTS would skip - drop it first so re-running the migration rebuilds it.
+    """
+    cursor.execute("""
+    SELECT i.indisvalid
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE c.relname = %s AND pg_catalog.pg_table_is_visible(c.oid)
+    """, (name,))
+    row = cursor.fetchone()
+    if row and not row[0]:
+        logger.warning(f"Dropping invalid index {name} left by an interrupted build")
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+    logger.info(f"Building index {name} on {table}({columns}) concurrently")
+    cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table}({columns})")
+
+
+@migration(1, "baseline")
+def _baseline(conn, db_manager):
+    """The schema that initialize_tables used to create; a no-op on existing databases"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS kudos (
+            id SERIAL PRIMARY KEY,
+            sender VARCHAR(255) NOT NULL,
+            receiver VARCHAR(255) NOT NULL,
+            channel_id VARCHAR(255) NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS channel_configs (
+            channel_id VARCHAR(255) PRIMARY KEY,
+            personality_name VARCHAR(255),
+            monthly_quota INTEGER,
+            leaderboard_channel_id VARCHAR(255),
+            leaderboard_limit INTEGER,
+            timezone VARCHAR(10),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_kudos_sender ON kudos(sender);
+        CREATE INDEX IF NOT EXISTS idx_kudos_receiver ON kudos(receiver);
+        CREATE INDEX IF NOT EXISTS idx_kudos_timestamp ON kudos(timestamp);
+        CREATE INDEX IF NOT EXISTS idx_kudos_channel ON kudos(channel_id);
+        CREATE INDEX IF NOT EXISTS idx_kudos_sender_channel ON kudos(sender, channel_id);
+        CREATE INDEX IF NOT EXISTS idx_kudos_receiver_channel ON kudos(receiver, channel_id);
+        CREATE INDEX IF NOT EXISTS idx_channel_configs_leaderboard ON channel_configs(leaderboard_channel_id);
+        """)
+
+
+@migration(2, "kudos_timestamp_indexes", transactional=False)
+def _kudos_timestamp_indexes(conn, db_manager):
+    """Composite indexes for the monthly range queries, built without locking kudos"""
+    with conn.cursor() as cursor:
+        create_index_concurrently(cursor, "idx_kudos_channel_timestamp", "kudos", "channel_id, timestamp")
+        create_index_concurrently(cursor, "idx_kudos_sender_channel_timestamp", "kudos", "sender, channel_id, timestamp")
+        create_index_concurrently(cursor, "idx_kudos_receiver_channel_timestamp", "kudos", "receiver, channel_id, timestamp")
+
+
+@migration(3, "kudos_monthly_rollup", transactional=False)
+def _kudos_monthly_rollup(conn, db_manager):
+    """Create the monthly rollup and backfill it one channel (one short transaction) at a time.
+
+    Channels that already have rollup rows are skipped, so an interrupted
+    backfill resumes where it stopped and existing rollups aren't touched.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS kudos_monthly_rollup (
+            channel_id VARCHAR(255) NOT NULL,
+            local_month DATE NOT NULL,
+            user_id VARCHAR(255) NOT NULL,
+            sent INTEGER NOT NULL DEFAULT 0,
+            received INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (channel_id, local_month, user_id)
+        )
+        """)
+        cursor.execute("""
+        SELECT k.channel_id, c.timezone
+        FROM (SELECT DISTINCT channel_id FROM kudos) k
+        LEFT JOIN channel_configs c ON c.channel_id = k.channel_id
+        WHERE NOT EXISTS (SELECT 1 FROM kudos_monthly_rollup r WHERE r.channel_id = k.channel_id)
+        """)
+        channels = cursor.fetchall()
+
+    conn.autocommit = False
+    try:
+        for index, (channel_id, timezone_str) in enumerate(channels, 1):
+            offset_hours = db_manager.get_timezone_offset(timezone_str or os.getenv('TIMEZONE', 'UTC'))
+            with conn.cursor() as cursor:
+                # Hold off concurrent rollup writes until this channel commits, so a kudos
+                # inserted meanwhile is counted once (by its own upsert, after ours)
+                cursor.execute("LOCK TABLE kudos_monthly_rollup IN SHARE MODE")
+                cursor.execute("SELECT 1 FROM kudos_monthly_rollup WHERE channel_id = %s LIMIT 1", (channel_id,))
+                if cursor.fetchone() is None:
+                    cursor.execute(f"""
+                    INSERT INTO kudos_monthly_rollup (channel_id, local_month, user_id, sent, received)
+                    {db_manager._ROLLUP_SOURCE_SQL}
+                    """, (offset_hours, channel_id, offset_hours, channel_id))
+            conn.commit()
+            logger.info(f"Backfilled monthly rollup for channel {channel_id} ({index}/{len(channels)})")
+    finally:
+        conn.rollback()
+        conn.autocommit = True
+
+
+@migration(4, "drop_redundant_kudos_indexes", transactional=False)
+def _drop_redundant_kudos_indexes(conn, db_manager):
+    """Drop indexes that are prefixes of the composite timestamp indexes (less write amplification)"""
+    with conn.cursor() as cursor:
+        for name in ("idx_kudos_sender", "idx_kudos_receiver", "idx_kudos_channel",
+                     "idx_kudos_sender_channel", "idx_kudos_receiver_channel"):
+            logger.info(f"Dropping index {name} concurrently")
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+@migration(5, "announcement_outbox")
+def _announcement_outbox(conn, db_manager):
+    """Channel announcements queued with the kudos that triggered them, for at-least-once delivery"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS announcement_outbox (
+            id BIGSERIAL PRIMARY KEY,
+            channel_id VARCHAR(255) NOT NULL,
+            text TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            last_error TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            delivered_at TIMESTAMP,
+            failed_at TIMESTAMP
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_announcement_outbox_pending
+            ON announcement_outbox(next_attempt_at)
+            WHERE delivered_at IS NULL AND failed_at IS NULL;
+        """)
+
+
+
+@migration(6, "bot_stats")
+def _bot_stats(conn, db_manager):
+    """Per-channel kudos counters and last-kudos pointers for /kk status, backfilled from kudos"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS bot_stats (
+            channel_id VARCHAR(255) PRIMARY KEY,
+            kudos_count BIGINT NOT NULL DEFAULT 0,
+            last_kudos_at TIMESTAMP NOT NULL,
+            last_sender VARCHAR(255) NOT NULL,
+            last_receiver VARCHAR(255) NOT NULL
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_bot_stats_last_kudos ON bot_stats(last_kudos_at);
+        """)
+        db_manager._rebuild_bot_stats(cursor)
+
+
+@migration(7, "partition_kudos", transactional=False)
+def _partition_kudos(conn, db_manager):
+    """Convert kudos into a table range-partitioned by month.
+
+    Existing rows are copied into kudos_partitioned in id order, one committed
+    batch at a time, so an interrupted copy resumes where it stopped. Only the
+    final swap blocks writes to kudos: it copies rows inserted meanwhile,
+    reconciles both tables by id and renames the new one into place. Refuses
+    to start while any kudos has no timestamp (the partition key can't be NULL).
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = 'kudos'::regclass")
+        if cursor.fetchone()[0] == 'p':
+            return
+        cursor.execute("SELECT COUNT(*) FROM kudos WHERE timestamp IS NULL")
+        missing = cursor.fetchone()[0]
+        if missing:
+            raise RuntimeError(
+                f"{missing} kudos have no timestamp, so they can't be placed in a monthly partition; "
+                f"set one (e.g. UPDATE kudos SET timestamp = ... WHERE timestamp IS NULL) and run the migrations again"
+            )
+        cursor.execute("SELECT pg_get_serial_sequence('kudos', 'id')")
+        sequence = cursor.fetchone()[0]
+
+        # The primary key has to include the partition key
+        cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS kudos_partitioned (
+            id INTEGER NOT NULL DEFAULT nextval('{sequence}'),
+            sender VARCHAR(255) NOT NULL,
+            receiver VARCHAR(255) NOT NULL,
+            channel_id VARCHAR(255) NOT NULL,
+            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT kudos_partitioned_pkey PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp);
+
+        CREATE TABLE IF NOT EXISTS kudos_default PARTITION OF kudos_partitioned DEFAULT;
+
+        CREATE INDEX IF NOT EXISTS idx_kudos_p_channel_timestamp ON kudos_partitioned(channel_id, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_kudos_p_sender_channel_timestamp ON kudos_partitioned(sender, channel_id, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_kudos_p_receiver_channel_timestamp ON kudos_partitioned(receiver, channel_id, timestamp);
+        """)
+
+        cursor.execute("""
+        SELECT DATE_TRUNC('month', MIN(timestamp))::DATE, DATE_TRUNC('month', CURRENT_TIMESTAMP::TIMESTAMP)::DATE
+        FROM kudos
+        """)
+        first_month, this_month = cursor.fetchone()
+
+    month = min(first_month or this_month, this_month)
+    while month <= add_months(this_month, KUDOS_PARTITIONS_AHEAD):
+        db_manager._create_kudos_partition(conn, month, parent="kudos_partitioned")
+        month = add_months(month, 1)
+
+    copy_sql = """
+    WITH batch AS (
+        SELECT id, sender, receiver, channel_id, timestamp FROM kudos
+        WHERE id > %s ORDER BY id LIMIT %s
+    ), copied AS (
+        INSERT INTO kudos_partitioned (id, sender, receiver, channel_id, timestamp) SELECT * FROM batch
+    )
+    SELECT MAX(id), COUNT(*) FROM batch
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM kudos_partitioned")
+        last_id = cursor.fetchone()[0]
+        while True:
+            cursor.execute(copy_sql, (last_id, PARTITION_COPY_BATCH))
+            batch_last_id, copied = cursor.fetchone()
+            if not copied:
+                break
+            last_id = batch_last_id
+            logger.info(f"Copied kudos up to id {last_id} into kudos_partitioned")
+
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET LOCAL lock_timeout = %s", (MIGRATION_LOCK_TIMEOUT,))
+            # Reads carry on; inserts wait for the swap
+            cursor.execute("LOCK TABLE kudos IN EXCLUSIVE MODE")
+            cursor.execute(copy_sql, (last_id, 2 ** 31))
+
+            # Rows committed out of id order or deleted during the copy. Equal counts prove nothing
+            # (a deletion can hide a missed insert), so both sides are always reconciled by id.
+            cursor.execute("""
+            DELETE FROM kudos_partitioned p WHERE NOT EXISTS (SELECT 1 FROM kudos k WHERE k.id = p.id)
+            """)
+            deleted = cursor.rowcount
+            cursor.execute("""
+            INSERT INTO kudos_partitioned (id, sender, receiver, channel_id, timestamp)
+            SELECT id, sender, receiver, channel_id, timestamp FROM kudos k
+            WHERE NOT EXISTS (SELECT 1 FROM kudos_partitioned p WHERE p.id = k.id)
+            """)
+            inserted = cursor.rowcount
+            if deleted or inserted:
+                logger.warning(f"Reconciled kudos_partitioned with kudos: {deleted} row(s) removed, {inserted} added")
+            cursor.execute("SELECT COUNT(*) FROM kudos")
+            old_count = cursor.fetchone()[0]
+
+            # Hand the id sequence to the new table before the old one (its owner) is dropped
+            cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY kudos_partitioned.id")
+            cursor.execute("DROP TABLE kudos")
+            cursor.execute("ALTER TABLE kudos_partitioned RENAME TO kudos")
+            cursor.execute("ALTER TABLE kudos RENAME CONSTRAINT kudos_partitioned_pkey TO kudos_pkey")
+            for columns in ("channel_timestamp", "sender_channel_timestamp", "receiver_channel_timestamp"):
+                cursor.execute(f"ALTER INDEX idx_kudos_p_{columns} RENAME TO idx_kudos_{columns}")
+        conn.commit()
+        logger.info(f"kudos is now partitioned by month ({old_count} rows)")
+    finally:
+        conn.rollback()
+        conn.autocommit = True
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def get_applied_versions(cursor):
+    """Get the set of applied migration versions (empty if migrations have never run)"""
+    cursor.execute("SELECT to_regclass('schema_migrations')")
+    if cursor.fetchone()[0] is None:
+        return set()
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def get_pending_migrations(applied_versions, target=None):
+    """Get the migrations that still need to run, in order"""
+    return [
+        m for m in MIGRATIONS
+        if m.version not in applied_versions and (target is None or m.version <= target)
+    ]
+
+
+def get_migration_status(db_manager):
+    """Get every known migration with its applied_at time (None if pending)"""
+    with db_manager.get_connection() as conn:
+        with conn.cursor() as cursor:
+            applied = {}
+            if get_applied_versions(cursor):
+                cursor.execute("SELECT version, applied_at FROM schema_migrations")
+                applied = dict(cursor.fetchall())
+    return [(m, applied.get(m.version)) for m in MIGRATIONS]
+
+
+def _apply_migration(conn, migration, db_manager):
+    start = time.monotonic()
+    logger.info(f"Applying migration {migration.version}: {migration.name}")
+
+    if migration.transactional:
+        with conn.cursor() as cursor:
+            cursor.execute("SET LOCAL lock_timeout = %s", (MIGRATION_LOCK_TIMEOUT,))
+        migration.apply(conn, db_manager)
+    else:
+        conn.autocommit = True
+        try:
+            migration.apply(conn, db_manager)
+        finally:
+            conn.autocommit = False
+
+    execution_ms = int((time.monotonic() - start) * 1000)
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO schema_migrations (version, name, execution_ms) VALUES (%s, %s, %s)",
+            (migration.version, migration.name, execution_ms)
+        )
+    conn.commit()
+    logger.info(f"Migration {migration.version} applied in {execution_ms} ms")
+
+
+def migrate(db_manager, target=None):
+    """Apply pending migrations in order (up to target, if given). Returns the applied migrations."""
+    applied_now = []
+    with db_manager.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(CREATE_MIGRATIONS_TABLE_SQL)
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        conn.commit()
+
+        try:
+            # Read applied versions under the lock, in case another deploy just finished
+            with conn.cursor() as cursor:
+                pending = get_pending_migrations(get_applied_versions(cursor), target)
+            conn.commit()
+
+            for pending_migration in pending:
+                _apply_migration(conn, pending_migration, db_manager)
+                applied_now.append(pending_migration)
+        finally:
+            conn.rollback()
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            conn.commit()
+
+    return applied_now
+
+
+def show_status(db_manager):
+    """Print every migration and whether it has been applied"""
+    print("🦀 Schema migrations:")
+    pending = 0
+    for m, applied_at in get_migration_status(db_manager):
+        if applied_at:
+            print(f"   ✅ {m.version:04d} {m.name} (applied {applied_at.strftime('%Y-%m-%d %H:%M:%S')})")
+        else:
+            pending += 1
+            print(f"   ⏳ {m.version:04d} {m.name}{'' if m.transactional else ' [online]'}")
+
+    if pending:
+        print(f"\n{pending} pending migration(s). Run `python migrations.py up` to apply them.")
+    else:
+        print(f"\n✅ Schema is up to date (version {LATEST_VERSION})")
+    return pending == 0
+
+
+def run_up(db_manager, target=None):
+    """Apply pending migrations and print what ran"""
+    print("🦀 Applying migrations...")
+    applied = migrate(db_manager, target)
+    if not applied:
+        print("✅ Nothing to do - schema is up to date")
+        return
+    for m in applied:
+        print(f"   ✅ {m.version:04d} {m.name}")
+    print(f"✅ Done! Applied {len(applied)} migration(s) 🦀")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    # Load environment variables before the database module reads them
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    from database import get_db_manager, is_sqlite_url
+
+    args = sys.argv[1:]
+    command = args[0] if args else "status"
+
+    if command in ('-h', '--help') or command not in ('status', 'up'):
+        print("Usage:")
+        print("  python migrations.py status")
+        print("  python migrations.py up [VERSION]")
+        print("\nExamples:")
+        print("  python migrations.py up")
+        print("  python migrations.py up 2")
+        sys.exit(0 if command in ('-h', '--help') else 1)
+
+    db_manager = get_db_manager()
+    if is_sqlite_url(os.environ.get('DATABASE_URL', '')):
+        # The embedded database has a single schema, created (or checked) the same way the bot does at startup
+        if command == 'up':
+            version = db_manager.verify_schema()
+            print(f"✅ SQLite schema is up to date (version {version})")
+        else:
+            print("🦀 SQLite databases have no migrations - `python migrations.py up` (or starting the bot) creates the schema")
+        sys.exit(0)
+
+    if command == 'status':
+        sys.exit(0 if show_status(db_manager) else 1)
+
+    target = int(args[1]) if len(args) > 1 else None
+    run_up(db_manager, target)
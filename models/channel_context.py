@@ -0,0 +1,100 @@
+import os
+import logging
+from datetime import datetime, date, timezone, timedelta
+from config.settings import MONTHLY_QUOTA, LEADERBOARD_LIMIT
+from config.personalities import load_personality
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelContext:
+    """Channel settings resolved once per request.
+
+    Follows the leaderboard override chain and resolves quota, leaderboard
+    limit, timezone and personality up front, so handlers and formatters
+    don't each go back to the database for the same channel config.
+    """
+
+    def __init__(self, channel_id, config, effective_channel_id, effective_config, personality, timezone_str, offset_hours):
+        self.channel_id = channel_id
+        self.config = config
+        self.effective_channel_id = effective_channel_id
+        self.effective_config = effective_config
+        self.personality = personality
+        self.timezone = timezone_str
+        self.offset_hours = offset_hours
+
+        # Quota, limit and personality are inherited from the override (source) channel
+        if effective_config and effective_config['monthly_quota']:
+            self.monthly_quota = effective_config['monthly_quota']
+        else:
+            self.monthly_quota = MONTHLY_QUOTA
+
+        if effective_config and effective_config['leaderboard_limit']:
+            self.leaderboard_limit = effective_config['leaderboard_limit']
+        else:
+            self.leaderboard_limit = LEADERBOARD_LIMIT
+
+    @classmethod
+    def resolve(cls, channel_id, db_manager):
+        """Resolve the context for a channel with at most two config lookups"""
+        config = db_manager.get_channel_config(channel_id) if channel_id else None
+
+        if config and config['leaderboard_channel_id']:
+            effective_channel_id = config['leaderboard_channel_id']
+            effective_config = db_manager.get_channel_config(effective_channel_id)
+        else:
+            effective_channel_id = channel_id
+            effective_config = config
+
+        return cls._build(channel_id, config, effective_channel_id, effective_config, db_manager)
+
+    @classmethod
+    async def resolve_async(cls, channel_id, db_manager):
+        """Resolve the context for a channel using an AsyncDatabaseManager"""
+        config = await db_manager.get_channel_config(channel_id) if channel_id else None
+
+        if config and config['leaderboard_channel_id']:
+            effective_channel_id = config['leaderboard_channel_id']
+            effective_config = await db_manager.get_channel_config(effective_channel_id)
+        else:
+            effective_channel_id = channel_id
+            effective_config = config
+
+        return cls._build(channel_id, config, effective_channel_id, effective_config, db_manager)
+
+    @classmethod
+    def _build(cls, channel_id, config, effective_channel_id, effective_config, db_manager):
+        personality = None
+        if effective_config and effective_config['personality_name']:
+            try:
+                personality = load_personality(effective_config['personality_name'])
+            except Exception as e:
+                # Log error but don't fail - fall back to default
+                logger.warning(f"Failed to load channel-specific personality for {channel_id}: {e}")
+        if personality is None:
+            personality = load_personality()
+
+        # Month boundaries use the channel's own timezone, falling back to the global default
+        if config and config.get('timezone'):
+            timezone_str = config['timezone']
+        else:
+            timezone_str = os.getenv('TIMEZONE', 'UTC')
+        offset_hours = db_manager.get_timezone_offset(timezone_str)
+
+        return cls(channel_id, config, effective_channel_id, effective_config, personality, timezone_str, offset_hours)
+
+    @property
+    def has_override(self):
+        """Whether this channel uses another channel's leaderboard"""
+        return self.effective_channel_id != self.channel_id
+
+    def get_current_month_year(self):
+        """Get the current month and year in the channel's timezone"""
+        local_time = datetime.now(timezone.utc) + timedelta(hours=self.offset_hours)
+        return local_time.month, local_time.year
+
+    def get_current_local_month(self):
+        """Get the first day of the current local month (the rollup key)"""
+        month, year = self.get_current_month_year()
+        return date(year, month, 1)
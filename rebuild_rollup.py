@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Utility script to backfill and verify the kudos_monthly_rollup table.
+Migrations backfill it on creation; run this whenever the consistency check reports drift.
+A full rebuild also recounts the bot_stats totals shown by /kk status.
+"""
+
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables before the database module reads them
+load_dotenv()
+
+from database import get_db_manager
+
+
+def backfill_rollup(channel_id=None):
+    """Rebuild the monthly rollup from the raw kudos rows"""
+    target = f"channel {channel_id}" if channel_id else "all channels"
+    print(f"🦀 Rebuilding monthly rollup for {target}...")
+
+    db_manager = get_db_manager()
+    rebuilt = db_manager.rebuild_monthly_rollup(channel_id)
+    if channel_id is None:
+        print("🔄 Recounting /kk status totals...")
+        db_manager.rebuild_bot_stats()
+
+    print(f"✅ Done! Rebuilt the rollup for {rebuilt} channel(s) 🦀")
+
+
+def check_rollup(channel_id=None):
+    """Report rollup rows that don't match the raw kudos rows"""
+    target = f"channel {channel_id}" if channel_id else "all channels"
+    print(f"🔍 Checking monthly rollup for {target}...")
+
+    db_manager = get_db_manager()
+    mismatches = db_manager.check_monthly_rollup(channel_id)
+
+    if not mismatches:
+        print("✅ Monthly rollup is consistent with the kudos table!")
+        return True
+
+    print(f"\n⚠️  Found {len(mismatches)} mismatched rollup rows:")
+    for row in mismatches:
+        print(
+            f"   {row['local_month'].strftime('%Y-%m')} | {row['user_id']} (channel: {row['channel_id']}) "
+            f"sent {row['actual_sent']} (expected {row['expected_sent']}), "
+            f"received {row['actual_received']} (expected {row['expected_received']})"
+        )
+    print("\nRun `python rebuild_rollup.py` to rebuild it.")
+    return False
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    if args and args[0] in ('-h', '--help'):
+        print("Usage:")
+        print("  python rebuild_rollup.py [CHANNEL_ID]")
+        print("  python rebuild_rollup.py --check [CHANNEL_ID]")
+        print("\nExamples:")
+        print("  python rebuild_rollup.py")
+        print("  python rebuild_rollup.py C1234567890")
+        print("  python rebuild_rollup.py --check")
+        sys.exit(0)
+
+    if args and args[0] == '--check':
+        channel_id = args[1] if len(args) > 1 else None
+        sys.exit(0 if check_rollup(channel_id) else 1)
+
+    channel_id = args[0] if args else None
+    backfill_rollup(channel_id)
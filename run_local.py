@@ -8,10 +8,11 @@ from dotenv import load_dotenv
 # Load environment variables BEFORE importing kudos_bot
 load_dotenv()
 
-from kudos_bot import app
+from kudos_bot import app, prepare_server
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", "3000"))
+    prepare_server()
     print(f"🦀 Starting Kiitos Krab locally on port {port}...")
     print(f"🌊 Your Slack app Request URL should be: https://your-domain.com/slack/events")
     app.start(port=port, path="/slack/events") 
\ No newline at end of file
@@ -0,0 +1,677 @@
+"""
+Embedded SQLite storage backend for Kiitos Krab.
+
+SQLiteDatabaseManager implements the same StorageBackend interface as the
+PostgreSQL DatabaseManager on a local SQLite file in WAL mode, so a small
+single-container deployment needs no database server and no network round
+trip per query, and tests and benchmarks can run entirely in-process.
+
+Select it with DATABASE_URL=sqlite:///kudos.db (relative to the working
+directory) or sqlite:////data/kudos.db (absolute). WAL lets readers run
+alongside the single writer; every write transaction starts with BEGIN
+IMMEDIATE, which serializes writers up front - that is what makes the quota
+check in record_kudos_batch race-free, like the advisory lock on Postgres.
+The file is only safe to share between processes on one machine, and is
+lost with the container on Lambda.
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, date
+from config.settings import DB_POOL_MAX, DB_POOL_TIMEOUT
+from storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever _SCHEMA_SQL changes; stored in PRAGMA user_version
+SCHEMA_VERSION = 1
+
+# Same tables as the PostgreSQL schema, minus the monthly partitions
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS kudos (
+    id INTEGER PRIMARY KEY,
+    sender TEXT NOT NULL,
+    receiver TEXT NOT NULL,
+    channel_id TEXT NOT NULL,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_kudos_channel_timestamp ON kudos(channel_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_kudos_sender_channel_timestamp ON kudos(sender, channel_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_kudos_receiver_channel_timestamp ON kudos(receiver, channel_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS channel_configs (
+    channel_id TEXT PRIMARY KEY,
+    personality_name TEXT,
+    monthly_quota INTEGER,
+    leaderboard_channel_id TEXT,
+    leaderboard_limit INTEGER,
+    timezone TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_channel_configs_leaderboard ON channel_configs(leaderboard_channel_id);
+
+CREATE TABLE IF NOT EXISTS kudos_monthly_rollup (
+    channel_id TEXT NOT NULL,
+    local_month DATE NOT NULL,
+    user_id TEXT NOT NULL,
+    sent INTEGER NOT NULL DEFAULT 0,
+    received INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (channel_id, local_month, user_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS announcement_outbox (
+    id INTEGER PRIMARY KEY,
+    channel_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    delivered_at TIMESTAMP,
+    failed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_announcement_outbox_pending
+    ON announcement_outbox(next_attempt_at)
+    WHERE delivered_at IS NULL AND failed_at IS NULL;
+
+CREATE TABLE IF NOT EXISTS bot_stats (
+    channel_id TEXT PRIMARY KEY,
+    kudos_count INTEGER NOT NULL DEFAULT 0,
+    last_kudos_at TIMESTAMP NOT NULL,
+    last_sender TEXT NOT NULL,
+    last_receiver TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_bot_stats_last_kudos ON bot_stats(last_kudos_at);
+"""
+
+# Dates and timestamps are stored as ISO 8601 text (what CURRENT_TIMESTAMP writes), which sorts
+# chronologically, and read back as date/datetime for DATE/TIMESTAMP columns
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
+
+def sqlite_path(database_url: str) -> str:
+    """Get the file path from a sqlite:///relative.db or sqlite:////absolute.db URL"""
+    if not database_url.startswith('sqlite:///'):
+        raise ValueError("Invalid DATABASE_URL format - SQLite URLs look like 'sqlite:///kudos.db'")
+    path = database_url[len('sqlite:///'):]
+    if not path:
+        raise ValueError("DATABASE_URL is missing the SQLite file path")
+    return path
+
+
+def _hours(offset_hours) -> str:
+    """A SQLite date modifier shifting by offset_hours, e.g. '+5 hours'"""
+    return f"{offset_hours:+g} hours"
+
+
+def _seconds(seconds) -> str:
+    return f"{seconds:+g} seconds"
+
+
+class SQLiteDatabaseManager(StorageBackend):
+    """Embedded SQLite storage backend on a small stack of reusable WAL-mode connections"""
+
+    # Increments one or more (channel_id, local_month, user_id) rollup rows
+    _ROLLUP_UPSERT_SQL = """
+    INSERT INTO kudos_monthly_rollup (channel_id, local_month, user_id, sent, received)
+    VALUES {values}
+    ON CONFLICT (channel_id, local_month, user_id)
+    DO UPDATE SET
+        sent = sent + excluded.sent,
+        received = received + excluded.received
+    """
+
+    # Aggregates raw kudos rows for one channel into rollup rows. Params: (hours modifier, channel_id)
+    _ROLLUP_SOURCE_SQL = """
+    SELECT channel_id, local_month, user_id, SUM(sent) AS sent, SUM(received) AS received
+    FROM (
+        SELECT channel_id, date(timestamp, ?1, 'start of month') AS local_month,
+               sender AS user_id, 1 AS sent, 0 AS received
+        FROM kudos WHERE channel_id = ?2
+        UNION ALL
+        SELECT channel_id, date(timestamp, ?1, 'start of month') AS local_month,
+               receiver AS user_id, 0 AS sent, 1 AS received
+        FROM kudos WHERE channel_id = ?2
+    ) events
+    GROUP BY channel_id, local_month, user_id
+    """
+
+    # Bumps a channel's kudos count and last-kudos pointer. Params: (channel_id, count, sender, receiver)
+    _BOT_STATS_UPSERT_SQL = """
+    INSERT INTO bot_stats (channel_id, kudos_count, last_kudos_at, last_sender, last_receiver)
+    VALUES (?, ?, CURRENT_TIMESTAMP, ?, ?)
+    ON CONFLICT (channel_id)
+    DO UPDATE SET
+        kudos_count = kudos_count + excluded.kudos_count,
+        last_kudos_at = excluded.last_kudos_at,
+        last_sender = excluded.last_sender,
+        last_receiver = excluded.last_receiver
+    """
+
+    # One bot_stats row per channel with kudos, computed from the raw kudos rows
+    _BOT_STATS_SOURCE_SQL = """
+    SELECT channel_id, kudos_count, timestamp, sender, receiver
+    FROM (
+        SELECT channel_id, timestamp, sender, receiver,
+               COUNT(*) OVER (PARTITION BY channel_id) AS kudos_count,
+               ROW_NUMBER() OVER (PARTITION BY channel_id ORDER BY timestamp DESC, id DESC) AS position
+        FROM kudos
+    ) ranked
+    WHERE position = 1
+    """
+
+    def __init__(self):
+        super().__init__()
+        database_url = os.getenv('DATABASE_URL')
+        if not database_url:
+            raise ValueError("DATABASE_URL environment variable not set")
+        self.path = sqlite_path(database_url)
+
+        # Opening a connection is cheap, so there is no checkout limit: up to DB_POOL_MAX idle
+        # connections are kept for reuse and any extra ones are closed when returned
+        self._lock = threading.Lock()
+        self._idle = []
+        self._in_use = 0
+        self.stats = {'checkouts': 0, 'waits': 0, 'timeouts': 0, 'reconnects': 0, 'discarded': 0}
+        logger.info(f"SQLite storage initialized at {self.path}")
+
+    def _connect(self):
+        """Open a connection in autocommit mode, so transactions are explicit BEGINs"""
+        conn = sqlite3.connect(
+            self.path,
+            timeout=DB_POOL_TIMEOUT,
+            isolation_level=None,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        # Durable across application crashes in WAL mode; only a power loss can drop the last commits
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    @contextmanager
+    def get_connection(self):
+        """Check out a connection, rolling back an open transaction on error"""
+        with self._lock:
+            self.stats['checkouts'] += 1
+            self._in_use += 1
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._in_use -= 1
+                raise
+
+        try:
+            yield conn
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            logger.error(f"Database operation failed: {e}")
+            raise
+        finally:
+            with self._lock:
+                keep = len(self._idle) < DB_POOL_MAX
+                if keep:
+                    self._idle.append(conn)
+                self._in_use -= 1
+            if not keep:
+                self.stats['discarded'] += 1
+                conn.close()
+
+    @contextmanager
+    def _write_transaction(self):
+        """Run a write transaction, taking the database's write lock up front (waits up to DB_POOL_TIMEOUT)"""
+        with self.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.commit()
+
+    @contextmanager
+    def _read_transaction(self):
+        """Read several statements from one snapshot"""
+        with self.get_connection() as conn:
+            conn.execute("BEGIN")
+            yield conn
+            conn.commit()
+
+    def get_pool_stats(self):
+        """Get connection counters and utilization (same keys as the PostgreSQL pool)"""
+        with self._lock:
+            idle = len(self._idle)
+            return dict(self.stats, size=self._in_use + idle, idle=idle, in_use=self._in_use, maxconn=DB_POOL_MAX)
+
+    def verify_schema(self) -> int:
+        """Create the schema if the file is new and check its version.
+
+        There is no separate migration step for the embedded database: the
+        tables are created with IF NOT EXISTS and the version recorded in
+        PRAGMA user_version. Raises RuntimeError if the file was written by a
+        newer version of the bot.
+        """
+        with self.get_connection() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > SCHEMA_VERSION:
+                raise RuntimeError(f"SQLite database {self.path} has schema version {version}, newer than this bot's {SCHEMA_VERSION}")
+            if version < SCHEMA_VERSION:
+                conn.executescript(f"BEGIN IMMEDIATE; {_SCHEMA_SQL} PRAGMA user_version = {SCHEMA_VERSION}; COMMIT;")
+                logger.info(f"SQLite schema created in {self.path} (version {SCHEMA_VERSION})")
+
+        logger.info(f"Database schema is up to date (version {SCHEMA_VERSION})")
+        return SCHEMA_VERSION
+
+    def _insert_kudos_rows(self, conn, sender: str, receivers: list, channel_id: str, local_month: date):
+        """Insert kudos rows for every receiver and bump the monthly rollup and bot_stats (caller commits)"""
+        conn.executemany(
+            "INSERT INTO kudos (sender, receiver, channel_id) VALUES (?, ?, ?)",
+            [(sender, receiver, channel_id) for receiver in receivers]
+        )
+
+        # One rollup row for the sender plus one per receiver
+        rollup_params = [channel_id, local_month, sender, len(receivers), 0]
+        for receiver in receivers:
+            rollup_params.extend([channel_id, local_month, receiver, 0, 1])
+        values = ", ".join(["(?, ?, ?, ?, ?)"] * (len(receivers) + 1))
+        conn.execute(self._ROLLUP_UPSERT_SQL.format(values=values), rollup_params)
+
+        conn.execute(self._BOT_STATS_UPSERT_SQL, (channel_id, len(receivers), sender, receivers[-1]))
+
+    def record_kudos(self, sender: str, receiver: str, channel_id: str) -> bool:
+        """Record a new kudos entry and update the monthly rollup in the same transaction"""
+        local_month = self.get_current_local_month(channel_id)
+
+        try:
+            with self._write_transaction() as conn:
+                self._insert_kudos_rows(conn, sender, [receiver], channel_id, local_month)
+            logger.info(f"Kudos recorded: {sender} -> {receiver} in channel {channel_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to record kudos: {e}")
+            return False
+
+    def record_kudos_batch(self, sender: str, receivers: list, channel_id: str, quota: int, local_month: date = None,
+                           announcement: str = None):
+        """Record kudos for several receivers atomically, enforcing the sender's monthly quota.
+
+        BEGIN IMMEDIATE holds the write lock from the quota check to the
+        commit, so concurrent sends can't both pass the check. Same return
+        value as DatabaseManager.record_kudos_batch.
+        """
+        if local_month is None:
+            local_month = self.get_current_local_month(channel_id)
+
+        try:
+            with self._write_transaction() as conn:
+                result = conn.execute("""
+                SELECT sent FROM kudos_monthly_rollup
+                WHERE channel_id = ? AND local_month = ? AND user_id = ?
+                """, (channel_id, local_month, sender)).fetchone()
+                monthly_count = result[0] if result else 0
+
+                if monthly_count + len(receivers) > quota:
+                    return {'success': False, 'remaining': quota - monthly_count, 'announcement_id': None}
+
+                self._insert_kudos_rows(conn, sender, receivers, channel_id, local_month)
+                announcement_id = None
+                if announcement:
+                    announcement_id = self._insert_announcement(conn, channel_id, announcement)
+
+            logger.info(f"Kudos recorded: {sender} -> {', '.join(receivers)} in channel {channel_id}")
+            return {
+                'success': True,
+                'remaining': quota - monthly_count - len(receivers),
+                'announcement_id': announcement_id
+            }
+        except Exception as e:
+            logger.error(f"Failed to record kudos batch: {e}")
+            return None
+
+    def _insert_announcement(self, conn, channel_id: str, text: str) -> int:
+        """Queue a channel announcement in the outbox (caller commits)"""
+        return conn.execute("INSERT INTO announcement_outbox (channel_id, text) VALUES (?, ?)", (channel_id, text)).lastrowid
+
+    def enqueue_announcement(self, channel_id: str, text: str):
+        """Queue a channel announcement on its own; returns its outbox ID, or None on failure"""
+        try:
+            with self._write_transaction() as conn:
+                return self._insert_announcement(conn, channel_id, text)
+        except Exception as e:
+            logger.error(f"Failed to queue announcement for {channel_id}: {e}")
+            return None
+
+    def claim_announcements(self, limit: int, lease_seconds: float, announcement_ids: list = None):
+        """Claim up to limit due announcements for delivery.
+
+        The write lock is held from the SELECT to the lease UPDATE, so two
+        dispatchers never claim the same row (the job SKIP LOCKED does on
+        Postgres). Returns a list of {'id', 'channel_id', 'text', 'attempts'} dicts.
+        """
+        id_filter = ""
+        params = []
+        if announcement_ids is not None:
+            id_filter = f"AND id IN ({', '.join('?' * len(announcement_ids))})" if announcement_ids else "AND 0"
+            params = list(announcement_ids)
+
+        with self._write_transaction() as conn:
+            rows = conn.execute(f"""
+            SELECT id, channel_id, text, attempts + 1 FROM announcement_outbox
+            WHERE delivered_at IS NULL AND failed_at IS NULL
+            AND next_attempt_at <= CURRENT_TIMESTAMP
+            {id_filter}
+            ORDER BY next_attempt_at
+            LIMIT ?
+            """, [*params, limit]).fetchall()
+            conn.executemany("""
+            UPDATE announcement_outbox
+            SET attempts = attempts + 1, next_attempt_at = datetime('now', ?)
+            WHERE id = ?
+            """, [(_seconds(lease_seconds), row[0]) for row in rows])
+
+        return [
+            {'id': row[0], 'channel_id': row[1], 'text': row[2], 'attempts': row[3]}
+            for row in rows
+        ]
+
+    def mark_announcement_delivered(self, announcement_id: int):
+        """Mark an announcement delivered, dropping its text (kudos messages are not kept)"""
+        with self._write_transaction() as conn:
+            conn.execute("""
+            UPDATE announcement_outbox
+            SET delivered_at = CURRENT_TIMESTAMP, text = '', last_error = NULL
+            WHERE id = ?
+            """, (announcement_id,))
+
+    def reschedule_announcement(self, announcement_id: int, delay_seconds: float, error: str):
+        """Schedule another delivery attempt after delay_seconds"""
+        with self._write_transaction() as conn:
+            conn.execute("""
+            UPDATE announcement_outbox
+            SET next_attempt_at = datetime('now', ?), last_error = ?
+            WHERE id = ?
+            """, (_seconds(delay_seconds), error, announcement_id))
+
+    def fail_announcement(self, announcement_id: int, error: str):
+        """Give up on an announcement (permanent Slack error or out of attempts)"""
+        with self._write_transaction() as conn:
+            conn.execute("""
+            UPDATE announcement_outbox
+            SET failed_at = CURRENT_TIMESTAMP, text = '', last_error = ?
+            WHERE id = ?
+            """, (error, announcement_id))
+
+    def purge_announcements(self, older_than_hours: float) -> int:
+        """Delete delivered and failed announcements older than older_than_hours"""
+        with self._write_transaction() as conn:
+            return conn.execute("""
+            DELETE FROM announcement_outbox
+            WHERE COALESCE(delivered_at, failed_at) < datetime('now', ?)
+            """, (_hours(-older_than_hours),)).rowcount
+
+    def _get_rollup_count(self, column: str, user: str, month: int, year: int, channel_id: str) -> int:
+        with self.get_connection() as conn:
+            result = conn.execute(f"""
+            SELECT {column} FROM kudos_monthly_rollup
+            WHERE channel_id = ? AND local_month = ? AND user_id = ?
+            """, (channel_id, date(year, month, 1), user)).fetchone()
+        return result[0] if result else 0
+
+    def get_monthly_kudos_count(self, user: str, month: int, year: int, channel_id: str) -> int:
+        """Get the number of kudos sent by a user in a specific month and channel"""
+        return self._get_rollup_count("sent", user, month, year, channel_id)
+
+    def get_monthly_kudos_received_count(self, user: str, month: int, year: int, channel_id: str) -> int:
+        """Get the number of kudos received by a user in a specific month and channel"""
+        return self._get_rollup_count("received", user, month, year, channel_id)
+
+    def _get_leaderboard(self, month: int, year: int, channel_id: str, limit: int = -1):
+        """Top senders and receivers from the rollup (a negative limit means no limit)"""
+        params = (channel_id, date(year, month, 1), limit)
+        with self._read_transaction() as conn:
+            senders = conn.execute("""
+            SELECT user_id, sent FROM kudos_monthly_rollup
+            WHERE channel_id = ? AND local_month = ? AND sent > 0
+            ORDER BY sent DESC
+            LIMIT ?
+            """, params).fetchall()
+            receivers = conn.execute("""
+            SELECT user_id, received FROM kudos_monthly_rollup
+            WHERE channel_id = ? AND local_month = ? AND received > 0
+            ORDER BY received DESC
+            LIMIT ?
+            """, params).fetchall()
+
+        return {
+            'senders': senders,
+            'receivers': receivers
+        }
+
+    def get_monthly_leaderboard(self, month: int, year: int, channel_id: str, limit: int = None):
+        """Get monthly leaderboard for senders and receivers in a specific channel"""
+        return self._get_leaderboard(month, year, channel_id, self._get_leaderboard_limit(channel_id, limit))
+
+    def get_complete_monthly_leaderboard(self, month: int, year: int, channel_id: str):
+        """Get complete monthly leaderboard for all users who sent/received kudos (no limit)"""
+        return self._get_leaderboard(month, year, channel_id)
+
+    def get_user_stats(self, user: str, channel_id: str, local_month: date = None):
+        """Get kudos statistics for a specific user in a specific channel"""
+        if local_month is None:
+            local_month = self.get_current_local_month(channel_id)
+
+        with self.get_connection() as conn:
+            total_sent, total_received, monthly_sent, monthly_received = conn.execute("""
+            SELECT COALESCE(SUM(sent), 0),
+                   COALESCE(SUM(received), 0),
+                   COALESCE(SUM(CASE WHEN local_month = ?1 THEN sent END), 0),
+                   COALESCE(SUM(CASE WHEN local_month = ?1 THEN received END), 0)
+            FROM kudos_monthly_rollup
+            WHERE channel_id = ?2 AND user_id = ?3
+            """, (local_month, channel_id, user)).fetchone()
+
+        return {
+            'total_sent': total_sent,
+            'total_received': total_received,
+            'monthly_sent': monthly_sent,
+            'monthly_received': monthly_received
+        }
+
+    def get_status_summary(self):
+        """Get the database side of /kk status from one snapshot"""
+        with self._read_transaction() as conn:
+            channels = [row[0] for row in conn.execute("""
+            SELECT channel_id FROM bot_stats
+            UNION
+            SELECT channel_id FROM channel_configs
+            ORDER BY channel_id
+            """)]
+            last_kudos = conn.execute("""
+            SELECT last_kudos_at, channel_id, last_sender, last_receiver
+            FROM bot_stats
+            ORDER BY last_kudos_at DESC
+            LIMIT 1
+            """).fetchone()
+            total_kudos = conn.execute("SELECT COALESCE(SUM(kudos_count), 0) FROM bot_stats").fetchone()[0]
+            config_channels = conn.execute("""
+            SELECT channel_id, personality_name, monthly_quota, leaderboard_channel_id, timezone
+            FROM channel_configs
+            ORDER BY channel_id
+            """).fetchall()
+            outbox_pending, outbox_failed = conn.execute("""
+            SELECT COUNT(CASE WHEN delivered_at IS NULL AND failed_at IS NULL THEN 1 END),
+                   COUNT(failed_at)
+            FROM announcement_outbox
+            """).fetchone()
+
+        return {
+            'channels': channels,
+            'last_kudos': last_kudos,
+            'total_kudos': total_kudos,
+            'config_channels': config_channels,
+            'outbox': {'pending': outbox_pending, 'failed': outbox_failed}
+        }
+
+    def _get_rollup_channels(self):
+        """Get every channel with raw kudos or rollup rows"""
+        with self.get_connection() as conn:
+            return [row[0] for row in conn.execute("""
+            SELECT channel_id FROM kudos
+            UNION
+            SELECT channel_id FROM kudos_monthly_rollup
+            """)]
+
+    def rebuild_monthly_rollup(self, channel_id: str = None) -> int:
+        """Rebuild kudos_monthly_rollup from the raw kudos rows, one channel per transaction"""
+        channels = [channel_id] if channel_id else self._get_rollup_channels()
+
+        for channel in channels:
+            offset_hours = self.get_timezone_offset(self.get_channel_timezone(channel))
+            with self._write_transaction() as conn:
+                conn.execute("DELETE FROM kudos_monthly_rollup WHERE channel_id = ?", (channel,))
+                conn.execute(f"""
+                INSERT INTO kudos_monthly_rollup (channel_id, local_month, user_id, sent, received)
+                {self._ROLLUP_SOURCE_SQL}
+                """, (_hours(offset_hours), channel))
+            logger.info(f"Monthly rollup rebuilt for channel {channel}")
+
+        return len(channels)
+
+    def check_monthly_rollup(self, channel_id: str = None):
+        """Compare kudos_monthly_rollup against the raw kudos rows (see DatabaseManager.check_monthly_rollup)"""
+        channels = [channel_id] if channel_id else self._get_rollup_channels()
+
+        mismatches = []
+        for channel in channels:
+            offset_hours = self.get_timezone_offset(self.get_channel_timezone(channel))
+            with self._read_transaction() as conn:
+                expected = {
+                    (row[1], row[2]): (row[3], row[4])
+                    for row in conn.execute(self._ROLLUP_SOURCE_SQL, (_hours(offset_hours), channel))
+                }
+                actual = {
+                    (row[0].isoformat(), row[1]): (row[2], row[3])
+                    for row in conn.execute("""
+                    SELECT local_month, user_id, sent, received FROM kudos_monthly_rollup WHERE channel_id = ?
+                    """, (channel,))
+                }
+
+            for local_month, user_id in sorted(expected.keys() | actual.keys()):
+                expected_sent, expected_received = expected.get((local_month, user_id), (0, 0))
+                actual_sent, actual_received = actual.get((local_month, user_id), (0, 0))
+                if (expected_sent, expected_received) != (actual_sent, actual_received):
+                    mismatches.append({
+                        'channel_id': channel,
+                        'local_month': date.fromisoformat(local_month),
+                        'user_id': user_id,
+                        'expected_sent': expected_sent,
+                        'actual_sent': actual_sent,
+                        'expected_received': expected_received,
+                        'actual_received': actual_received
+                    })
+
+        return mismatches
+
+    def rebuild_bot_stats(self) -> int:
+        """Recount bot_stats after kudos were deleted; returns the number of active channels"""
+        with self._write_transaction() as conn:
+            conn.execute("DELETE FROM bot_stats")
+            channels = conn.execute(f"""
+            INSERT INTO bot_stats (channel_id, kudos_count, last_kudos_at, last_sender, last_receiver)
+            {self._BOT_STATS_SOURCE_SQL}
+            """).rowcount
+        logger.info(f"Bot stats rebuilt for {channels} channel(s)")
+        return channels
+
+    def ensure_kudos_partitions(self, months_ahead: int = None) -> int:
+        """SQLite has no partitions - monthly queries use the rollup and the (channel_id, timestamp) index"""
+        return 0
+
+    def _select_channel_config(self, channel_id: str):
+        with self.get_connection() as conn:
+            return conn.execute("""
+            SELECT personality_name, monthly_quota, leaderboard_channel_id, leaderboard_limit, timezone, created_at, updated_at
+            FROM channel_configs
+            WHERE channel_id = ?
+            """, (channel_id,)).fetchone()
+
+    def _select_channel_configs(self, limit: int):
+        with self.get_connection() as conn:
+            return conn.execute("""
+            SELECT channel_id, personality_name, monthly_quota, leaderboard_channel_id, leaderboard_limit, timezone, created_at, updated_at
+            FROM channel_configs
+            ORDER BY updated_at DESC
+            LIMIT ?
+            """, (limit,)).fetchall()
+
+    def save_channel_config(self, channel_id: str, personality_name: str = None,
+                           monthly_quota: int = None, leaderboard_channel_id: str = None,
+                           leaderboard_limit: int = None, timezone: str = None):
+        """Save or update channel configuration using UPSERT"""
+        sql = """
+        INSERT INTO channel_configs (channel_id, personality_name, monthly_quota, leaderboard_channel_id, leaderboard_limit, timezone, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+        ON CONFLICT (channel_id)
+        DO UPDATE SET
+            personality_name = COALESCE(excluded.personality_name, personality_name),
+            monthly_quota = COALESCE(excluded.monthly_quota, monthly_quota),
+            leaderboard_channel_id = COALESCE(excluded.leaderboard_channel_id, leaderboard_channel_id),
+            leaderboard_limit = COALESCE(excluded.leaderboard_limit, leaderboard_limit),
+            timezone = COALESCE(excluded.timezone, timezone),
+            updated_at = CURRENT_TIMESTAMP
+        """
+        params = (channel_id, personality_name, monthly_quota, leaderboard_channel_id, leaderboard_limit, timezone)
+
+        try:
+            previous_timezone = self.get_channel_timezone(channel_id)
+            with self._write_transaction() as conn:
+                conn.execute(sql, params)
+            self.config_cache.invalidate(channel_id)
+            logger.info(f"Channel config saved for {channel_id}: personality={personality_name}, quota={monthly_quota}, leaderboard={leaderboard_channel_id}, limit={leaderboard_limit}, timezone={timezone}")
+        except Exception as e:
+            logger.error(f"Failed to save channel config: {e}")
+            return False
+
+        self._rebuild_rollup_if_timezone_changed(channel_id, previous_timezone)
+        return True
+
+    def delete_channel_config(self, channel_id: str):
+        """Delete channel configuration to reset to defaults"""
+        try:
+            previous_timezone = self.get_channel_timezone(channel_id)
+            with self._write_transaction() as conn:
+                conn.execute("DELETE FROM channel_configs WHERE channel_id = ?", (channel_id,))
+            self.config_cache.invalidate(channel_id)
+            logger.info(f"Channel config deleted for {channel_id}")
+        except Exception as e:
+            logger.error(f"Failed to delete channel config: {e}")
+            return False
+
+        self._rebuild_rollup_if_timezone_changed(channel_id, previous_timezone)
+        return True
+
+    def get_channels_using_leaderboard(self, channel_id: str):
+        """Get channels whose leaderboard override points at the given channel"""
+        with self.get_connection() as conn:
+            return [row[0] for row in conn.execute(
+                "SELECT channel_id FROM channel_configs WHERE leaderboard_channel_id = ?", (channel_id,)
+            )]
+
+    def close(self):
+        """Close the idle connections (call once in-flight requests have finished)"""
+        with self._lock:
+            connections, self._idle = self._idle, []
+        for conn in connections:
+            conn.close()
+        logger.info("SQLite connections closed")
@@ -0,0 +1,276 @@
+"""
+Storage backend interface for Kiitos Krab.
+
+Handlers and the announcement dispatcher only talk to the database through
+these methods, so the bot can run on either backend chosen by DATABASE_URL:
+
+- DatabaseManager (database.py): PostgreSQL through a bounded psycopg2 pool
+- SQLiteDatabaseManager (sqlite_database.py): an embedded SQLite file in WAL
+  mode, for single-container deployments, tests and benchmarks
+
+Channel configs, timezones and their cache don't depend on the backend and
+live here; everything that runs a query is implemented by each backend.
+"""
+
+import os
+import logging
+from datetime import datetime, date, timezone, timedelta
+from config.settings import LEADERBOARD_LIMIT, CONFIG_CACHE_TTL, CONFIG_CACHE_SIZE
+from config_cache import ChannelConfigCache
+
+logger = logging.getLogger(__name__)
+
+
+class StorageBackend:
+    """Every query the bot issues, independent of the database behind it"""
+
+    # Columns returned by get_channel_config, in order
+    _CHANNEL_CONFIG_COLUMNS = ('personality_name', 'monthly_quota', 'leaderboard_channel_id', 'leaderboard_limit', 'timezone', 'created_at', 'updated_at')
+
+    def __init__(self):
+        # LRU + TTL cache of channel configs
+        self.config_cache = ChannelConfigCache(ttl=CONFIG_CACHE_TTL, max_size=CONFIG_CACHE_SIZE)
+
+    # --- Lifecycle ---
+
+    def verify_schema(self) -> int:
+        """Check that the schema is current; returns its version or raises RuntimeError"""
+        raise NotImplementedError
+
+    def get_pool_stats(self):
+        """Get connection counters (checkouts, waits, timeouts, reconnects) and utilization"""
+        raise NotImplementedError
+
+    def close(self):
+        """Close every open connection"""
+        raise NotImplementedError
+
+    # --- Kudos ---
+
+    def record_kudos(self, sender: str, receiver: str, channel_id: str) -> bool:
+        """Record a single kudos without a quota check"""
+        raise NotImplementedError
+
+    def record_kudos_batch(self, sender: str, receivers: list, channel_id: str, quota: int, local_month: date = None,
+                           announcement: str = None):
+        """Record kudos for several receivers atomically, enforcing the sender's monthly quota.
+
+        Returns {'success': bool, 'remaining': int, 'announcement_id': int or None},
+        or None if the database write failed.
+        """
+        raise NotImplementedError
+
+    def get_monthly_kudos_count(self, user: str, month: int, year: int, channel_id: str) -> int:
+        """Get the number of kudos sent by a user in a specific month and channel"""
+        raise NotImplementedError
+
+    def get_monthly_kudos_received_count(self, user: str, month: int, year: int, channel_id: str) -> int:
+        """Get the number of kudos received by a user in a specific month and channel"""
+        raise NotImplementedError
+
+    def get_monthly_leaderboard(self, month: int, year: int, channel_id: str, limit: int = None):
+        """Get the top senders and receivers of a month: {'senders': [(user, count)], 'receivers': [...]}"""
+        raise NotImplementedError
+
+    def get_complete_monthly_leaderboard(self, month: int, year: int, channel_id: str):
+        """Get every sender and receiver of a month (no limit)"""
+        raise NotImplementedError
+
+    def get_user_stats(self, user: str, channel_id: str, local_month: date = None):
+        """Get a user's all-time and current-month totals in a channel"""
+        raise NotImplementedError
+
+    def get_status_summary(self):
+        """Get the database side of /kk status.
+
+        Returns {'channels', 'last_kudos', 'total_kudos', 'config_channels', 'outbox'}
+        where last_kudos is (timestamp, channel_id, sender, receiver) or None,
+        config_channels is a list of (channel_id, personality_name,
+        monthly_quota, leaderboard_channel_id, timezone) and outbox is
+        {'pending': int, 'failed': int}.
+        """
+        raise NotImplementedError
+
+    # --- Derived tables ---
+
+    def rebuild_monthly_rollup(self, channel_id: str = None) -> int:
+        """Rebuild the monthly rollup from the raw kudos rows; returns the number of channels rebuilt"""
+        raise NotImplementedError
+
+    def check_monthly_rollup(self, channel_id: str = None):
+        """Compare the monthly rollup against the raw kudos rows; returns the mismatched rows"""
+        raise NotImplementedError
+
+    def rebuild_bot_stats(self) -> int:
+        """Recount the per-channel status counters; returns the number of active channels"""
+        raise NotImplementedError
+
+    def ensure_kudos_partitions(self, months_ahead: int = None) -> int:
+        """Create upcoming monthly kudos partitions; returns how many were created"""
+        raise NotImplementedError
+
+    # --- Announcement outbox ---
+
+    def enqueue_announcement(self, channel_id: str, text: str):
+        """Queue a channel announcement on its own; returns its outbox ID, or None on failure"""
+        raise NotImplementedError
+
+    def claim_announcements(self, limit: int, lease_seconds: float, announcement_ids: list = None):
+        """Claim up to limit due announcements, leasing them for lease_seconds.
+
+        Returns a list of {'id', 'channel_id', 'text', 'attempts'} dicts.
+        """
+        raise NotImplementedError
+
+    def mark_announcement_delivered(self, announcement_id: int):
+        """Mark an announcement delivered, dropping its text"""
+        raise NotImplementedError
+
+    def reschedule_announcement(self, announcement_id: int, delay_seconds: float, error: str):
+        """Schedule another delivery attempt after delay_seconds"""
+        raise NotImplementedError
+
+    def fail_announcement(self, announcement_id: int, error: str):
+        """Give up on an announcement"""
+        raise NotImplementedError
+
+    def purge_announcements(self, older_than_hours: float) -> int:
+        """Delete delivered and failed announcements older than older_than_hours"""
+        raise NotImplementedError
+
+    # --- Channel configs ---
+
+    def _select_channel_config(self, channel_id: str):
+        """Fetch one channel_configs row as a tuple of _CHANNEL_CONFIG_COLUMNS, or None"""
+        raise NotImplementedError
+
+    def _select_channel_configs(self, limit: int):
+        """Fetch up to limit channel_configs rows, most recently updated first, as (channel_id, *_CHANNEL_CONFIG_COLUMNS)"""
+        raise NotImplementedError
+
+    def save_channel_config(self, channel_id: str, personality_name: str = None,
+                           monthly_quota: int = None, leaderboard_channel_id: str = None,
+                           leaderboard_limit: int = None, timezone: str = None):
+        """Save or update channel configuration (None leaves a setting unchanged); returns success"""
+        raise NotImplementedError
+
+    def delete_channel_config(self, channel_id: str):
+        """Delete channel configuration to reset to defaults; returns success"""
+        raise NotImplementedError
+
+    def get_channels_using_leaderboard(self, channel_id: str):
+        """Get channels whose leaderboard override points at the given channel"""
+        raise NotImplementedError
+
+    def get_channel_config(self, channel_id: str):
+        """Get configuration for a specific channel (served from the in-process cache when fresh)"""
+        hit, config, generation = self.config_cache.lookup(channel_id)
+        if hit:
+            return config
+
+        return self._cache_channel_config(channel_id, self._select_channel_config(channel_id), generation)
+
+    def warm_channel_config_cache(self) -> int:
+        """Load every channel config into the cache with a single query"""
+        generation = self.config_cache.generation()
+        return self._cache_channel_configs(self._select_channel_configs(CONFIG_CACHE_SIZE), generation)
+
+    # The cache and config helpers below don't touch the database, so AsyncDatabaseManager shares them
+
+    def _cache_channel_config(self, channel_id: str, row, generation):
+        """Cache a channel_configs row (or its absence) fetched at generation; returns the config dict or None"""
+        # Channels without a config are cached too, so defaults don't cost a query
+        config = dict(zip(self._CHANNEL_CONFIG_COLUMNS, row)) if row else None
+        self.config_cache.store(channel_id, config, generation)
+        return dict(config) if config else None
+
+    def _cache_channel_configs(self, rows, generation) -> int:
+        """Cache (channel_id, *_CHANNEL_CONFIG_COLUMNS) rows fetched at generation; returns how many"""
+        for row in rows:
+            self.config_cache.store(row[0], dict(zip(self._CHANNEL_CONFIG_COLUMNS, tuple(row)[1:])), generation)
+
+        logger.info(f"Channel config cache warmed with {len(rows)} configs")
+        return len(rows)
+
+    def get_config_cache_stats(self):
+        """Get channel config cache hit/miss counters"""
+        return self.config_cache.get_stats()
+
+    def _get_leaderboard_limit(self, channel_id: str, limit: int = None) -> int:
+        """Resolve a leaderboard limit: the one given, the channel's, or the global default"""
+        if limit is not None:
+            return limit
+        return self._config_leaderboard_limit(self.get_channel_config(channel_id))
+
+    def _config_leaderboard_limit(self, config) -> int:
+        """A channel config's leaderboard limit, or the global default"""
+        if config and config.get('leaderboard_limit'):
+            return config['leaderboard_limit']
+        return LEADERBOARD_LIMIT
+
+    def _rebuild_rollup_if_timezone_changed(self, channel_id: str, previous_timezone: str):
+        """Re-bucket a channel's rollup into local months when its timezone changes.
+
+        Runs after the config change has committed, so a failure is logged
+        (fix it with rebuild_rollup.py) rather than reported as a failed save.
+        """
+        try:
+            if self.get_channel_timezone(channel_id) == previous_timezone:
+                return
+            self.rebuild_monthly_rollup(channel_id)
+        except Exception as e:
+            logger.error(f"Failed to rebuild monthly rollup for {channel_id} after timezone change: {e}")
+
+    def get_effective_leaderboard_channel(self, channel_id: str):
+        """Get the effective leaderboard channel for a given channel (handles overrides)"""
+        return self._config_leaderboard_channel(channel_id, self.get_channel_config(channel_id))
+
+    def _config_leaderboard_channel(self, channel_id: str, config):
+        """The leaderboard channel a channel config points at, or the channel itself"""
+        if config and config['leaderboard_channel_id']:
+            return config['leaderboard_channel_id']
+        return channel_id
+
+    # --- Timezones ---
+
+    def get_channel_timezone(self, channel_id: str):
+        """Get the timezone for a channel, falling back to global default"""
+        return self._config_timezone(self.get_channel_config(channel_id))
+
+    def _config_timezone(self, config):
+        """A channel config's timezone, or the global TIMEZONE setting"""
+        if config and config.get('timezone'):
+            return config['timezone']
+        return os.getenv('TIMEZONE', 'UTC')
+
+    def get_timezone_offset(self, timezone_str: str):
+        """Convert timezone string (e.g., 'UTC+5', 'UTC-3') to hours offset"""
+        if timezone_str == 'UTC' or timezone_str == 'UTC+0':
+            return 0
+
+        if timezone_str.startswith('UTC+'):
+            return int(timezone_str[4:])
+        elif timezone_str.startswith('UTC-'):
+            return -int(timezone_str[4:])
+
+        # Default to UTC if format is invalid
+        return 0
+
+    def get_current_month_year_in_timezone(self, channel_id: str):
+        """Get current month and year in the channel's timezone"""
+        return self._local_month_year(self.get_channel_timezone(channel_id))
+
+    def _local_month_year(self, timezone_str: str):
+        """Current month and year in a timezone"""
+        offset_hours = self.get_timezone_offset(timezone_str)
+
+        # Get current UTC time and apply offset
+        utc_now = datetime.now(timezone.utc)
+        local_time = utc_now + timedelta(hours=offset_hours)
+
+        return local_time.month, local_time.year
+
+    def get_current_local_month(self, channel_id: str):
+        """Get the first day of the current month in the channel's timezone (the rollup key)"""
+        month, year = self.get_current_month_year_in_timezone(channel_id)
+        return date(year, month, 1)
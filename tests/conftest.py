@@ -0,0 +1,59 @@
+"""
+Shared fixtures for the Kiitos Krab tests.
+
+Tests that need PostgreSQL run against a throwaway database created on
+TEST_DATABASE_URL's server, migrated first and dropped afterwards; without
+TEST_DATABASE_URL they are skipped:
+  TEST_DATABASE_URL=postgresql://postgres@localhost/postgres python -m pytest -q
+"""
+
+import os
+import sys
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# The query plan tests reuse benchmarks/query_plans.py's statement recorder
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+
+@pytest.fixture(scope="module")
+def postgres_url(monkeypatch_module):
+    """URL of a fresh, migrated PostgreSQL database for this test module"""
+    server_url = os.environ.get("TEST_DATABASE_URL")
+    if not server_url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    import psycopg2
+    from database import DatabaseManager
+    from migrations import migrate
+
+    database = f"kudos_test_{os.getpid()}"
+    conn = psycopg2.connect(server_url)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS {database}")
+        cursor.execute(f"CREATE DATABASE {database}")
+
+    url = urlunsplit(urlsplit(server_url)._replace(path=f"/{database}"))
+    monkeypatch_module.setenv("DATABASE_URL", url)
+    db_manager = DatabaseManager()
+    try:
+        migrate(db_manager)
+    finally:
+        db_manager.close()
+
+    try:
+        yield url
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS {database} WITH (FORCE)")
+        conn.close()
+
+
+@pytest.fixture(scope="module")
+def monkeypatch_module():
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        yield monkeypatch
@@ -0,0 +1,184 @@
+"""
+Statement count of a /kk kudos command.
+
+The handler resolves the channel config once through ChannelContext and
+records every receiver in one batch write transaction. These tests run it
+on both backends and count the statements every connection executes, so a
+formatter or helper quietly going back to the database fails here:
+- SQLite, on a temporary file, through a connection that records them
+- PostgreSQL (DatabaseManager.record_kudos_batch, the production path) on
+  TEST_DATABASE_URL's server, through benchmarks/query_plans.py's recording cursor
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from functools import partial
+
+import pytest
+
+SENDER = "U000001"
+RECEIVERS = ["U000002", "U000003"]
+CHANNEL = "C000001"
+
+
+class CountingConnection(sqlite3.Connection):
+    """sqlite3 connection that records the SQL of every statement it executes"""
+
+    statements = None
+
+    def execute(self, sql, *args):
+        if CountingConnection.statements is not None:
+            CountingConnection.statements.append(" ".join(sql.split()))
+        return super().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        if CountingConnection.statements is not None:
+            CountingConnection.statements.append(" ".join(sql.split()))
+        return super().executemany(sql, *args)
+
+
+@contextmanager
+def sqlite_statements(db_manager):
+    CountingConnection.statements = statements = []
+    try:
+        yield statements
+    finally:
+        CountingConnection.statements = None
+
+
+@contextmanager
+def postgres_statements(db_manager):
+    from query_plans import recording
+
+    with recording(db_manager) as recorded:
+        statements = []
+        yield statements
+    statements.extend(" ".join(sql.split()) for sql in recorded)
+
+
+class Backend:
+    """A storage backend under test: how to open another manager on it, count its statements and spot its write lock"""
+
+    def __init__(self, manager_class, statements, write_lock):
+        self.manager_class = manager_class
+        self.statements = statements
+        self.write_lock = write_lock
+        self.db_manager = manager_class()
+
+    def is_write_lock(self, sql):
+        return sql.startswith(self.write_lock)
+
+
+class FakeClient:
+    def auth_test(self):
+        return {"user_id": "UBOT", "team": "Test", "team_id": "T000001"}
+
+
+class FakeApp:
+    client = FakeClient()
+
+
+class RecordingDispatcher:
+    """Stands in for the announcement dispatcher, whose delivery runs after the handler's own statements"""
+
+    def __init__(self):
+        self.announced = []
+
+    def announce(self, announcement_id):
+        self.announced.append(announcement_id)
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def backend(request, tmp_path, monkeypatch):
+    monkeypatch.setenv("TIMEZONE", "UTC")
+
+    if request.param == "sqlite":
+        monkeypatch.setattr(sqlite3, "connect", partial(sqlite3.connect, factory=CountingConnection))
+        monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'kudos.db'}")
+        from sqlite_database import SQLiteDatabaseManager
+
+        backend = Backend(SQLiteDatabaseManager, sqlite_statements, "BEGIN IMMEDIATE")
+        backend.db_manager.verify_schema()
+    else:
+        monkeypatch.setenv("DATABASE_URL", request.getfixturevalue("postgres_url"))
+        from database import DatabaseManager
+
+        # The advisory lock that serializes the sender's quota check
+        backend = Backend(DatabaseManager, postgres_statements, "SELECT pg_advisory_xact_lock")
+        with backend.db_manager.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("TRUNCATE kudos, kudos_monthly_rollup, bot_stats, announcement_outbox, channel_configs")
+            conn.commit()
+
+    yield backend
+    backend.db_manager.close()
+
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    import handlers.kudos_handler
+    import utils.user_utils
+
+    recording = RecordingDispatcher()
+    monkeypatch.setattr(handlers.kudos_handler, "get_announcement_dispatcher", lambda client: recording)
+    monkeypatch.setattr(utils.user_utils, "_bot_user_id_cache", None)
+    return recording
+
+
+def run_kudos_command(backend, text, channel_id=CHANNEL):
+    """Send /kk text from SENDER and return (statements executed, responses)"""
+    from handlers.kudos_handler import handle_kudos_command
+
+    responses = []
+    command = {"user_id": SENDER, "text": text, "channel_id": channel_id}
+    with backend.statements(backend.db_manager) as statements:
+        handle_kudos_command(command, None, responses.append, FakeApp(), backend.db_manager)
+    return statements, responses
+
+
+def is_config_read(sql):
+    return sql.startswith("SELECT") and "FROM channel_configs" in sql
+
+
+def test_kudos_runs_one_config_read_and_one_batch_write(backend, dispatcher):
+    statements, responses = run_kudos_command(backend, f"<@{RECEIVERS[0]}> <@{RECEIVERS[1]}> thanks for the review")
+
+    assert len(responses) == 1
+    assert len(dispatcher.announced) == 1
+    # ChannelContext.resolve, then one write transaction: write lock, quota read,
+    # kudos rows, rollup upsert, bot_stats upsert and the queued announcement
+    assert len(statements) == 7, "\n".join(statements)
+    assert is_config_read(statements[0])
+    assert backend.is_write_lock(statements[1])
+    assert [sql.split()[0] for sql in statements[2:]] == ["SELECT", "INSERT", "INSERT", "INSERT", "INSERT"]
+    assert sum(is_config_read(sql) for sql in statements) == 1
+
+
+def test_second_kudos_reads_the_config_from_the_cache(backend, dispatcher):
+    run_kudos_command(backend, f"<@{RECEIVERS[0]}> first")
+    statements, _ = run_kudos_command(backend, f"<@{RECEIVERS[1]}> second")
+
+    assert len(statements) == 6, "\n".join(statements)
+    assert not any(is_config_read(sql) for sql in statements)
+    assert backend.is_write_lock(statements[0])
+
+
+def test_leaderboard_override_adds_one_config_read(backend, dispatcher):
+    # Saved by another worker, so this one's config cache is still cold
+    other_worker = backend.manager_class()
+    assert other_worker.save_channel_config(CHANNEL, leaderboard_channel_id="C000002")
+    other_worker.close()
+
+    statements, _ = run_kudos_command(backend, f"<@{RECEIVERS[0]}> <@{RECEIVERS[1]}> thanks")
+
+    assert len(statements) == 8, "\n".join(statements)
+    assert [is_config_read(sql) for sql in statements[:2]] == [True, True]
+    assert sum(backend.is_write_lock(sql) for sql in statements) == 1
+
+
+def test_rejected_kudos_still_reads_the_config_once(backend, dispatcher):
+    statements, responses = run_kudos_command(backend, f"<@{SENDER}> me, myself and I")
+
+    assert len(responses) == 1
+    assert dispatcher.announced == []
+    assert len(statements) == 1 and is_config_read(statements[0])
@@ -0,0 +1,97 @@
+"""
+Query plan checks for the monthly queries.
+
+Monthly counts, leaderboards and stats read kudos_monthly_rollup by its
+(channel_id, local_month, user_id) key, and rebuilding a channel's rollup
+reads its raw kudos rows through the (channel_id, timestamp) index. Every
+check EXPLAINs the statements DatabaseManager actually sends (recorded with
+benchmarks/query_plans.py's helper) on a seeded database, so a regression to
+a sequential scan fails here.
+"""
+
+import re
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from query_plans import explain_statements, recording
+
+CHANNELS = 40
+USERS = 400
+ROWS = 60000
+
+SEED_SQL = """
+INSERT INTO kudos (sender, receiver, channel_id, timestamp)
+SELECT 'U' || lpad(mod(n, %(users)s)::text, 6, '0'),
+       'U' || lpad(mod(n * 7 + 3, %(users)s)::text, 6, '0'),
+       'C' || lpad(mod(n, %(channels)s)::text, 6, '0'),
+       %(start)s + mod(n, 5400) * INTERVAL '1 minute' * 24
+FROM generate_series(1, %(rows)s) n
+"""
+
+# The channel's own (channel_id, timestamp) index, on kudos or on one of its partitions
+CHANNEL_INDEX = r"^(idx_kudos_channel_timestamp|kudos_(default|y\d{4}m\d{2})_channel_id_timestamp_idx)$"
+
+
+@pytest.fixture(scope="module")
+def db_manager(postgres_url):
+    from database import DatabaseManager
+
+    manager = DatabaseManager()
+    month = date.today().replace(day=1)
+    start = datetime.combine(month - timedelta(days=62), datetime.min.time())
+    with manager.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(SEED_SQL, {"users": USERS, "channels": CHANNELS, "rows": ROWS, "start": start})
+        conn.commit()
+    manager.rebuild_monthly_rollup()
+    with manager.get_connection() as conn:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("ANALYZE kudos")
+            cursor.execute("ANALYZE kudos_monthly_rollup")
+        conn.autocommit = False
+    yield manager
+    manager.close()
+
+
+def explain(db_manager, statements):
+    """EXPLAIN ANALYZE recorded statements in a rolled-back transaction; returns (indexes used, large tables seq scanned)"""
+    with db_manager.get_connection() as conn:
+        _, _, indexes, seq_scans, _ = explain_statements(conn, statements, repeat=1)
+    return indexes, seq_scans
+
+
+def assert_uses_index(statements, db_manager, index_pattern):
+    indexes, seq_scans = explain(db_manager, statements)
+    # Empty future partitions may be scanned; anything holding rows may not
+    assert not seq_scans, f"sequential scan of {', '.join(sorted(seq_scans))}"
+    assert any(re.search(index_pattern, index) for index in indexes), \
+        f"expected an index matching {index_pattern}, got {sorted(indexes)}"
+
+
+@pytest.mark.parametrize("name, call", [
+    ("get_monthly_kudos_count", lambda m, month: m.get_monthly_kudos_count("U000001", month.month, month.year, "C000001")),
+    ("get_monthly_kudos_received_count", lambda m, month: m.get_monthly_kudos_received_count("U000001", month.month, month.year, "C000001")),
+    ("get_monthly_leaderboard", lambda m, month: m.get_monthly_leaderboard(month.month, month.year, "C000001", limit=10)),
+    ("get_complete_monthly_leaderboard", lambda m, month: m.get_complete_monthly_leaderboard(month.month, month.year, "C000001")),
+    ("get_user_stats", lambda m, month: m.get_user_stats("U000001", "C000001", local_month=month)),
+])
+def test_monthly_queries_use_the_rollup_key(db_manager, name, call):
+    month = date.today().replace(day=1) - timedelta(days=1)
+    with recording(db_manager) as statements:
+        call(db_manager, month.replace(day=1))
+    rollup_reads = [sql for sql in statements if sql.lstrip().upper().startswith("SELECT") and "kudos_monthly_rollup" in sql]
+    assert rollup_reads, f"{name} no longer reads kudos_monthly_rollup"
+
+    for sql in rollup_reads:
+        assert_uses_index([sql], db_manager, r"^kudos_monthly_rollup_pkey$")
+
+
+def test_rollup_rebuild_reads_the_channel_index(db_manager):
+    with recording(db_manager) as statements:
+        db_manager.rebuild_monthly_rollup("C000001")
+    assert sum(sql.lstrip().upper().startswith("INSERT") for sql in statements) == 1, statements
+
+    # Replayed in order (lock, delete, insert), as the benchmark does
+    assert_uses_index(statements, db_manager, CHANNEL_INDEX)
@@ -0,0 +1,105 @@
+"""
+Client-side Slack rate limiting (utils/slack_client.py).
+
+Many threads hammer one token bucket on a frozen clock, so the number of
+calls let through, their waits and the calls turned away are exact.
+"""
+
+import threading
+
+import pytest
+from slack_sdk.errors import SlackApiError
+
+from utils import slack_client
+from utils.slack_client import SlackRateLimiter, get_retry_after
+
+METHOD = "users.info"  # tier 4: 100 a minute, bursts of 20
+RATE = 100 / 60
+BURST = 20
+
+
+class FrozenClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FrozenClock()
+    monkeypatch.setattr(slack_client.time, "monotonic", clock)
+    return clock
+
+
+def hammer(limiter, api_method, calls, threads=16):
+    """Acquire from many threads at once; returns (waits granted, errors raised)"""
+    waits, errors = [], []
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def worker(count):
+        start.wait()
+        for _ in range(count):
+            try:
+                wait = limiter.acquire(api_method)
+            except SlackApiError as e:
+                with lock:
+                    errors.append(e)
+            else:
+                with lock:
+                    waits.append(wait)
+
+    workers = [threading.Thread(target=worker, args=(calls // threads,)) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return waits, errors
+
+
+def test_hammered_bucket_grants_burst_plus_max_wait_and_turns_the_rest_away(clock):
+    limiter = SlackRateLimiter(max_wait=2.9)
+
+    waits, errors = hammer(limiter, METHOD, calls=1600)
+
+    # The burst goes straight through, then one slot every 1 / RATE seconds up to max_wait
+    queued = int(2.9 * RATE)
+    assert len(waits) == BURST + queued
+    assert sorted(waits)[BURST:] == pytest.approx([(n + 1) / RATE for n in range(queued)])
+    assert max(waits) <= 2.9
+    assert len(errors) == 1600 - BURST - queued
+    assert all(e.response.status_code == 429 and get_retry_after(e) >= 1 for e in errors)
+
+    stats = limiter.get_stats()
+    assert stats['calls'] == len(waits) and stats['rejected'] == len(errors)
+    assert stats['waits'] == queued
+
+
+def test_turned_away_calls_take_no_tokens(clock):
+    limiter = SlackRateLimiter(max_wait=2.9)
+    hammer(limiter, METHOD, calls=1600)
+
+    # Only the granted calls are in debt, so one max_wait later the next call goes straight through
+    clock.now += 2.9 + 1 / RATE
+    assert limiter.acquire(METHOD) == pytest.approx(0.0)
+
+
+def test_views_open_never_waits_past_its_trigger_id(clock):
+    limiter = SlackRateLimiter(max_wait=10)
+
+    waits, errors = hammer(limiter, "views.open", calls=64)
+
+    assert max(waits) <= slack_client.METHOD_MAX_WAIT["views.open"]
+    assert len(waits) == BURST + int(slack_client.METHOD_MAX_WAIT["views.open"] * RATE)
+    assert len(errors) == 64 - len(waits)
+
+
+def test_retry_after_beyond_max_wait_fails_fast(clock):
+    limiter = SlackRateLimiter(max_wait=5)
+    limiter.penalize(METHOD, None, retry_after=30)
+
+    with pytest.raises(SlackApiError) as excinfo:
+        limiter.acquire(METHOD)
+    assert get_retry_after(excinfo.value) >= 30
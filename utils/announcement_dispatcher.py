@@ -0,0 +1,215 @@
+"""
+Background delivery of queued channel announcements for Kiitos Krab.
+
+Announcements are written to announcement_outbox in the same transaction as
+the kudos they announce, so a failed chat.postMessage no longer loses them.
+The dispatcher claims due rows, posts them with bounded concurrency and
+marks them delivered; failures are retried with exponential backoff, and a
+Slack rate limit pauses the dispatcher for the Retry-After it was given.
+
+Long-running servers run it on a background thread (see prepare_server).
+On Lambda, the lazy listener delivers its own announcement and a scheduled
+invocation drains retries. It can also run on its own:
+  python -m utils.announcement_dispatcher
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from slack_sdk.errors import SlackApiError
+from utils.slack_client import get_retry_after
+from config.settings import (
+    OUTBOX_CONCURRENCY,
+    OUTBOX_POLL_INTERVAL,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_LEASE_SECONDS,
+    OUTBOX_RETENTION_HOURS
+)
+
+logger = logging.getLogger(__name__)
+
+# Slack errors that retrying won't fix
+PERMANENT_ERRORS = {
+    "channel_not_found", "not_in_channel", "is_archived", "msg_too_long",
+    "no_text", "restricted_action", "invalid_blocks", "too_many_attachments"
+}
+
+RETRY_BASE_DELAY = 5  # seconds; doubles with every failed attempt
+RETRY_MAX_DELAY = 900
+PURGE_INTERVAL = 3600
+
+
+class AnnouncementDispatcher:
+    """Drains announcement_outbox into Slack with bounded concurrency and retries"""
+
+    def __init__(self, db_manager, client, concurrency=OUTBOX_CONCURRENCY, poll_interval=OUTBOX_POLL_INTERVAL,
+                 max_attempts=OUTBOX_MAX_ATTEMPTS, lease_seconds=OUTBOX_LEASE_SECONDS):
+        self.db_manager = db_manager
+        self.client = client
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="announce")
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._paused_until = 0.0  # monotonic time a Slack rate limit lifts
+        self._last_purge = 0.0
+
+        # deliver() runs on the executor's threads, so the counters are updated under a lock
+        self._stats_lock = threading.Lock()
+        self.stats = {'delivered': 0, 'retried': 0, 'failed': 0, 'rate_limited': 0}
+
+    def deliver(self, announcement):
+        """Post one claimed announcement and record the outcome; returns True if it was delivered"""
+        announcement_id = announcement['id']
+        try:
+            self.client.chat_postMessage(channel=announcement['channel_id'], text=announcement['text'], unfurl_links=False)
+        except SlackApiError as e:
+            error = e.response.get("error", "unknown_error") if e.response is not None else str(e)
+            retry_after = get_retry_after(e)
+            if retry_after is not None:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                self._record('rate_limited')
+                logger.warning(f"Rate limited posting announcement {announcement_id}, retrying in {retry_after:.0f}s")
+                self.db_manager.reschedule_announcement(announcement_id, retry_after, "ratelimited")
+                return False
+            self._retry_or_fail(announcement, error, permanent=error in PERMANENT_ERRORS)
+            return False
+        except Exception as e:
+            self._retry_or_fail(announcement, str(e))
+            return False
+
+        self.db_manager.mark_announcement_delivered(announcement_id)
+        self._record('delivered')
+        return True
+
+    def _record(self, stat):
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    def get_stats(self):
+        """Get the delivery counters for this process"""
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def _retry_or_fail(self, announcement, error, permanent=False):
+        announcement_id = announcement['id']
+        if permanent or announcement['attempts'] >= self.max_attempts:
+            logger.error(f"Giving up on announcement {announcement_id} to {announcement['channel_id']} after {announcement['attempts']} attempt(s): {error}")
+            self.db_manager.fail_announcement(announcement_id, error)
+            self._record('failed')
+            return
+        delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (announcement['attempts'] - 1))
+        logger.warning(f"Failed to post announcement {announcement_id} (attempt {announcement['attempts']}), retrying in {delay}s: {error}")
+        self.db_manager.reschedule_announcement(announcement_id, delay, error)
+        self._record('retried')
+
+    def drain_once(self, announcement_ids=None):
+        """Deliver every announcement that is due (or just announcement_ids); returns the number delivered"""
+        delivered = 0
+        while time.monotonic() >= self._paused_until and not self._stopping.is_set():
+            batch = self.db_manager.claim_announcements(self.concurrency, self.lease_seconds, announcement_ids)
+            if not batch:
+                break
+            delivered += sum(self._executor.map(self.deliver, batch))
+            if len(batch) < self.concurrency:
+                break
+        return delivered
+
+    def announce(self, announcement_id):
+        """Deliver a newly queued announcement as soon as possible.
+
+        Wakes the background thread if it is running; otherwise (Lambda)
+        tries it right away on the caller's thread, leaving retries to the
+        next drain.
+        """
+        if announcement_id is None:
+            return
+        if self.is_running():
+            self._wakeup.set()
+            return
+        try:
+            self.drain_once([announcement_id])
+        except Exception as e:
+            logger.error(f"Failed to deliver announcement {announcement_id}: {e}")
+
+    def purge(self):
+        """Delete delivered and failed rows older than OUTBOX_RETENTION_HOURS"""
+        deleted = self.db_manager.purge_announcements(OUTBOX_RETENTION_HOURS)
+        if deleted:
+            logger.info(f"Purged {deleted} old announcement(s) from the outbox")
+        return deleted
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.drain_once()
+                if time.monotonic() - self._last_purge >= PURGE_INTERVAL:
+                    self._last_purge = time.monotonic()
+                    self.purge()
+            except Exception as e:
+                logger.error(f"Announcement dispatcher error: {e}")
+            wait = max(self.poll_interval, self._paused_until - time.monotonic())
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start draining the outbox on a background daemon thread"""
+        if self.is_running():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="announcement-dispatcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Announcement dispatcher started ({self.concurrency} concurrent posts)")
+
+    def stop(self, timeout=10.0):
+        """Stop the background thread, letting in-flight posts finish"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._executor.shutdown(wait=True)
+
+
+# Global dispatcher instance
+announcement_dispatcher = None
+
+
+def get_announcement_dispatcher(client=None, db_manager=None):
+    """Get the global announcement dispatcher, creating it on first use"""
+    global announcement_dispatcher
+    if announcement_dispatcher is None:
+        if db_manager is None:
+            from database import get_db_manager
+            db_manager = get_db_manager()
+        announcement_dispatcher = AnnouncementDispatcher(db_manager, client)
+    return announcement_dispatcher
+
+
+if __name__ == "__main__":
+    import os
+    from dotenv import load_dotenv
+    from utils.slack_client import RateLimitedClient
+
+    load_dotenv()
+    logging.basicConfig(
+        level=getattr(logging, os.environ.get("LOG_LEVEL", "INFO").upper(), logging.INFO),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    dispatcher = get_announcement_dispatcher(RateLimitedClient(token=os.environ.get("SLACK_BOT_TOKEN")))
+    print(f"🦀 Draining the announcement outbox every {dispatcher.poll_interval:.0f}s (Ctrl+C to stop)...")
+    dispatcher.start()
+    try:
+        while dispatcher.is_running():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        dispatcher.stop()
+        dispatcher.db_manager.close()
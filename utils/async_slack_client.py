@@ -0,0 +1,84 @@
+"""
+asyncio counterpart of utils.slack_client.RateLimitedClient for the AsyncApp stack.
+
+Takes its tokens from the same process-wide SlackRateLimiter as the threaded
+client (the async bot also runs the threaded announcement dispatcher), but
+waits and coalesces with asyncio instead of blocking threads.
+"""
+
+import asyncio
+import time
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.async_client import AsyncWebClient
+from config.settings import SLACK_API_BASE_URL, SLACK_MAX_RETRIES
+from utils.metrics import observe_slack_call
+from utils.slack_client import get_rate_limiter, get_retry_after, get_error_code, get_call_channel, get_coalesce_key
+
+
+class AsyncRateLimitedClient(AsyncWebClient):
+    """AsyncWebClient that waits for rate limit tokens, retries 429s and coalesces identical reads"""
+
+    def __init__(self, *args, rate_limiter=None, max_retries=SLACK_MAX_RETRIES, **kwargs):
+        kwargs.setdefault("base_url", SLACK_API_BASE_URL)
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.max_retries = max_retries
+        self._in_flight = {}  # coalesce key -> asyncio.Future
+
+    def __deepcopy__(self, memo):
+        # Bolt deep-copies the request context for lazy listeners; they should share this client and its limiter
+        return self
+
+    async def api_call(self, api_method, **kwargs):
+        key = get_coalesce_key(api_method, kwargs)
+        if key is None:
+            return await self._call_with_retries(api_method, kwargs)
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.rate_limiter.record('coalesced')
+            return await asyncio.shield(in_flight)
+
+        future = self._in_flight[key] = asyncio.get_running_loop().create_future()
+        try:
+            response = await self._call_with_retries(api_method, kwargs)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark it retrieved so a failure nobody shared isn't logged as never awaited
+            future.exception()
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            if not future.done():
+                future.cancel()
+            self._in_flight.pop(key, None)
+
+    async def _call_with_retries(self, api_method, kwargs):
+        channel = get_call_channel(kwargs)
+        attempt = 0
+        while True:
+            wait = self.rate_limiter.acquire(api_method, channel)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            start = time.perf_counter()
+            try:
+                response = await super().api_call(api_method, **kwargs)
+            except SlackApiError as e:
+                observe_slack_call(api_method, time.perf_counter() - start, get_error_code(e))
+                retry_after = get_retry_after(e)
+                if retry_after is None:
+                    raise
+                self.rate_limiter.penalize(api_method, channel, retry_after)
+                if attempt >= self.max_retries or retry_after > self.rate_limiter.max_wait:
+                    raise
+                self.rate_limiter.record('retries')
+                attempt += 1
+            except Exception as e:
+                # Timeouts and connection errors never reached Slack's error codes
+                observe_slack_call(api_method, time.perf_counter() - start, type(e).__name__)
+                raise
+            else:
+                observe_slack_call(api_method, time.perf_counter() - start, "ok")
+                return response
@@ -0,0 +1,197 @@
+"""
+In-process name -> ID index of public channels for Kiitos Krab.
+
+`/kk leaderboard #name` used to page through conversations.list on every
+command that Slack didn't escape. The index is built a page at a time on a
+background thread, rebuilt every CHANNEL_INDEX_TTL seconds, and kept current
+in between by channel_created / channel_rename / channel_deleted events, so
+lookups are dictionary reads. Until the first build finishes, a lookup that
+misses pages onward at most CHANNEL_INDEX_PAGES_PER_LOOKUP pages (this is
+also how the index warms up on Lambda, where there is no background thread).
+"""
+
+import logging
+import threading
+import time
+from config.settings import CHANNEL_INDEX_TTL, CHANNEL_INDEX_PAGES_PER_LOOKUP
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000
+
+
+class ChannelIndexNotReady(Exception):
+    """Raised when a name isn't indexed yet and the index hasn't seen every channel"""
+
+
+class ChannelIndex:
+    """Thread-safe name -> ID index of public channels, built incrementally from conversations.list"""
+
+    def __init__(self, client, ttl=CHANNEL_INDEX_TTL, pages_per_lookup=CHANNEL_INDEX_PAGES_PER_LOOKUP):
+        self.client = client
+        self.ttl = ttl
+        self.pages_per_lookup = pages_per_lookup
+
+        self._names = {}  # name -> channel_id
+        self._ids = {}  # channel_id -> name
+        self._lock = threading.Lock()  # guards the maps
+
+        # Scan state; only the holder of _scan_lock pages through conversations.list
+        self._scan_lock = threading.Lock()
+        self._cursor = None
+        self._scanning = False
+        self._seen = set()  # channel IDs listed (or announced by events) during the current scan
+        self._complete = False  # every channel has been listed at least once
+        self._scanned_at = 0.0  # monotonic time the last full scan finished
+
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+        self.stats = {'hits': 0, 'misses': 0, 'pages': 0, 'events': 0}
+
+    def is_stale(self):
+        return not self._complete or time.monotonic() - self._scanned_at >= self.ttl
+
+    def lookup(self, name, max_pages=None):
+        """Get the ID of the public channel called name, or None if there isn't one.
+
+        Hits never call Slack. A miss on an index that hasn't finished its
+        first scan (or is due a rescan) pages onward up to max_pages pages
+        (default CHANNEL_INDEX_PAGES_PER_LOOKUP), then raises
+        ChannelIndexNotReady if the name still hasn't turned up.
+        """
+        name = name.lstrip('#').lower()
+        with self._lock:
+            channel_id = self._names.get(name)
+            self.stats['hits' if channel_id else 'misses'] += 1
+        if channel_id:
+            return channel_id
+
+        if not self.is_stale():
+            return None
+
+        max_pages = self.pages_per_lookup if max_pages is None else max_pages
+        for _ in range(max_pages):
+            if not self.scan_page() or name in self._names:
+                break
+        with self._lock:
+            channel_id = self._names.get(name)
+        if channel_id or self._complete:
+            return channel_id
+        raise ChannelIndexNotReady("Still indexing this workspace's channels - try again in a minute, or pick the channel from Slack's # autocomplete")
+
+    def scan_page(self):
+        """Index the next page of conversations.list; returns False once the current scan is done"""
+        with self._scan_lock:
+            if not self._scanning:
+                if not self.is_stale():
+                    return False
+                self._scanning = True
+                self._cursor = None
+                with self._lock:
+                    self._seen = set()
+
+            response = self.client.conversations_list(types="public_channel", limit=PAGE_SIZE, cursor=self._cursor)
+            if not response.get("ok"):
+                error = response.get("error", "")
+                if error == "missing_scope":
+                    needed = response.get("needed", "channels:read")
+                    raise Exception(f"Bot is missing required scope: {needed}. Please add this scope in your Slack app settings (OAuth & Permissions > Scopes > Bot Token Scopes).")
+                raise Exception(f"Slack API error: {error}")
+
+            with self._lock:
+                for channel in response.get("channels", []):
+                    self._set(channel["id"], channel["name"])
+                    self._seen.add(channel["id"])
+                self.stats['pages'] += 1
+
+            self._cursor = response.get("response_metadata", {}).get("next_cursor") or None
+            if self._cursor is None:
+                self._finish_scan()
+                return False
+            return True
+
+    def _finish_scan(self):
+        with self._lock:
+            # Anything not listed this time was deleted, or renamed while no event reached us
+            for channel_id in set(self._ids) - self._seen:
+                self._remove(channel_id)
+            self._complete = True
+            self._scanned_at = time.monotonic()
+            self._scanning = False
+            logger.info(f"Channel index rebuilt: {len(self._names)} public channels")
+
+    def _set(self, channel_id, name):
+        name = name.lower()
+        previous = self._ids.get(channel_id)
+        if previous and self._names.get(previous) == channel_id:
+            del self._names[previous]
+        self._ids[channel_id] = name
+        self._names[name] = channel_id
+
+    def _remove(self, channel_id):
+        name = self._ids.pop(channel_id, None)
+        if name and self._names.get(name) == channel_id:
+            del self._names[name]
+
+    def set_channel(self, channel_id, name):
+        """Record a created or renamed channel (from Slack events)"""
+        with self._lock:
+            self._set(channel_id, name)
+            self._seen.add(channel_id)
+            self.stats['events'] += 1
+
+    def remove_channel(self, channel_id):
+        """Forget a deleted channel (from Slack events)"""
+        with self._lock:
+            self._remove(channel_id)
+            self._seen.discard(channel_id)
+            self.stats['events'] += 1
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, size=len(self._names), complete=self._complete)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                while not self._stopping.is_set() and self.scan_page():
+                    pass
+            except Exception as e:
+                logger.error(f"Failed to refresh channel index: {e}")
+                self._stopping.wait(60)
+                continue
+            wait = self.ttl - (time.monotonic() - self._scanned_at) if self._complete else 60
+            self._wakeup.wait(max(1.0, wait))
+            self._wakeup.clear()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Build the index, and rebuild it every ttl seconds, on a background daemon thread"""
+        if self.is_running():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="channel-index", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+# Global channel index instance
+channel_index = None
+
+
+def get_channel_index(client=None):
+    """Get the global channel index, creating it on first use"""
+    global channel_index
+    if channel_index is None:
+        channel_index = ChannelIndex(client)
+    return channel_index
@@ -67,3 +67,9 @@ def get_target_date(month, year):
         return month, target_year
     
     return month, year
+
+
+def add_months(month_start, months):
+    """Get the first day of the month `months` after (or before, if negative) month_start"""
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
@@ -1,26 +1,33 @@
 from datetime import datetime
-from config.personalities import load_personality, load_personality_for_channel
-import random
+from config.personalities import load_personality, load_personality_for_channel, choose_variant
 
 
-def get_shared_leaderboard_channels(channel_id, db_manager):
+def get_personality(channel_id=None, db_manager=None, context=None):
+    """Get the personality for a message, preferring an already resolved ChannelContext"""
+    if context:
+        return context.personality
+    if channel_id and db_manager:
+        return load_personality_for_channel(channel_id, db_manager)
+    return load_personality()
+
+
+def get_shared_leaderboard_channels(channel_id, db_manager, context=None):
     """Get all channels that share the same leaderboard as the given channel"""
     if not db_manager:
         return [channel_id]
     
     # Get the effective leaderboard channel for the given channel
-    effective_channel = db_manager.get_effective_leaderboard_channel(channel_id)
+    if context:
+        effective_channel = context.effective_channel_id
+    else:
+        effective_channel = db_manager.get_effective_leaderboard_channel(channel_id)
     
     # Find all channels that use this same effective leaderboard channel
     shared_channels = [effective_channel]  # Start with the source channel
     
     # Get all channel configs to find channels that inherit from this one
     try:
-        with db_manager.get_connection() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT channel_id FROM channel_configs WHERE leaderboard_channel_id = %s", (effective_channel,))
-                inherited_channels = [row[0] for row in cursor.fetchall()]
-                shared_channels.extend(inherited_channels)
+        shared_channels.extend(db_manager.get_channels_using_leaderboard(effective_channel))
     except Exception as e:
         # If there's an error, just return the original channel
         return [channel_id]
@@ -29,16 +36,14 @@ def get_shared_leaderboard_channels(channel_id, db_manager):
     return list(set(shared_channels))
 
 
-def format_leaderboard(leaderboard_data, month, year, channel_id=None, db_manager=None):
+def format_leaderboard(leaderboard_data, month, year, channel_id=None, db_manager=None, context=None, shared_channels=None):
     """Format leaderboard data for Slack message"""
-    if channel_id and db_manager:
-        personality = load_personality_for_channel(channel_id, db_manager)
-    else:
-        personality = load_personality()
+    personality = get_personality(channel_id, db_manager, context)
     month_name = datetime(year, month, 1).strftime("%B %Y")
     
-    # Get channels that share this leaderboard
-    shared_channels = get_shared_leaderboard_channels(channel_id, db_manager)
+    # Get channels that share this leaderboard (unless the caller already looked them up)
+    if shared_channels is None:
+        shared_channels = get_shared_leaderboard_channels(channel_id, db_manager, context)
     
     # Format channel information for the title
     if len(shared_channels) == 1:
@@ -83,56 +88,34 @@ def format_leaderboard(leaderboard_data, month, year, channel_id=None, db_manage
     return f"*{title} {channel_info}*\n\n{receivers_text}{senders_text}\n\n*{footer}*"
 
 
-def format_kudos_announcement(user_id, successful_kudos, message, channel_id=None, db_manager=None):
+def format_kudos_announcement(user_id, successful_kudos, message, channel_id=None, db_manager=None, context=None):
     """Format kudos announcement message"""
-    if channel_id and db_manager:
-        personality = load_personality_for_channel(channel_id, db_manager)
-    else:
-        personality = load_personality()
+    personality = get_personality(channel_id, db_manager, context)
     
     if len(successful_kudos) == 1:
-        template = personality['success']['announcement_single']
-        # Handle both single strings and arrays
-        if isinstance(template, list):
-            template = random.choice(template)
+        template = choose_variant(personality['success']['announcement_single'])
         return template.format(user_id=user_id, receiver=successful_kudos[0], message=message)
     else:
         user_mentions = " ".join([f"<@{user}>" for user in successful_kudos])
-        template = personality['success']['announcement_multiple']
-        # Handle both single strings and arrays
-        if isinstance(template, list):
-            template = random.choice(template)
+        template = choose_variant(personality['success']['announcement_multiple'])
         return template.format(user_id=user_id, receivers=user_mentions, message=message)
 
 
-def format_kudos_confirmation(monthly_count, kudos_needed, successful_count, monthly_quota, channel_id=None, db_manager=None):
+def format_kudos_confirmation(successful_count, remaining, channel_id=None, db_manager=None, context=None):
     """Format kudos confirmation message"""
-    if channel_id and db_manager:
-        personality = load_personality_for_channel(channel_id, db_manager)
-    else:
-        personality = load_personality()
-    remaining = monthly_quota - monthly_count - successful_count
+    personality = get_personality(channel_id, db_manager, context)
     
     if successful_count == 1:
-        template = personality['success']['kudos_single']
-        # Handle both single strings and arrays
-        if isinstance(template, list):
-            template = random.choice(template)
+        template = choose_variant(personality['success']['kudos_single'])
         return template.format(remaining=remaining)
     else:
-        template = personality['success']['kudos_multiple']
-        # Handle both single strings and arrays
-        if isinstance(template, list):
-            template = random.choice(template)
+        template = choose_variant(personality['success']['kudos_multiple'])
         return template.format(count=successful_count, remaining=remaining)
 
 
-def format_stats_message(user_id, monthly_sent, monthly_received, monthly_quota, total_sent, total_received, channel_id=None, db_manager=None):
+def format_stats_message(user_id, monthly_sent, monthly_received, monthly_quota, total_sent, total_received, channel_id=None, db_manager=None, context=None):
     """Format user stats message"""
-    if channel_id and db_manager:
-        personality = load_personality_for_channel(channel_id, db_manager)
-    else:
-        personality = load_personality()
+    personality = get_personality(channel_id, db_manager, context)
     
     return f"""{personality['stats']['title']}
 
@@ -148,20 +131,14 @@ def format_stats_message(user_id, monthly_sent, monthly_received, monthly_quota,
 *{personality['stats']['footer']}*"""
 
 
-def format_error_message(error_type, channel_id=None, db_manager=None, **kwargs):
+def format_error_message(error_type, channel_id=None, db_manager=None, context=None, **kwargs):
     """Format error messages"""
-    if channel_id and db_manager:
-        personality = load_personality_for_channel(channel_id, db_manager)
-    else:
-        personality = load_personality()
+    personality = get_personality(channel_id, db_manager, context)
     error_messages = personality['errors']
     
     if error_type in error_messages:
-        template = error_messages[error_type]
-        # Handle both single strings and arrays
-        if isinstance(template, list):
-            template = random.choice(template)
+        template = choose_variant(error_messages[error_type])
         return template.format(**kwargs)
     
     # Fallback to a generic error message from personality
-    return personality['errors']['generic_error']
+    return choose_variant(personality['errors']['generic_error'])
@@ -0,0 +1,483 @@
+"""
+In-process metrics for Kiitos Krab, in the Prometheus text format.
+
+Handlers, DatabaseManager methods and the Slack clients (threaded and asyncio) record latency
+histograms (and query row counts and Slack error codes) into a per-process
+registry; pool, cache and rate limiter counters are read from their own
+get_stats() when metrics are collected, so the hot paths only pay for a lock
+and a few additions.
+
+Containers serve everything on GET /metrics (wsgi.py, or async_kudos_bot.py's web app). Each gunicorn worker
+also writes a snapshot to METRICS_DIR every METRICS_SNAPSHOT_INTERVAL
+seconds, and whichever worker answers a scrape adds the other workers'
+snapshots to its own live numbers. On Lambda nothing can scrape a frozen
+container, so each invocation's metrics are flushed as one JSON log line.
+"""
+
+import bisect
+import contextvars
+import functools
+import glob
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from config.settings import METRICS_ENABLED, METRICS_DIR, METRICS_SNAPSHOT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "kudos_command_duration_seconds": ("histogram", "Time to handle a /kk subcommand, by phase (ack or lazy process)", LATENCY_BUCKETS),
+    "kudos_db_query_duration_seconds": ("histogram", "Time spent in a DatabaseManager method", LATENCY_BUCKETS),
+    "kudos_db_query_rows": ("histogram", "Rows returned or written by a DatabaseManager method", ROW_BUCKETS),
+    "kudos_db_query_errors_total": ("counter", "DatabaseManager methods whose query failed", None),
+    "kudos_slack_api_duration_seconds": ("histogram", "Slack Web API request time, per attempt", LATENCY_BUCKETS),
+    "kudos_slack_api_requests_total": ("counter", "Slack Web API requests by result ('ok' or Slack's error code)", None),
+
+    # Read from get_stats() at collection time
+    "kudos_db_pool_connections": ("gauge", "Open database connections by state", None),
+    "kudos_db_pool_max_connections": ("gauge", "Database connection limit", None),
+    "kudos_db_pool_utilization": ("gauge", "Share of the connection limit in use", None),
+    "kudos_db_pool_checkouts_total": ("counter", "Connections checked out of the pool", None),
+    "kudos_db_pool_waits_total": ("counter", "Checkouts that had to wait for a free connection", None),
+    "kudos_db_pool_timeouts_total": ("counter", "Checkouts that gave up waiting", None),
+    "kudos_db_pool_reconnects_total": ("counter", "Dead or expired connections replaced on checkout", None),
+    "kudos_db_replica_healthy": ("gauge", "1 while reads go to the read replica", None),
+    "kudos_db_replica_lag_seconds": ("gauge", "Read replica replay lag at the last check", None),
+    "kudos_db_replica_reads_total": ("counter", "Read-only queries by where they were sent", None),
+    "kudos_cache_requests_total": ("counter", "Cache lookups by result", None),
+    "kudos_cache_hit_ratio": ("gauge", "Share of cache lookups that hit", None),
+    "kudos_cache_entries": ("gauge", "Entries in the cache", None),
+    "kudos_slack_rate_limit_waits_total": ("counter", "Slack calls that waited for a client-side rate limit token", None),
+    "kudos_slack_rate_limit_wait_seconds_total": ("counter", "Time spent waiting for client-side rate limit tokens", None),
+    "kudos_slack_rate_limited_total": ("counter", "429 responses from Slack", None),
+    "kudos_slack_retries_total": ("counter", "Slack calls retried after a 429", None),
+    "kudos_slack_coalesced_total": ("counter", "Slack reads answered by an identical in-flight call", None)
+}
+
+# Gauges are added up across workers, except these
+GAUGE_AGGREGATION = {
+    "kudos_db_replica_healthy": min,
+    "kudos_db_replica_lag_seconds": max
+}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms recorded by this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [count per bucket..., +Inf count, sum]
+
+    def inc(self, name, amount=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name][2]
+        index = bisect.bisect_left(buckets, value)
+        key = _key(name, labels)
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self, reset=False):
+        """Get {'counters': [...], 'histograms': [...]} as JSON-friendly [name, labels, value] rows"""
+        with self._lock:
+            counters = [[name, dict(labels), value] for (name, labels), value in self._counters.items()]
+            histograms = [[name, dict(labels), list(series)] for (name, labels), series in self._histograms.items()]
+            if reset:
+                self._counters = {}
+                self._histograms = {}
+        return {'counters': counters, 'histograms': histograms}
+
+
+# Global metrics registry for this process
+metrics_registry = None
+
+
+def get_metrics():
+    """Get the process-wide metrics registry"""
+    global metrics_registry
+    if metrics_registry is None:
+        metrics_registry = MetricsRegistry()
+    return metrics_registry
+
+
+# --- Recording ---
+
+@contextmanager
+def time_command(command, phase):
+    """Time one phase of a /kk subcommand"""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        get_metrics().observe("kudos_command_duration_seconds", time.perf_counter() - start,
+                              command=command, phase=phase, outcome=outcome)
+
+
+class _QueryState:
+    __slots__ = ('rows', 'failed')
+
+    def __init__(self):
+        self.rows = 0
+        self.failed = False
+
+
+# The DatabaseManager method running in this thread (or asyncio task), for row counts and errors
+_current_query = contextvars.ContextVar('current_query', default=None)
+
+
+def _record_query(method, state, start):
+    registry = get_metrics()
+    registry.observe("kudos_db_query_duration_seconds", time.perf_counter() - start, method=method)
+    registry.observe("kudos_db_query_rows", state.rows, method=method)
+    if state.failed:
+        registry.inc("kudos_db_query_errors_total", method=method)
+
+
+def timed_query(func):
+    """Record a DatabaseManager (or AsyncDatabaseManager coroutine) method's latency, row count and failures under its name"""
+    if not METRICS_ENABLED:
+        return func
+    method = func.__name__
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            state = _QueryState()
+            token = _current_query.set(state)
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                state.failed = True
+                raise
+            finally:
+                _current_query.reset(token)
+                _record_query(method, state, start)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        state = _QueryState()
+        token = _current_query.set(state)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            state.failed = True
+            raise
+        finally:
+            _current_query.reset(token)
+            _record_query(method, state, start)
+    return wrapper
+
+
+def count_query_rows(rowcount):
+    """Add a statement's rowcount to the running DatabaseManager method"""
+    state = _current_query.get()
+    if state is not None and rowcount > 0:
+        state.rows += rowcount
+
+
+def mark_query_failed():
+    """Count the running DatabaseManager method as failed, even if it swallows the error"""
+    state = _current_query.get()
+    if state is not None:
+        state.failed = True
+
+
+def observe_slack_call(api_method, seconds, result):
+    """Record one Slack Web API request and its result ('ok' or an error code)"""
+    if not METRICS_ENABLED:
+        return
+    registry = get_metrics()
+    registry.observe("kudos_slack_api_duration_seconds", seconds, method=api_method)
+    registry.inc("kudos_slack_api_requests_total", method=api_method, result=result)
+
+
+# --- Collection ---
+
+def collect_process_stats():
+    """Read pool, cache and rate limiter stats from this process's singletons.
+
+    Returns {'counters': [...], 'gauges': [...]} rows like MetricsRegistry.snapshot().
+    """
+    # Imported here: these modules record into this one
+    import database
+    from utils import channel_index, slack_client
+
+    counters = []
+    gauges = []
+    pools = []
+    caches = []
+
+    if database.db_manager is not None:
+        pool_stats = database.db_manager.get_pool_stats()
+        pools.append(('primary', pool_stats))
+        replica = pool_stats.get('replica')
+        if replica:
+            pools.append(('replica', replica))
+            gauges.append(["kudos_db_replica_healthy", {}, 1 if replica['healthy'] else 0])
+            if replica['lag_seconds'] is not None:
+                gauges.append(["kudos_db_replica_lag_seconds", {}, replica['lag_seconds']])
+            counters.append(["kudos_db_replica_reads_total", {'target': 'replica'}, replica['reads']])
+            counters.append(["kudos_db_replica_reads_total", {'target': 'primary'}, replica['fallbacks']])
+        caches.append(('channel_config', database.db_manager.get_config_cache_stats()))
+
+    # The asyncio stack's own pool and cache; asyncpg is optional, so only if that stack is running
+    async_database = sys.modules.get("async_database")
+    if async_database is not None and async_database.async_db_manager is not None:
+        pools.append(('async', async_database.async_db_manager.get_pool_stats()))
+        caches.append(('async_channel_config', async_database.async_db_manager.get_config_cache_stats()))
+
+    for pool, stats in pools:
+        gauges.append(["kudos_db_pool_connections", {'pool': pool, 'state': 'in_use'}, stats['in_use']])
+        gauges.append(["kudos_db_pool_connections", {'pool': pool, 'state': 'idle'}, stats['idle']])
+        gauges.append(["kudos_db_pool_max_connections", {'pool': pool}, stats['maxconn']])
+        for stat in ('checkouts', 'waits', 'timeouts', 'reconnects'):
+            counters.append([f"kudos_db_pool_{stat}_total", {'pool': pool}, stats[stat]])
+
+    if channel_index.channel_index is not None:
+        caches.append(('channel_index', channel_index.channel_index.get_stats()))
+    for cache, stats in caches:
+        counters.append(["kudos_cache_requests_total", {'cache': cache, 'result': 'hit'}, stats['hits']])
+        counters.append(["kudos_cache_requests_total", {'cache': cache, 'result': 'miss'}, stats['misses']])
+        gauges.append(["kudos_cache_entries", {'cache': cache}, stats['size']])
+
+    if slack_client.rate_limiter is not None:
+        stats = slack_client.rate_limiter.get_stats()
+        counters.append(["kudos_slack_rate_limit_waits_total", {}, stats['waits']])
+        counters.append(["kudos_slack_rate_limit_wait_seconds_total", {}, stats['wait_seconds']])
+        counters.append(["kudos_slack_rate_limited_total", {}, stats['rate_limited']])
+        counters.append(["kudos_slack_retries_total", {}, stats['retries']])
+        counters.append(["kudos_slack_coalesced_total", {}, stats['coalesced']])
+
+    return {'counters': counters, 'gauges': gauges}
+
+
+def snapshot(reset=False, include_gauges=True):
+    """Get this process's metrics: recorded counters and histograms plus collected stats"""
+    recorded = get_metrics().snapshot(reset=reset)
+    collected = collect_process_stats()
+    return {
+        'counters': recorded['counters'] + collected['counters'],
+        'gauges': collected['gauges'] if include_gauges else [],
+        'histograms': recorded['histograms']
+    }
+
+
+def merge_snapshots(snapshots):
+    """Add up several processes' snapshots into {'counters', 'gauges', 'histograms'} keyed by (name, labels)"""
+    merged = {'counters': {}, 'gauges': {}, 'histograms': {}}
+    for snap in snapshots:
+        for name, labels, value in snap.get('counters', []):
+            key = _key(name, labels)
+            merged['counters'][key] = merged['counters'].get(key, 0) + value
+        for name, labels, value in snap.get('gauges', []):
+            key = _key(name, labels)
+            if key in merged['gauges']:
+                value = GAUGE_AGGREGATION.get(name, lambda a, b: a + b)(merged['gauges'][key], value)
+            merged['gauges'][key] = value
+        for name, labels, series in snap.get('histograms', []):
+            key = _key(name, labels)
+            total = merged['histograms'].get(key)
+            merged['histograms'][key] = [a + b for a, b in zip(total, series)] if total else list(series)
+
+    # Ratios only make sense once every process's counts are added up
+    for (name, labels), in_use in list(merged['gauges'].items()):
+        if name == "kudos_db_pool_connections" and dict(labels)['state'] == 'in_use':
+            pool = dict(labels)['pool']
+            maxconn = merged['gauges'].get(_key("kudos_db_pool_max_connections", {'pool': pool}))
+            if maxconn:
+                merged['gauges'][_key("kudos_db_pool_utilization", {'pool': pool})] = in_use / maxconn
+    for (name, labels), hits in list(merged['counters'].items()):
+        if name == "kudos_cache_requests_total" and dict(labels)['result'] == 'hit':
+            cache = dict(labels)['cache']
+            misses = merged['counters'].get(_key(name, {'cache': cache, 'result': 'miss'}), 0)
+            if hits + misses:
+                merged['gauges'][_key("kudos_cache_hit_ratio", {'cache': cache})] = hits / (hits + misses)
+    return merged
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(merged):
+    """Render merged metrics in the Prometheus text exposition format (version 0.0.4)"""
+    series_by_name = {}
+    for kind in ('counters', 'gauges', 'histograms'):
+        for (name, labels), value in merged[kind].items():
+            series_by_name.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, (metric_type, help_text, buckets) in METRICS.items():
+        series = series_by_name.get(name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in sorted(series):
+            if metric_type != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ["+Inf"], value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Sharing between gunicorn workers ---
+
+# Snapshot files are named metrics-<pid>.json; the gunicorn master clears them at
+# startup and folds each exited worker's into metrics-retired.json (gunicorn.conf.py)
+def _snapshot_path(pid):
+    return os.path.join(METRICS_DIR, f"metrics-{pid}.json")
+
+
+def write_snapshot(final=False):
+    """Write this worker's metrics to METRICS_DIR for the other workers to serve.
+
+    The final snapshot of an exiting worker leaves out its gauges (its
+    connections are gone) but keeps its counters, so totals never go down.
+    """
+    if not METRICS_DIR:
+        return
+    path = _snapshot_path(os.getpid())
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(snapshot(include_gauges=not final), f)
+    os.replace(temp_path, path)
+
+
+def collect_all():
+    """Merge this process's live metrics with the other workers' latest snapshots"""
+    snapshots = [snapshot()]
+    if METRICS_DIR:
+        own_path = _snapshot_path(os.getpid())
+        for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json")):
+            if path == own_path:
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable metrics snapshot {path}: {e}")
+    return merge_snapshots(snapshots)
+
+
+class SnapshotWriter:
+    """Writes this worker's snapshot every METRICS_SNAPSHOT_INTERVAL seconds on a daemon thread"""
+
+    def __init__(self, interval=METRICS_SNAPSHOT_INTERVAL):
+        self.interval = interval
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                write_snapshot()
+            except Exception as e:
+                logger.error(f"Failed to write metrics snapshot: {e}")
+
+    def start(self):
+        if not METRICS_ENABLED or not METRICS_DIR or self._thread is not None:
+            return
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="metrics-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop writing and leave a final snapshot behind"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(5.0)
+        self._thread = None
+        write_snapshot(final=True)
+
+
+# Global snapshot writer instance
+snapshot_writer = None
+
+
+def get_snapshot_writer():
+    """Get this process's snapshot writer, creating it on first use"""
+    global snapshot_writer
+    if snapshot_writer is None:
+        snapshot_writer = SnapshotWriter()
+    return snapshot_writer
+
+
+# --- Lambda ---
+
+def flush_to_log():
+    """Print the metrics recorded since the last flush as one JSON line, and reset them.
+
+    Histograms and 'counters' cover the invocations since the last flush;
+    'totals' and 'gauges' (pool, cache and rate limiter stats) are this
+    container's running values.
+    """
+    if not METRICS_ENABLED:
+        return
+    recorded = merge_snapshots([get_metrics().snapshot(reset=True)])
+    if not recorded['histograms'] and not recorded['counters']:
+        return
+    collected = merge_snapshots([collect_process_stats()])
+
+    def rows(series):
+        return [dict(labels, metric=name, value=value) for (name, labels), value in sorted(series.items())]
+
+    histograms = []
+    for (name, labels), series in sorted(recorded['histograms'].items()):
+        buckets = METRICS[name][2]
+        histograms.append(dict(
+            labels, metric=name, count=sum(series[:-1]), sum=round(series[-1], 6),
+            buckets={str(bound): count for bound, count in zip(list(buckets) + ["+Inf"], series[:-1]) if count}
+        ))
+
+    # Printed rather than logged: LOG_LEVEL must not hide it, and the line has to be pure JSON
+    print(json.dumps({
+        'type': 'kudos_krab_metrics',
+        'histograms': histograms,
+        'counters': rows(recorded['counters']),
+        'totals': rows(collected['counters']),
+        'gauges': rows(collected['gauges'])
+    }, default=str), flush=True)
@@ -0,0 +1,286 @@
+"""
+Rate-limit-aware Slack Web API client for Kiitos Krab.
+
+Slack limits every Web API method by tier (per workspace), and
+chat.postMessage to about one message per second per channel. Instead of
+finding out through 429s, every call first takes a token from a client-side
+bucket for its method (and channel, for chat.postMessage), waiting briefly if
+the bucket is empty. A 429 still blocks that bucket for the Retry-After Slack
+sent (plus jitter) and the call is retried. A call that would have to wait
+longer than it can afford fails straight away with a synthetic 429 instead,
+so callers handle it like any other rate limit. Identical read calls that are
+already in flight (e.g. several threads calling auth.test at once) share one
+request. Buckets and counters are per process, shared by every client.
+"""
+
+import json
+import logging
+import math
+import random
+import threading
+import time
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.slack_response import SlackResponse
+from config.settings import SLACK_API_BASE_URL, SLACK_MAX_RETRIES, SLACK_RATE_LIMIT_MAX_WAIT
+from utils.metrics import observe_slack_call
+
+logger = logging.getLogger(__name__)
+
+# Web API tiers of the methods the bot calls (https://api.slack.com/docs/rate-limits)
+METHOD_TIERS = {
+    "auth.test": 4,
+    "chat.postEphemeral": 4,
+    "chat.postMessage": "post_message",
+    "conversations.info": 3,
+    "conversations.list": 2,
+    "users.info": 4,
+    "views.open": 4,
+    "views.update": 4
+}
+DEFAULT_TIER = 3
+
+# Tier -> (requests per minute, burst)
+TIER_LIMITS = {
+    1: (1, 1),
+    2: (20, 5),
+    3: (50, 10),
+    4: (100, 20),
+    "post_message": (60, 3)  # per channel
+}
+
+# Methods that can't wait as long as SLACK_RATE_LIMIT_MAX_WAIT: a trigger_id expires 3 seconds after the interaction
+METHOD_MAX_WAIT = {
+    "views.open": 1.0
+}
+
+# Calls without side effects, safe to share between identical concurrent callers
+READ_METHODS = {"auth.test", "conversations.info", "conversations.list", "users.info"}
+
+
+def get_retry_after(error):
+    """Get the Retry-After seconds from a rate-limited Slack response (None if not rate limited)"""
+    response = getattr(error, "response", None)
+    if response is None or response.status_code != 429:
+        return None
+    headers = {key.lower(): value for key, value in (response.headers or {}).items()}
+    value = headers.get("retry-after", 1)
+    if isinstance(value, list):
+        value = value[0]
+    try:
+        return max(1.0, float(value))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def get_error_code(error):
+    """Get Slack's error code from a failed Web API call ('ratelimited' for a 429)"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return "unknown_error"
+    if response.status_code == 429:
+        return "ratelimited"
+    return response.get("error") or f"http_{response.status_code}"
+
+
+def get_call_channel(kwargs):
+    """Get the channel a Web API call targets, if any"""
+    for key in ("json", "data", "params"):
+        args = kwargs.get(key)
+        if isinstance(args, dict) and args.get("channel"):
+            return args["channel"]
+    return None
+
+
+def get_coalesce_key(api_method, kwargs):
+    """Identify a read call by its method and arguments (None if it must not be shared)"""
+    if api_method not in READ_METHODS:
+        return None
+    args = {key: kwargs.get(key) for key in ("json", "data", "params")}
+    return api_method, json.dumps(args, sort_keys=True, default=str)
+
+
+def rate_limit_error(api_method, retry_after):
+    """A 429 SlackApiError for a call the client-side limiter turned away without sending"""
+    response = SlackResponse(
+        client=None, http_verb="POST", api_url=api_method, req_args={},
+        data={"ok": False, "error": "ratelimited"},
+        headers={"Retry-After": str(math.ceil(retry_after))}, status_code=429
+    )
+    return SlackApiError(f"Client-side rate limit for {api_method}: next slot in {retry_after:.1f}s", response)
+
+
+class TokenBucket:
+    """Reserves request slots at a steady rate with a burst allowance (caller holds the lock)"""
+
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0  # set by a 429's Retry-After
+
+    def reserve(self, now, max_wait):
+        """Take a token and return how long to wait before using it.
+
+        Returns None without taking one if the wait would exceed max_wait, so
+        callers that give up never push back the slots of those that don't.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        wait = max((1 - self.tokens) / self.rate if self.tokens < 1 else 0.0, self.blocked_until - now)
+        if wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+
+class SlackRateLimiter:
+    """Thread-safe token buckets per (tier, method[, channel]) plus throttling metrics"""
+
+    def __init__(self, max_wait=SLACK_RATE_LIMIT_MAX_WAIT):
+        self.max_wait = max_wait
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'waits': 0, 'wait_seconds': 0.0, 'rejected': 0, 'rate_limited': 0, 'retries': 0, 'coalesced': 0}
+
+    def _bucket(self, api_method, channel):
+        tier = METHOD_TIERS.get(api_method, DEFAULT_TIER)
+        key = (tier, api_method, channel if tier == "post_message" else None)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(*TIER_LIMITS[tier])
+        return bucket
+
+    def acquire(self, api_method, channel=None):
+        """Reserve a slot for one call; returns the seconds to sleep first.
+
+        Raises rate_limit_error if the slot is further off than the method can
+        wait (max_wait, or less for METHOD_MAX_WAIT methods).
+        """
+        max_wait = min(self.max_wait, METHOD_MAX_WAIT.get(api_method, self.max_wait))
+        with self._lock:
+            bucket = self._bucket(api_method, channel)
+            now = time.monotonic()
+            wait = bucket.reserve(now, max_wait)
+            if wait is None:
+                self.stats['rejected'] += 1
+                retry_after = max(bucket.blocked_until - now, (1 - bucket.tokens) / bucket.rate)
+                raise rate_limit_error(api_method, retry_after)
+            self.stats['calls'] += 1
+            if wait > 0:
+                self.stats['waits'] += 1
+                self.stats['wait_seconds'] += wait
+            return wait
+
+    def penalize(self, api_method, channel, retry_after):
+        """Hold back every call sharing this bucket for Slack's Retry-After, plus jitter; returns the delay"""
+        delay = retry_after + random.uniform(0, min(1.0, retry_after / 4))
+        with self._lock:
+            bucket = self._bucket(api_method, channel)
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + delay)
+            self.stats['rate_limited'] += 1
+        logger.warning(f"Slack rate limited {api_method}{f' in {channel}' if channel else ''}, backing off {delay:.1f}s")
+        return delay
+
+    def record(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get_stats(self):
+        """Get the throttling counters for this process"""
+        with self._lock:
+            return dict(self.stats)
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class RateLimitedClient(WebClient):
+    """WebClient that waits for rate limit tokens, retries 429s and coalesces identical reads"""
+
+    def __init__(self, *args, rate_limiter=None, max_retries=SLACK_MAX_RETRIES, **kwargs):
+        kwargs.setdefault("base_url", SLACK_API_BASE_URL)
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.max_retries = max_retries
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        # Bolt deep-copies the request context for lazy listeners; they should share this client and its limiter
+        return self
+
+    def api_call(self, api_method, **kwargs):
+        key = get_coalesce_key(api_method, kwargs)
+        if key is None:
+            return self._call_with_retries(api_method, kwargs)
+
+        with self._in_flight_lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _InFlightCall()
+
+        if not leader:
+            self.rate_limiter.record('coalesced')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.response
+
+        try:
+            call.response = self._call_with_retries(api_method, kwargs)
+            return call.response
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.pop(key, None)
+            call.done.set()
+
+    def _call_with_retries(self, api_method, kwargs):
+        channel = get_call_channel(kwargs)
+        attempt = 0
+        while True:
+            wait = self.rate_limiter.acquire(api_method, channel)
+            if wait > 0:
+                time.sleep(wait)
+            start = time.perf_counter()
+            try:
+                response = super().api_call(api_method, **kwargs)
+            except SlackApiError as e:
+                observe_slack_call(api_method, time.perf_counter() - start, get_error_code(e))
+                retry_after = get_retry_after(e)
+                if retry_after is None:
+                    raise
+                self.rate_limiter.penalize(api_method, channel, retry_after)
+                # Long Retry-Afters are left to the caller (the outbox dispatcher reschedules)
+                if attempt >= self.max_retries or retry_after > self.rate_limiter.max_wait:
+                    raise
+                self.rate_limiter.record('retries')
+                attempt += 1
+            except Exception as e:
+                # Timeouts and connection errors never reached Slack's error codes
+                observe_slack_call(api_method, time.perf_counter() - start, type(e).__name__)
+                raise
+            else:
+                observe_slack_call(api_method, time.perf_counter() - start, "ok")
+                return response
+
+
+# Global rate limiter, shared by every client in the process
+rate_limiter = None
+
+
+def get_rate_limiter():
+    """Get the process-wide Slack rate limiter"""
+    global rate_limiter
+    if rate_limiter is None:
+        rate_limiter = SlackRateLimiter()
+    return rate_limiter
@@ -1,5 +1,6 @@
 import re
 import logging
+from utils.channel_index import get_channel_index
 
 logger = logging.getLogger(__name__)
 
@@ -66,9 +67,10 @@ def validate_kudos_recipients(user_id, unique_users, bot_user_id):
 def get_channel_id_from_name(client, channel_name):
     """
     Convert a readable channel name (like #apacrabs or apacrabs) to a Slack channel ID.
-    Only searches public channels for security/privacy reasons.
+    Only public channels are indexed, for security/privacy reasons.
     Returns the channel ID if found, None otherwise.
-    Raises an exception with a helpful message if the bot lacks required scopes.
+    Raises an exception with a helpful message if the bot lacks required scopes,
+    or ChannelIndexNotReady if the channel index is still being built.
     """
     try:
         # Remove # if present
@@ -81,48 +83,14 @@ def get_channel_id_from_name(client, channel_name):
             logger.info(f"Input is already a channel ID: {clean_name}")
             return clean_name
         
-        # Only search public channels - private channels should be accessed from within that channel
+        # Only public channels are indexed - private channels should be accessed from within that channel
         # This prevents users from viewing leaderboards of private channels they're not members of
-        response = client.conversations_list(types="public_channel", limit=1000)
-        
-        # Check for missing scopes error
-        if not response.get("ok"):
-            error = response.get("error", "")
-            if error == "missing_scope":
-                needed = response.get("needed", "channels:read")
-                raise Exception(f"Bot is missing required scope: {needed}. Please add this scope in your Slack app settings (OAuth & Permissions > Scopes > Bot Token Scopes).")
-            else:
-                raise Exception(f"Slack API error: {error}")
-        
-        if response.get("ok"):
-            for channel in response.get("channels", []):
-                if channel.get("name") == clean_name:
-                    channel_id = channel.get("id")
-                    logger.info(f"Found channel #{clean_name} -> {channel_id}")
-                    return channel_id
-        
-        # If not found in first page, try pagination
-        cursor = response.get("response_metadata", {}).get("next_cursor")
-        while cursor:
-            response = client.conversations_list(types="public_channel", limit=1000, cursor=cursor)
-            if not response.get("ok"):
-                error = response.get("error", "")
-                if error == "missing_scope":
-                    needed = response.get("needed", "channels:read")
-                    raise Exception(f"Bot is missing required scope: {needed}. Please add this scope in your Slack app settings.")
-                break
-            if response.get("ok"):
-                for channel in response.get("channels", []):
-                    if channel.get("name") == clean_name:
-                        channel_id = channel.get("id")
-                        logger.info(f"Found channel #{clean_name} -> {channel_id}")
-                        return channel_id
-                cursor = response.get("response_metadata", {}).get("next_cursor")
-            else:
-                break
-        
-        logger.warning(f"Channel #{clean_name} not found")
-        return None
+        channel_id = get_channel_index(client).lookup(clean_name)
+        if channel_id:
+            logger.info(f"Found channel #{clean_name} -> {channel_id}")
+        else:
+            logger.warning(f"Channel #{clean_name} not found")
+        return channel_id
         
     except Exception as e:
         logger.error(f"Error looking up channel #{channel_name}: {e}")
@@ -0,0 +1,82 @@
+"""
+Production WSGI entry point for Kiitos Krab.
+
+Serves the Bolt app from a real WSGI server instead of app.start()'s
+single-threaded development server:
+  gunicorn -c gunicorn.conf.py wsgi:application
+
+Worker processes, threads and per-worker DB pool sizing are configured in
+gunicorn.conf.py.
+"""
+from http import HTTPStatus
+from dotenv import load_dotenv
+
+# Load environment variables BEFORE importing kudos_bot
+load_dotenv()
+
+from slack_bolt.request import BoltRequest
+from kudos_bot import app
+from config.settings import METRICS_ENABLED
+from utils import metrics
+
+SLACK_EVENTS_PATH = "/slack/events"
+METRICS_PATH = "/metrics"
+
+
+def _read_headers(environ):
+    """Rebuild the request headers from a WSGI environ"""
+    headers = {}
+    for key, value in environ.items():
+        if key.startswith("HTTP_"):
+            headers[key[5:].replace("_", "-").lower()] = value
+        elif key in ("CONTENT_TYPE", "CONTENT_LENGTH") and value:
+            headers[key.replace("_", "-").lower()] = value
+    return headers
+
+
+def _read_body(environ):
+    try:
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        length = 0
+    return environ["wsgi.input"].read(length).decode("utf-8") if length > 0 else ""
+
+
+def application(environ, start_response):
+    """WSGI app: dispatch Slack requests to Bolt, and serve health checks and metrics"""
+    method = environ.get("REQUEST_METHOD", "GET")
+    path = environ.get("PATH_INFO", "")
+
+    if path == "/health" and method == "GET":
+        start_response("200 OK", [("Content-Type", "text/plain;charset=utf-8")])
+        return [b"OK"]
+
+    if path == METRICS_PATH and method == "GET" and METRICS_ENABLED:
+        # Every worker's metrics, whichever worker the scrape lands on
+        body = metrics.render(metrics.collect_all()).encode("utf-8")
+        start_response("200 OK", [("Content-Type", "text/plain; version=0.0.4; charset=utf-8"), ("Content-Length", str(len(body)))])
+        return [body]
+
+    if path != SLACK_EVENTS_PATH or method != "POST":
+        start_response("404 Not Found", [("Content-Type", "text/plain;charset=utf-8")])
+        return [b"Not Found"]
+
+    bolt_request = BoltRequest(
+        body=_read_body(environ),
+        query=environ.get("QUERY_STRING", ""),
+        headers=_read_headers(environ)
+    )
+    bolt_response = app.dispatch(bolt_request)
+
+    body = bolt_response.body.encode("utf-8")
+    headers = [(name, value) for name, values in bolt_response.headers.items() for value in values]
+    headers.append(("Content-Length", str(len(body))))
+    start_response(f"{bolt_response.status} {_reason(bolt_response.status)}", headers)
+    return [body]
+
+
+def _reason(status):
+    try:
+        return HTTPStatus(status).phrase
+    except ValueError:
+        return "Unknown"